@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Planet, PlanetDiscovery, Star, StarSystem
+from .models import CatalogChange, ImportRun, Planet, PlanetDiscovery, Star, StarSystem
 
 
 class ReadOnlyAdmin(admin.ModelAdmin):
@@ -66,3 +66,32 @@ class PlanetAdmin(ReadOnlyAdmin):
     ordering = ("name",)
     search_fields = ("name", "host_star__name")
     list_filter = ("host_star__system", "discovery__method", "discovery__facility")
+
+
+@admin.register(CatalogChange)
+class CatalogChangeAdmin(ReadOnlyAdmin):
+    list_display = ("created_at", "entity_type", "operation", "key", "old_hash", "new_hash", "data_version")
+    ordering = ("-id",)
+    search_fields = ("import_id", "data_version")
+    list_filter = ("entity_type", "operation")
+
+
+@admin.register(ImportRun)
+class ImportRunAdmin(ReadOnlyAdmin):
+    list_display = (
+        "started_at",
+        "importer",
+        "source",
+        "status",
+        "duration_seconds",
+        "rows_read",
+        "rows_written",
+        "rows_per_second",
+        "db_seconds",
+        "parse_seconds",
+        "peak_memory_mb",
+        "memory_growth_mb",
+    )
+    ordering = ("-started_at",)
+    search_fields = ("source", "task_id")
+    list_filter = ("importer", "source", "status")
@@ -0,0 +1,191 @@
+import threading
+import time
+from bisect import bisect_left
+
+from .change_feed import changes_since, get_last_change, is_listening, start_listener, subscribe
+from .data_version import get_data_version
+from .models import CatalogChange, Planet, Star, StarSystem
+
+# entity types in the order they are ranked when names tie
+AUTOCOMPLETE_ENTITY_TYPES = {
+    "star_system": StarSystem,
+    "star": Star,
+    "planet": Planet,
+}
+
+# the app table each entity type is imported into, whose change feed entries apply to it
+AUTOCOMPLETE_APP_TABLES = {
+    "star_system": "star_systems",
+    "star": "stars",
+    "planet": "planets",
+}
+
+# how often (in seconds) a process checks whether its index is still current
+VERSION_CHECK_INTERVAL = 1.0
+# how often it checks while it listens to the change feed, which tells it of every import
+LISTENING_VERSION_CHECK_INTERVAL = 60.0
+
+# beyond this many changed names, the index is rebuilt rather than updated
+MAX_INDEX_CHANGES = 5000
+
+
+class AutocompleteIndex:
+    """
+    An immutable, in-process prefix index over planet, star and star system names.
+
+    Names are kept case-folded in sorted arrays, so a prefix lookup is a binary search
+    followed by a slice. Within a prefix, an exact match comes first, then names in
+    lexicographic order (which puts shorter names first) and then by entity type.
+
+    'last_change_id' is the last change feed entry the index reflects.
+    """
+
+    def __init__(self, entries, version, last_change_id=0):
+        self.version = version
+        self.last_change_id = last_change_id
+
+        entries = sorted(entries)
+        self._keys = [entry[0] for entry in entries]
+        self._entries = entries
+
+        self._keys_by_type = {}
+        self._entries_by_type = {}
+        for entity_type in AUTOCOMPLETE_ENTITY_TYPES:
+            typed_entries = [entry for entry in entries if entry[3] == entity_type]
+            self._keys_by_type[entity_type] = [entry[0] for entry in typed_entries]
+            self._entries_by_type[entity_type] = typed_entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @classmethod
+    def build(cls, version):
+        """
+        Builds an index from the database, with one query per entity type.
+        """
+        # taken first, so that changes committed during the build are applied again by update()
+        last_change = get_last_change()
+
+        entries = []
+        for rank, (entity_type, model) in enumerate(AUTOCOMPLETE_ENTITY_TYPES.items()):
+            for pk, name in model.objects.values_list("pk", "name").iterator():
+                entries.append((name.casefold(), rank, name, entity_type, pk))
+
+        return cls(entries, version, last_change.pk if last_change is not None else 0)
+
+    def update(self, version):
+        """
+        Returns a new index with the names the change feed logged since this one was built
+        added or removed, or None if it has to be rebuilt: when the version was not started by
+        a logged import (e.g. by the NASA importer), when rows were invalidated without being
+        listed, or when too many names changed.
+        """
+        last_change = get_last_change()
+        if last_change is None or last_change.data_version != version:
+            return None
+
+        # updated rows keep their name, the key they are imported by
+        changes = list(
+            changes_since(self.last_change_id, AUTOCOMPLETE_APP_TABLES.values())
+            .exclude(operation=CatalogChange.Operation.UPDATED)
+            .values_list("entity_type", "operation", "key")[:MAX_INDEX_CHANGES + 1]
+        )
+        if len(changes) > MAX_INDEX_CHANGES or any(
+            operation == CatalogChange.Operation.INVALIDATED for _, operation, _ in changes
+        ):
+            return None
+
+        names_by_type = {entity_type: set() for entity_type in AUTOCOMPLETE_ENTITY_TYPES}
+        entity_types = {app_table: entity_type for entity_type, app_table in AUTOCOMPLETE_APP_TABLES.items()}
+        for app_table, _, name in changes:
+            names_by_type[entity_types[app_table]].add(name)
+
+        # the changed names are looked up again, so that applying a change twice does no harm
+        entries = [entry for entry in self._entries if entry[2] not in names_by_type[entry[3]]]
+        for rank, (entity_type, model) in enumerate(AUTOCOMPLETE_ENTITY_TYPES.items()):
+            names = names_by_type[entity_type]
+            if names:
+                for pk, name in model.objects.filter(name__in=names).values_list("pk", "name"):
+                    entries.append((name.casefold(), rank, name, entity_type, pk))
+
+        return AutocompleteIndex(entries, version, last_change.pk)
+
+    def search(self, query, limit=10, entity_types=None):
+        """
+        Returns up to 'limit' suggestions whose name starts with the query, as dictionaries.
+        """
+        prefix = query.strip().casefold()
+        if not prefix or limit <= 0:
+            return []
+
+        if entity_types is None or set(entity_types) >= set(AUTOCOMPLETE_ENTITY_TYPES):
+            matches = self._match(self._keys, self._entries, prefix, limit)
+        else:
+            matches = []
+            for entity_type in entity_types:
+                matches.extend(
+                    self._match(
+                        self._keys_by_type[entity_type], self._entries_by_type[entity_type], prefix, limit
+                    )
+                )
+            matches = sorted(matches)[:limit]
+
+        return [{"type": entity_type, "id": pk, "name": name} for _, _, name, entity_type, pk in matches]
+
+    @staticmethod
+    def _match(keys, entries, prefix, limit):
+        start = bisect_left(keys, prefix)
+        matches = []
+        for entry in entries[start:start + limit]:
+            if not entry[0].startswith(prefix):
+                break
+            matches.append(entry)
+        return matches
+
+
+_index = None
+_index_lock = threading.Lock()
+_version_checked_at = 0.0
+
+
+def get_autocomplete_index():
+    """
+    Returns the process-wide autocomplete index, updating it from the change feed (or
+    rebuilding it) when the data version changes.
+
+    With CATALOG_CHANGE_FEED_REDIS_URL set, the process listens to the change feed, and only
+    checks the data version when an import is published (or once a minute, in case a message
+    was lost). Otherwise it checks every second.
+
+    The new index is built off to the side and swapped in with a single assignment, so
+    concurrent readers always see either the old or the new index, never a partial one.
+    """
+    global _index, _version_checked_at
+
+    start_listener()
+
+    index = _index
+    now = time.monotonic()
+    check_interval = LISTENING_VERSION_CHECK_INTERVAL if is_listening() else VERSION_CHECK_INTERVAL
+    if index is not None and now - _version_checked_at < check_interval:
+        return index
+
+    version = get_data_version()
+    if index is not None and index.version == version:
+        _version_checked_at = now
+        return index
+
+    with _index_lock:
+        # another thread may have rebuilt the index while this one waited on the lock
+        if _index is None or _index.version != version:
+            updated = _index.update(version) if _index is not None else None
+            _index = updated if updated is not None else AutocompleteIndex.build(version)
+        _version_checked_at = now
+        return _index
+
+
+@subscribe
+def _on_catalog_changes(message):
+    # an import made here or published by another process is picked up on the next lookup
+    global _version_checked_at
+    _version_checked_at = 0.0
@@ -0,0 +1,192 @@
+class BulkUpserter:
+    """
+    Upserts rows of a model in batches, with one INSERT ... ON CONFLICT DO UPDATE per batch.
+
+    The keys that already exist are loaded with a single query up front, which keeps the
+    created and updated counts accurate without a SELECT per row. Rows that repeat a key
+    are collapsed, the last one wins, just like consecutive update_or_create calls would.
+
+    With a 'hash_field', every row carries a hash of the record it was imported from, and a
+    row whose hash has not changed is not written at all. The keys that were inserted and
+    updated are collected, and the existing rows that were never added can be removed with
+    delete_missing(). changes() lists every change with the hashes before and after.
+    """
+
+    # related objects have to be resolved into the row values before add()
+    resolves_relationships = False
+
+    def __init__(self, model, unique_fields, update_fields, batch_size=1000, hash_field=None):
+        self.model = model
+        self.unique_fields = list(unique_fields)
+        self.update_fields = list(update_fields)
+        self.batch_size = batch_size
+        self.hash_field = hash_field
+
+        self.created_count = 0
+        self.updated_count = 0
+        self.unchanged_count = 0
+        self.deleted_count = 0
+
+        self.inserted_keys = []
+        self.updated_keys = []
+        self.deleted_keys = []
+        # changed key -> (stored hash, new hash), None for a row that did not or no longer exists
+        self.changed_hashes = {}
+        # model -> rows deleted along with the missing rows, through on_delete=CASCADE
+        self.cascaded_counts = {}
+
+        if hash_field:
+            self.update_fields.append(hash_field)
+
+        self._key_fields = [model._meta.get_field(field) for field in self.unique_fields]
+        # existing key -> (pk, stored hash)
+        self._existing = {
+            tuple(row[1:-1]): (row[0], row[-1])
+            for row in model.objects.values_list("pk", *self.unique_fields, hash_field or "pk").iterator()
+        }
+        self._seen_keys = set()
+        self._unchanged_keys = set()
+        self._pending = {}
+        self._missing = None
+
+    def key_for(self, values):
+        """
+        Returns the normalized unique key of a row, so that e.g. '2016' and 2016 compare equal.
+        """
+        return tuple(field.to_python(values[field.name]) for field in self._key_fields)
+
+    def add(self, values, related_lookups=None):
+        """
+        Queues a row, given as a dict of model field values, and flushes full batches.
+        """
+        key = self.key_for(values)
+        existing = self._existing.get(key)
+
+        if (
+            self.hash_field
+            and key not in self._seen_keys
+            and existing is not None
+            and existing[1] == values[self.hash_field]
+        ):
+            self.unchanged_count += 1
+            self._seen_keys.add(key)
+            self._unchanged_keys.add(key)
+            return
+
+        if key in self._unchanged_keys:
+            # a repeated key that does change the row after all
+            self._unchanged_keys.discard(key)
+            self.unchanged_count -= 1
+            self._count_update(key)
+        elif key not in self._seen_keys:
+            if existing is not None:
+                self._count_update(key)
+            else:
+                self.created_count += 1
+                self.inserted_keys.append(self._changeset_key(key))
+            self._seen_keys.add(key)
+
+        if self.hash_field:
+            self.changed_hashes[self._changeset_key(key)] = (
+                existing[1] if existing is not None else None, values[self.hash_field]
+            )
+
+        self._pending[key] = self.model(**values)
+
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all queued rows.
+        """
+        if not self._pending:
+            return
+
+        objs = list(self._pending.values())
+        self._pending = {}
+
+        if self.update_fields:
+            self.model.objects.bulk_create(
+                objs,
+                update_conflicts=True,
+                unique_fields=self.unique_fields,
+                update_fields=self.update_fields,
+            )
+        else:
+            # every field is part of the key, so an existing row is already up to date
+            self.model.objects.bulk_create(objs, ignore_conflicts=True)
+
+    def finish(self):
+        """
+        Writes the queued rows and releases the key index, keeping only the ids of the existing
+        rows that were never added, for delete_missing().
+        """
+        self.flush()
+
+        self._missing = [
+            (key, pk, stored_hash) for key, (pk, stored_hash) in self._existing.items() if key not in self._seen_keys
+        ]
+        self._existing = {}
+        self._seen_keys = set()
+        self._unchanged_keys = set()
+
+    def delete_missing(self):
+        """
+        Deletes the existing rows whose key was never added, and returns how many were deleted.
+        With a 'hash_field', rows without a stored hash are kept.
+        """
+        if self._missing is None:
+            self.finish()
+        if self.hash_field:
+            # rows without a stored hash were last written by another importer, not from the source
+            self._missing = [missing for missing in self._missing if missing[2]]
+
+        for start in range(0, len(self._missing), self.batch_size):
+            batch = self._missing[start:start + self.batch_size]
+            _, deleted = self.model.objects.filter(pk__in=[pk for _, pk, _ in batch]).delete()
+            count_cascades(self.model, deleted, self.cascaded_counts)
+
+        self.deleted_count = len(self._missing)
+        self.deleted_keys = [self._changeset_key(key) for key, _, _ in self._missing]
+        if self.hash_field:
+            for key, _, stored_hash in self._missing:
+                self.changed_hashes[self._changeset_key(key)] = (stored_hash, None)
+        self._missing = []
+        return self.deleted_count
+
+    def changes(self):
+        """
+        Yields the operation ('inserted', 'updated' or 'deleted'), key, stored hash and new hash
+        of every changed row.
+        """
+        yield from iter_changes(self)
+
+    def _count_update(self, key):
+        self.updated_count += 1
+        self.updated_keys.append(self._changeset_key(key))
+
+    def _changeset_key(self, key):
+        # single-field keys are reported as plain values
+        return key[0] if len(key) == 1 else key
+
+
+def iter_changes(upserter):
+    for operation, keys in (
+        ("inserted", upserter.inserted_keys),
+        ("updated", upserter.updated_keys),
+        ("deleted", upserter.deleted_keys),
+    ):
+        for key in keys:
+            old_hash, new_hash = upserter.changed_hashes.get(key, (None, None))
+            yield operation, key, old_hash, new_hash
+
+
+def count_cascades(model, deleted, cascaded_counts):
+    """
+    Adds the rows of other models in the per-model counts of QuerySet.delete() to 'cascaded_counts'.
+    """
+    for label, count in deleted.items():
+        if label != model._meta.label and count:
+            cascaded_model = model._meta.apps.get_model(label)
+            cascaded_counts[cascaded_model] = cascaded_counts.get(cascaded_model, 0) + count
@@ -1,9 +1,23 @@
+import hashlib
 import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
 
-from django.db import transaction
+from django.db import connection, transaction
 
-from .models import PlanetDiscovery, StarSystem, Star, Planet
+from .bulk_upsert import BulkUpserter
+from .canonical_files import CANONICAL_BINARY_SUFFIX, iter_canonical_records
+from .change_feed import build_change, publish_changes, record_changes
+from .copy_loader import CopyUpserter
+from .data_version import bump_data_version, new_data_version
+from .eligibility import refresh_simulation_eligibility
+from .import_metrics import FINALIZE_STAGE, ImportMetrics, get_expected_rows
+from .import_scheduler import PrefetchingReader, find_critical_path, resolve_import_levels
+from .models import ImportRun, Planet, PlanetDiscovery, Star, StarSystem
+from .shadow_tables import ShadowTables
 
 APP_ROOT = Path(__file__).resolve().parent.parent
 
@@ -11,6 +25,7 @@ APP_TABLE_IMPORT_CONFIG = {
     "star_systems": {
         "model": StarSystem,
         "source_file": f"{APP_ROOT}/data/canonical_star_systems.json",
+        "depends_on": [],
         "unique_on": "name",
         "field_map": {
             "sy_name": "name",
@@ -25,6 +40,7 @@ APP_TABLE_IMPORT_CONFIG = {
     "planet_discoveries": {
         "model": PlanetDiscovery,
         "source_file": f"{APP_ROOT}/data/canonical_planet_discoveries.json",
+        "depends_on": [],
         "unique_on": ["method", "year", "locale", "facility"],
         "field_map": {
             "discoverymethod": "method",
@@ -36,6 +52,7 @@ APP_TABLE_IMPORT_CONFIG = {
     "stars": {
         "model": Star,
         "source_file": f"{APP_ROOT}/data/canonical_stars.json",
+        "depends_on": ["star_systems"],
         "unique_on": "name",
         "field_map": {
             "hostname": "name",
@@ -57,6 +74,7 @@ APP_TABLE_IMPORT_CONFIG = {
     "planets": {
         "model": Planet,
         "source_file": f"{APP_ROOT}/data/canonical_planets.json",
+        "depends_on": ["stars", "planet_discoveries"],
         "unique_on": "name",
         "field_map": {
             "pl_name": "name",
@@ -83,36 +101,178 @@ APP_TABLE_IMPORT_CONFIG = {
     }
 }
 
-IMPORT_ORDER = [
-    "star_systems",
-    "planet_discoveries",
-    "stars",
-    "planets",
-]
+# number of records written per INSERT ... ON CONFLICT (or COPY) statement
+DEFAULT_IMPORT_BATCH_SIZE = 1000
 
+# 'orm' writes through bulk_create, 'copy' loads Postgres through COPY and staging tables, and
+# 'auto' picks 'copy' on Postgres and 'orm' everywhere else
+IMPORT_BACKENDS = ("auto", "orm", "copy")
 
-def run_canonical_data_import(dry_run=False, logger=print):
+# app tables grouped by their dependencies; the tables of a level only depend on earlier levels
+IMPORT_LEVELS = resolve_import_levels(APP_TABLE_IMPORT_CONFIG)
+IMPORT_ORDER = [app_table for level in IMPORT_LEVELS for app_table in level]
+
+# source of the canonical imports in the import history
+CANONICAL_IMPORT_SOURCE = "canonical_files"
+
+
+def run_canonical_data_import(
+    dry_run=False,
+    logger=print,
+    batch_size=DEFAULT_IMPORT_BATCH_SIZE,
+    prune=False,
+    on_changeset=None,
+    backend="auto",
+    shadow=False,
+    on_progress=None,
+    task_id="",
+):
     """
     Reads from the pre-processed canonical JSON files and populates the database
     in a specific, dependency-aware order.
+
+    The order follows the 'depends_on' tables declared in APP_TABLE_IMPORT_CONFIG. All source
+    files are read and decoded concurrently on background threads, while the records are
+    written table by table in a single transaction, so that the import stays all-or-nothing.
+
+    Records whose content hash matches the stored one are skipped, so importing unchanged
+    files does not write anything. With 'prune', rows that are no longer in their source file
+    are deleted, except in tables where records were skipped or their relationships could not be
+    resolved, and except rows last written by the NASA importer. Once the import is committed,
+    'on_changeset' is called with the inserted, updated and deleted keys of every app table.
+
+    Every change is also recorded in the change feed log (CatalogChange) with the record hashes
+    before and after, and published to its subscribers once committed (see api.change_feed), so
+    that anything derived from the catalog can update just the affected entries.
+
+    The 'backend' is one of IMPORT_BACKENDS.
+
+    With 'shadow' (Postgres only), the import is loaded into complete copies of the app tables
+    instead, which are validated and then swapped in at once. The live tables are only read
+    until the swap, so readers neither wait on the import nor see a half-updated catalog.
+
+    While the import runs, 'on_progress' is called with its progress (see ImportMetrics), and
+    every import that is not a dry run is recorded in the import history (ImportRun) with its
+    throughput, under the Celery 'task_id' that ran it, if any.
     """
     logger("--- Starting Import from Canonical Data Files ---")
 
+    backend = _resolve_import_backend(backend)
+    logger(f"Using the '{backend}' import backend.")
+    if shadow and backend != "copy":
+        raise ValueError("Shadow imports require the 'copy' import backend")
+
     result_message = ""
+    related_id_maps = {}
+    upserters = {}
+    # app tables whose every record was imported with its relationships, the only ones pruned
+    complete_tables = set()
+    shadow_tables = None
+    cascaded_counts = {}
+    metrics = ImportMetrics(
+        ImportRun.Importer.CANONICAL,
+        [*IMPORT_ORDER, FINALIZE_STAGE],
+        on_progress=on_progress,
+        expected_rows=get_expected_rows(ImportRun.Importer.CANONICAL, CANONICAL_IMPORT_SOURCE),
+    )
 
     try:
-        with transaction.atomic():
+        with _open_record_readers() as readers, transaction.atomic():
+            if shadow:
+                shadow_tables = ShadowTables(APP_TABLE_IMPORT_CONFIG[app_table]["model"] for app_table in IMPORT_ORDER)
+                shadow_tables.create()
+                logger(f"Importing into shadow tables in the '{shadow_tables.schema}' schema.")
+
             for app_table in IMPORT_ORDER:
-                config = APP_TABLE_IMPORT_CONFIG[app_table]
-                import_message = _import_app_table_data_from_file(app_table, config, dry_run, logger)
+                metrics.start_stage(app_table)
+                source_file, records = readers[app_table]
+                import_message, upserters[app_table], is_complete = _import_app_table_data_from_file(
+                    app_table, APP_TABLE_IMPORT_CONFIG[app_table], source_file, records,
+                    dry_run, logger, batch_size, backend, related_id_maps, metrics,
+                    table_names=shadow_tables.table_names if shadow_tables is not None else None,
+                )
+                upserter = upserters[app_table]
+                metrics.finish_stage(rows_written=upserter.created_count + upserter.updated_count)
                 result_message += import_message
+                if is_complete:
+                    complete_tables.add(app_table)
+
+            durations = {app_table: metrics.stages[app_table]["duration_seconds"] for app_table in IMPORT_ORDER}
+            result_message += _critical_path_message(durations, logger)
 
             if dry_run:
                 raise InterruptedError("[DRY RUN] No changes were made to the database")
+
+            metrics.start_stage(FINALIZE_STAGE)
+
+            if prune:
+                # children first, so that no row is removed through a cascade from its parent
+                for app_table in reversed(IMPORT_ORDER):
+                    result_message += _prune_app_table(
+                        app_table, upserters[app_table], app_table in complete_tables, logger
+                    )
+
+                if shadow_tables is not None:
+                    cascaded_counts = shadow_tables.cascade_deletes()
+                    if cascaded_counts:
+                        logger(f"Deleted {sum(cascaded_counts.values())} rows whose parent row was pruned.")
+
+            changeset = {
+                app_table: {
+                    "inserted": upserter.inserted_keys,
+                    "updated": upserter.updated_keys,
+                    "deleted": upserter.deleted_keys,
+                }
+                for app_table, upserter in upserters.items()
+            }
+
+            if any(any(changes.values()) for changes in changeset.values()):
+                if shadow_tables is not None:
+                    shadow_tables.validate(logger)
+                    shadow_tables.swap()
+                    logger("Swapped the shadow tables in.")
+
+                refresh_simulation_eligibility(
+                    changed_names={
+                        app_table: changes["inserted"] + changes["updated"]
+                        for app_table, changes in changeset.items()
+                        if isinstance(APP_TABLE_IMPORT_CONFIG[app_table]["unique_on"], str)
+                    }
+                )
+
+                import_id = uuid.uuid4()
+                data_version = new_data_version()
+                changes = _build_changes(upserters, cascaded_counts)
+                record_changes(import_id, data_version, changes)
+                logger(f"Recorded {len(changes)} changes in the change feed (data version {data_version}).")
+
+                # let catalog-derived indexes and caches know about the new data once it is committed
+                transaction.on_commit(lambda: bump_data_version(data_version))
+                # the import is committed by then, so a failure to publish must not fail it
+                transaction.on_commit(lambda: publish_changes(import_id, data_version, changes, logger), robust=True)
+            else:
+                logger("No canonical records changed.")
+                if shadow_tables is not None:
+                    shadow_tables.drop()
+
+            if on_changeset is not None:
+                transaction.on_commit(lambda: on_changeset(changeset))
+
+        metrics.finish_stage(
+            rows_written=sum(upserter.deleted_count for upserter in upserters.values()), is_database=True
+        )
     except InterruptedError as e:
         logger(f"{str(e)}")
     except Exception as e:
+        # a dry run is not part of the import history
+        if not dry_run:
+            metrics.finish()
+            metrics.save(CANONICAL_IMPORT_SOURCE, ImportRun.Status.FAILURE, message=str(e), task_id=task_id)
         raise Exception("An unexpected error occurred during the canonical data import") from e
+    else:
+        metrics.finish()
+        result_message += metrics.summary_message()
+        metrics.save(CANONICAL_IMPORT_SOURCE, ImportRun.Status.SUCCESS, message=result_message, task_id=task_id)
 
     logger("--- Finished Import from Canonical Data Files ---")
     logger(result_message)
@@ -120,26 +280,111 @@ def run_canonical_data_import(dry_run=False, logger=print):
     return result_message
 
 
-def _import_app_table_data_from_file(app_table, config, dry_run, logger):
+def get_source_files():
+    """
+    Returns the file each app table is imported from, in import order.
+    """
+    return {
+        app_table: _resolve_source_file(APP_TABLE_IMPORT_CONFIG[app_table]["source_file"])
+        for app_table in IMPORT_ORDER
+    }
+
+
+@contextmanager
+def _open_record_readers():
+    """
+    Starts reading every source file on its own background thread, and yields the source file
+    and the record reader of each app table.
+    """
+    with ThreadPoolExecutor(max_workers=len(IMPORT_ORDER), thread_name_prefix="canonical-reader") as executor:
+        readers = {}
+        try:
+            for app_table, source_file in get_source_files().items():
+                if not source_file.exists():
+                    raise FileNotFoundError(f"Source file '{source_file}' not found")
+
+                reader = PrefetchingReader(partial(iter_canonical_records, source_file), executor)
+                readers[app_table] = (source_file, reader)
+
+            yield readers
+        finally:
+            for _, reader in readers.values():
+                reader.close()
+
+
+def _build_changes(upserters, cascaded_counts):
+    """
+    Returns the change feed entries of an import: every inserted, updated and deleted row, and
+    an 'invalidated' entry for each app table that lost rows through a cascade, since those are
+    not listed one by one.
+    """
+    app_tables_by_model = {config["model"]: app_table for app_table, config in APP_TABLE_IMPORT_CONFIG.items()}
+
+    changes = []
+    cascaded_counts = dict(cascaded_counts)
+    for app_table, upserter in upserters.items():
+        for operation, key, old_hash, new_hash in upserter.changes():
+            changes.append(build_change(app_table, operation, key, old_hash, new_hash))
+        for model, count in upserter.cascaded_counts.items():
+            cascaded_counts[model] = cascaded_counts.get(model, 0) + count
+
+    for model in cascaded_counts:
+        # a cascade can reach beyond the catalog, e.g. to saved simulations
+        if model in app_tables_by_model:
+            changes.append(build_change(app_tables_by_model[model], "invalidated", None))
+    return changes
+
+
+def _critical_path_message(durations, logger):
     """
-    Import data for a single app table from a JSON file.
+    Reports how long each app table took and the chain of dependent app tables that bounds the
+    import time.
     """
-    source_file = config["source_file"]
+    path, path_duration = find_critical_path(APP_TABLE_IMPORT_CONFIG, durations)
+    timings = ", ".join(f"{app_table}: {duration:.2f}s" for app_table, duration in durations.items())
 
+    result_message = (
+        f"Import timings: {timings}. Critical path: {' -> '.join(path)} ({path_duration:.2f}s "
+        f"of {sum(durations.values()):.2f}s)\n"
+    )
+    logger(result_message)
+    return result_message
+
+
+def _import_app_table_data_from_file(
+    app_table, config, source_file, records, dry_run, logger, batch_size, backend, related_id_maps, metrics,
+    table_names=None,
+):
+    """
+    Import data for a single app table from a JSON file, upserting changed records in batches.
+
+    Related objects are resolved through id maps that are built once per related table and
+    shared across app tables through 'related_id_maps'. Returns the result message, the
+    upserter, which holds the changed keys, and whether every record was imported with all of
+    its relationships.
+
+    'table_names' maps models to the tables to load into instead of their own (copy backend only).
+    Rows and database time are counted in the current stage of 'metrics'.
+    """
     logger(f"\nImporting '{app_table}' from '{source_file}'...")
 
-    model = config["model"]
+    skipped_count = 0
+    upserter = _build_upserter(config, batch_size, backend, table_names)
+    relationships = config.get("relationships", {})
+    if not dry_run and not upserter.resolves_relationships:
+        # parent tables are imported first, so their maps are complete by now
+        for rel_config in relationships.values():
+            _get_related_id_map(rel_config, related_id_maps)
+    # relationship field -> missing lookup values, reported once the whole file is read
+    unresolved = {model_field: [] for model_field in relationships}
 
-    try:
-        with open(source_file, "r") as f:
-            canonical_records = json.load(f)
-            logger(f"Loaded {len(canonical_records)} records from source file.")
-    except FileNotFoundError as e:
-        raise FileNotFoundError(f"Source file '{source_file}' not found") from e
+    record_count = 0
 
-    created_count, updated_count, skipped_count = 0, 0, 0
+    # records are read a bounded number at a time, so memory use does not grow with the file
+    for canonical_record in records:
+        record_count += 1
+        metrics.row_read()
 
-    for canonical_record in canonical_records:
         defaults = {
             app_field: canonical_record.get(nasa_field)
             for nasa_field, app_field in config["field_map"].items()
@@ -153,23 +398,122 @@ def _import_app_table_data_from_file(app_table, config, dry_run, logger):
         if dry_run:
             continue
 
-        if "relationships" in config:
-            _link_relationships(defaults, canonical_record, config["relationships"])
+        related_lookups = _get_related_lookups(canonical_record, relationships)
+        values = {**lookup, **defaults}
+        values["source_hash"] = _hash_record(config["model"], values, related_lookups)
 
-        _, created = model.objects.update_or_create(**lookup, defaults=defaults)
-        if created:
-            created_count += 1
-        else:
-            updated_count += 1
+        if not upserter.resolves_relationships and not _link_relationships(
+            values, related_lookups, config["model"], relationships, related_id_maps, unresolved
+        ):
+            skipped_count += 1
+            continue
 
-    result_message = f"'{app_table}' import finished. Created: {created_count}, Updated: {updated_count}, Skipped: {skipped_count}\n"
+        with metrics.database_time():
+            upserter.add(values, related_lookups)
+
+    with metrics.database_time():
+        upserter.finish()
+    if upserter.resolves_relationships:
+        unresolved = upserter.unresolved
+        skipped_count += upserter.skipped_count
+    logger(f"Read {record_count} records from source file.")
+
+    for model_field, missing in unresolved.items():
+        if missing:
+            _log_unresolved_relationship(app_table, model_field, relationships[model_field], missing, logger)
+
+    result_message = (
+        f"'{app_table}' import finished. Created: {upserter.created_count}, Updated: {upserter.updated_count}, "
+        f"Unchanged: {upserter.unchanged_count}, Skipped: {skipped_count}\n"
+    )
+    logger(result_message)
+    return result_message, upserter, not skipped_count and not any(unresolved.values())
+
+
+def _resolve_source_file(source_file):
+    """
+    Returns the binary version of a canonical JSON file when it is at least as recent as the
+    JSON file, which is then only kept as a readable debug copy.
+    """
+    json_file = Path(source_file)
+    binary_file = json_file.with_suffix(CANONICAL_BINARY_SUFFIX)
+
+    if binary_file.exists() and (not json_file.exists() or binary_file.stat().st_mtime >= json_file.stat().st_mtime):
+        return binary_file
+    return json_file
+
+
+def _prune_app_table(app_table, upserter, is_complete, logger):
+    """
+    Deletes the rows of an app table that are no longer in its source file, unless some of its
+    records were skipped or left unlinked ('is_complete' is false), whose rows would be deleted
+    along with anything that cascades from them.
+    """
+    if not is_complete:
+        logger(f"WARNING: Not pruning '{app_table}' because some of its records could not be imported.")
+        return ""
+
+    if not (upserter.created_count or upserter.updated_count or upserter.unchanged_count):
+        # an empty source file is far more likely to be a failed export than an empty catalog
+        logger(f"WARNING: Not pruning '{app_table}' because no valid records were imported.")
+        return ""
+
+    upserter.delete_missing()
+
+    result_message = f"'{app_table}' pruned. Deleted: {upserter.deleted_count}\n"
     logger(result_message)
     return result_message
 
 
+def _resolve_import_backend(backend):
+    if backend not in IMPORT_BACKENDS:
+        raise ValueError(f"Unknown import backend '{backend}', expected one of {IMPORT_BACKENDS}")
+
+    if backend == "auto":
+        return "copy" if connection.vendor == "postgresql" else "orm"
+    if backend == "copy" and connection.vendor != "postgresql":
+        raise ValueError("The 'copy' import backend requires PostgreSQL")
+    return backend
+
+
+def _build_upserter(config, batch_size, backend, table_names=None):
+    """
+    Builds the batch upserter of the backend for an app table, updating every mapped and
+    related field and keeping the content hash of each record in 'source_hash'.
+    """
+    unique_on = config["unique_on"]
+    unique_fields = unique_on if isinstance(unique_on, list) else [unique_on]
+
+    update_fields = [
+        app_field for app_field in config["field_map"].values() if app_field not in unique_fields
+    ]
+    update_fields += list(config.get("relationships", {}))
+
+    if backend == "copy":
+        return CopyUpserter(
+            config["model"], unique_fields, update_fields, config.get("relationships", {}), "source_hash",
+            batch_size=batch_size, table_names=table_names,
+        )
+    return BulkUpserter(
+        config["model"], unique_fields, update_fields, batch_size=batch_size, hash_field="source_hash"
+    )
+
+
+def _hash_record(model, values, related_lookups):
+    """
+    Returns a stable hash of the normalized field values of a record and the lookup values of
+    its related objects, which does not depend on the ids the related objects happen to have.
+    """
+    normalized = {name: model._meta.get_field(name).to_python(value) for name, value in values.items()}
+    normalized.update(related_lookups)
+
+    payload = json.dumps(normalized, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
 def _build_lookup(defaults, config):
     """
-    Builds the lookup dictionary for update_or_create and validates identifiers.
+    Builds the lookup dictionary of unique field values and validates identifiers.
     """
     unique_on = config["unique_on"]
     if isinstance(unique_on, list):
@@ -184,15 +528,69 @@ def _build_lookup(defaults, config):
         return {unique_on: value}
 
 
-def _link_relationships(defaults, canonical_record, relationships_config):
+def _get_related_id_map(rel_config, related_id_maps):
     """
-    Fetches related objects and adds them to the defaults.
+    Returns a map from the lookup field values of the related model to its primary key,
+    loading it with a single query the first time it is needed.
     """
-    for model_field, rel_config in relationships_config.items():
-        related_model = rel_config["model"]
-        lookup = {
-            field: canonical_record.get(key) for field, key in
-            zip(rel_config["lookup_fields"], rel_config["lookup_keys"])
+    related_model = rel_config["model"]
+    lookup_fields = rel_config["lookup_fields"]
+    map_key = (related_model, tuple(lookup_fields))
+
+    if map_key not in related_id_maps:
+        related_id_maps[map_key] = {
+            tuple(row[1:]): row[0]
+            for row in related_model.objects.values_list("pk", *lookup_fields).iterator()
         }
-        related_obj = related_model.objects.get(**lookup)
-        defaults[model_field] = related_obj
+    return related_id_maps[map_key]
+
+
+def _get_related_lookups(canonical_record, relationships_config):
+    """
+    Returns the normalized lookup values of each related object of a canonical record.
+    """
+    return {
+        model_field: tuple(
+            rel_config["model"]._meta.get_field(field).to_python(canonical_record.get(key))
+            for field, key in zip(rel_config["lookup_fields"], rel_config["lookup_keys"], strict=True)
+        )
+        for model_field, rel_config in relationships_config.items()
+    }
+
+
+def _link_relationships(values, related_lookups, model, relationships_config, related_id_maps, unresolved):
+    """
+    Resolves related object ids from the preloaded id maps and adds them to the values.
+
+    A reference that cannot be resolved is recorded in 'unresolved'. Optional relationships
+    are then left empty, while a missing required one makes the record invalid, in which case
+    False is returned.
+    """
+    is_valid = True
+    for model_field, rel_config in relationships_config.items():
+        lookup_values = related_lookups[model_field]
+        related_id = _get_related_id_map(rel_config, related_id_maps).get(lookup_values)
+
+        if related_id is None:
+            unresolved[model_field].append(lookup_values)
+            if not model._meta.get_field(model_field).null:
+                is_valid = False
+
+        values[f"{model_field}_id"] = related_id
+
+    return is_valid
+
+
+def _log_unresolved_relationship(app_table, model_field, rel_config, missing, logger, sample_size=5):
+    """
+    Logs a single summary of the references to a related model that could not be resolved.
+    """
+    related_model_name = rel_config["model"].__name__
+    sample = ", ".join(
+        "/".join(str(value) for value in lookup_values) for lookup_values in missing[:sample_size]
+    )
+    more = f" and {len(missing) - sample_size} more" if len(missing) > sample_size else ""
+    logger(
+        f"WARNING: {len(missing)} '{app_table}' records reference a {related_model_name} ({model_field}) "
+        f"that does not exist: {sample}{more}"
+    )
@@ -0,0 +1,290 @@
+import itertools
+import json
+import struct
+import zlib
+from pathlib import Path
+
+# number of characters read from a canonical file at a time
+READ_CHUNK_SIZE = 64 * 1024
+
+# the binary format: magic, then a length-prefixed JSON header with the column schema, then
+# row groups, each a length and CRC-32 prefixed (optionally zlib compressed) payload: the row
+# count, then every column in turn as one presence byte per row followed by its present values,
+# little-endian int64 or float64, one byte per bool, or length-prefixed UTF-8 strings. The magic
+# is bumped whenever the layout changes
+CANONICAL_BINARY_SUFFIX = ".cbin"
+CANONICAL_BINARY_MAGIC = b"EXOCBIN\x02"
+CANONICAL_BINARY_MAGIC_PREFIX = b"EXOCBIN"
+CANONICAL_BINARY_ROW_GROUP_SIZE = 1024
+_BLOCK_PREFIX = struct.Struct("<II")
+_ROW_COUNT = struct.Struct("<I")
+
+# struct codes of the fixed width column types
+_FIXED_WIDTH_CODES = {
+    "int64": "q",
+    "float64": "d",
+}
+
+
+class CanonicalFileError(ValueError):
+    pass
+
+
+def iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yields the items of a top-level JSON array from a text file, one at a time.
+
+    Only the current chunk and the item being decoded are held in memory, so memory use does
+    not grow with the size of the file.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def read_more():
+        nonlocal buffer, position, eof
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        # drop what has already been consumed
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    def next_token():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if eof:
+                raise CanonicalFileError("Unexpected end of file in JSON array")
+            read_more()
+
+    if next_token() != "[":
+        raise CanonicalFileError("Canonical file does not contain a JSON array")
+    position += 1
+
+    if next_token() == "]":
+        return
+
+    while True:
+        next_token()
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+            # a number at the very end of the buffer may continue in the next chunk
+            is_complete = end < len(buffer) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            is_complete = False
+
+        if not is_complete:
+            # the item is split across chunks, so read more and decode it again
+            read_more()
+            continue
+
+        position = end
+        yield item
+
+        separator = next_token()
+        position += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise CanonicalFileError(f"Unexpected character {separator!r} in JSON array")
+
+
+def iter_canonical_records(source_file):
+    """
+    Yields the records of a canonical data file, binary or JSON depending on its suffix.
+    """
+    if Path(source_file).suffix == CANONICAL_BINARY_SUFFIX:
+        with open(source_file, "rb") as f:
+            yield from iter_canonical_binary(f)
+    else:
+        with open(source_file) as f:
+            yield from iter_json_array(f)
+
+
+def write_canonical_binary(
+    records, f, column_types=None, row_group_size=CANONICAL_BINARY_ROW_GROUP_SIZE, compress=True
+):
+    """
+    Writes a list of canonical records (dicts) to a binary file.
+
+    'column_types' maps fields to the type they are stored as, 'int64' or 'float64', so that
+    numeric strings from the TAP service are stored as numbers; a column with a value that does
+    not fit its type is stored with the type of its values instead. The other columns are stored
+    with the type of their values ('int64', 'float64', 'bool' or 'str'). Missing values are
+    stored as None.
+    """
+    column_types = column_types or {}
+    names = []
+    for record in records:
+        for name in record:
+            if name not in names:
+                names.append(name)
+
+    columns = [_typed_column(name, [record.get(name) for record in records], column_types.get(name)) for name in names]
+
+    header = json.dumps({
+        "columns": [{"name": name, "type": column_type} for name, (column_type, _) in zip(names, columns, strict=True)],
+        "row_count": len(records),
+        "compression": "zlib" if compress else None,
+    }).encode()
+
+    f.write(CANONICAL_BINARY_MAGIC)
+    _write_block(f, header)
+
+    for start in range(0, len(records), row_group_size):
+        payload = bytearray(_ROW_COUNT.pack(min(row_group_size, len(records) - start)))
+        for column_type, values in columns:
+            payload += _encode_column(column_type, values[start:start + row_group_size])
+        _write_block(f, zlib.compress(payload, 6) if compress else bytes(payload))
+
+
+def iter_canonical_binary(f):
+    """
+    Yields the records of a binary canonical file as dicts, one row group at a time.
+    """
+    magic = f.read(len(CANONICAL_BINARY_MAGIC))
+    if magic != CANONICAL_BINARY_MAGIC:
+        if magic.startswith(CANONICAL_BINARY_MAGIC_PREFIX):
+            raise CanonicalFileError("Canonical binary file is in an older format, consolidate the data again")
+        raise CanonicalFileError("Not a canonical binary file")
+
+    header = json.loads(_read_block(f))
+    names = [column["name"] for column in header["columns"]]
+    types = [column["type"] for column in header["columns"]]
+    is_compressed = header["compression"] == "zlib"
+
+    row_count = 0
+    while row_count < header["row_count"]:
+        payload = _read_block(f)
+        if is_compressed:
+            payload = zlib.decompress(payload)
+
+        (group_size,) = _ROW_COUNT.unpack_from(payload)
+        offset = _ROW_COUNT.size
+        columns = []
+        for column_type in types:
+            values, offset = _decode_column(column_type, payload, offset, group_size)
+            columns.append(values)
+
+        for row in zip(*columns, strict=True):
+            yield dict(zip(names, row, strict=True))
+        row_count += group_size
+
+
+def _typed_column(name, values, declared_type):
+    """
+    Returns the type a column is stored as and its values converted to it.
+    """
+    if declared_type is not None:
+        convert = _CONVERTERS[declared_type]
+        try:
+            return declared_type, [None if value is None else convert(value) for value in values]
+        except (TypeError, ValueError, OverflowError):
+            pass
+
+    value_types = {type(value) for value in values if value is not None}
+    if not value_types or value_types == {str}:
+        return "str", values
+    if value_types == {bool}:
+        return "bool", values
+    if value_types == {float}:
+        return "float64", values
+    if value_types == {int}:
+        try:
+            return "int64", [None if value is None else _to_int64(value) for value in values]
+        except OverflowError:
+            pass
+    type_names = sorted(value_type.__name__ for value_type in value_types)
+    raise CanonicalFileError(f"Column '{name}' cannot be stored with values of types {type_names}")
+
+
+def _to_int64(value):
+    # a float or bool would not read back the same
+    if isinstance(value, (bool, float)):
+        raise TypeError(f"Not an integer: {value!r}")
+    value = int(value)
+    if not -2 ** 63 <= value < 2 ** 63:
+        raise OverflowError(f"Integer out of range: {value}")
+    return value
+
+
+def _to_float64(value):
+    if isinstance(value, bool):
+        raise TypeError(f"Not a number: {value!r}")
+    return float(value)
+
+
+_CONVERTERS = {
+    "int64": _to_int64,
+    "float64": _to_float64,
+}
+
+
+def _encode_column(column_type, values):
+    present = [value for value in values if value is not None]
+    data = bytearray(value is not None for value in values)
+
+    if column_type in _FIXED_WIDTH_CODES:
+        data += struct.pack(f"<{len(present)}{_FIXED_WIDTH_CODES[column_type]}", *present)
+    elif column_type == "bool":
+        data += bytes(present)
+    else:
+        encoded = [value.encode() for value in present]
+        data += struct.pack(f"<{len(encoded)}I", *(len(value) for value in encoded))
+        data += b"".join(encoded)
+    return data
+
+
+def _decode_column(column_type, payload, offset, row_count):
+    presence = payload[offset:offset + row_count]
+    offset += row_count
+    count = presence.count(1)
+
+    if column_type in _FIXED_WIDTH_CODES:
+        values = struct.unpack_from(f"<{count}{_FIXED_WIDTH_CODES[column_type]}", payload, offset)
+        offset += count * 8
+    elif column_type == "bool":
+        values = [byte == 1 for byte in payload[offset:offset + count]]
+        offset += count
+    elif column_type == "str":
+        lengths = struct.unpack_from(f"<{count}I", payload, offset)
+        offset += count * 4
+        data = payload[offset:offset + sum(lengths)]
+        offset += len(data)
+        text = data.decode()
+        spans = itertools.pairwise(itertools.accumulate(lengths, initial=0))
+        if len(text) == len(data):
+            # only single byte characters, so the byte lengths also split the decoded text
+            values = [text[start:end] for start, end in spans]
+        else:
+            values = [data[start:end].decode() for start, end in spans]
+    else:
+        raise CanonicalFileError(f"Unknown column type '{column_type}' in canonical binary file")
+
+    if count == row_count:
+        return list(values), offset
+    present = iter(values)
+    return [next(present) if is_present else None for is_present in presence], offset
+
+
+def _write_block(f, data):
+    f.write(_BLOCK_PREFIX.pack(len(data), zlib.crc32(data)))
+    f.write(data)
+
+
+def _read_block(f):
+    prefix = f.read(_BLOCK_PREFIX.size)
+    if len(prefix) != _BLOCK_PREFIX.size:
+        raise CanonicalFileError("Unexpected end of canonical binary file")
+
+    length, checksum = _BLOCK_PREFIX.unpack(prefix)
+    data = f.read(length)
+    if len(data) != length or zlib.crc32(data) != checksum:
+        raise CanonicalFileError("Canonical binary file is truncated or corrupt")
+    return data
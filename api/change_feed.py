@@ -0,0 +1,210 @@
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CatalogChange
+
+# Redis channel every import's changes are published on
+CHANGE_FEED_CHANNEL = "catalog:changes"
+
+# number of changes per published message, so that a first import does not publish one huge message
+CHANGE_FEED_MESSAGE_SIZE = 1000
+
+# number of changes written to the log per INSERT
+CHANGE_FEED_BATCH_SIZE = 1000
+
+# seconds a process waits before listening again after losing its connection to Redis
+CHANGE_FEED_RECONNECT_SECONDS = 5.0
+
+_subscribers = []
+_subscribers_lock = threading.Lock()
+
+# id of the process whose listener thread is running, and whether it is subscribed right now
+_listener_pid = None
+_listener_lock = threading.Lock()
+_is_listening = threading.Event()
+
+
+def subscribe(callback):
+    """
+    Calls 'callback' with every message of the change feed that reaches this process: the
+    changes of an import made here, or relayed from Redis by listen() (see start_listener()). A message is a dictionary
+    with the 'import_id', the 'data_version' the changes were committed under and the 'changes',
+    each a dictionary of its 'entity_type' (app table), 'operation', 'key', 'old_hash' and
+    'new_hash'. Returns the callback, so that it can be used as a decorator.
+    """
+    with _subscribers_lock:
+        if callback not in _subscribers:
+            _subscribers.append(callback)
+    return callback
+
+
+def unsubscribe(callback):
+    with _subscribers_lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def build_change(entity_type, operation, key, old_hash=None, new_hash=None):
+    # keys of several fields are tuples, which are lists once they have been through JSON
+    return {
+        "entity_type": entity_type,
+        "operation": operation,
+        "key": list(key) if isinstance(key, tuple) else key,
+        "old_hash": old_hash,
+        "new_hash": new_hash,
+    }
+
+
+def record_changes(import_id, data_version, changes):
+    """
+    Writes changes to the change feed log, in the caller's transaction so that they are
+    committed with the rows they describe, and removes the entries older than
+    CATALOG_CHANGE_FEED_RETENTION_DAYS.
+    """
+    CatalogChange.objects.bulk_create(
+        (CatalogChange(import_id=import_id, data_version=data_version, **change) for change in changes),
+        batch_size=CHANGE_FEED_BATCH_SIZE,
+    )
+
+    expired_before = timezone.now() - timedelta(days=settings.CATALOG_CHANGE_FEED_RETENTION_DAYS)
+    CatalogChange.objects.filter(created_at__lt=expired_before).delete()
+
+
+def publish_changes(import_id, data_version, changes, logger=print):
+    """
+    Notifies the subscribers of this process of committed changes, then publishes them on
+    CHANGE_FEED_CHANNEL in messages of at most CHANGE_FEED_MESSAGE_SIZE changes, when
+    CATALOG_CHANGE_FEED_REDIS_URL is set.
+
+    Failing subscribers or a failing Redis are reported rather than raised, since the import is
+    committed by now. The log is complete either way, see changes_since().
+    """
+    messages = [
+        {
+            "import_id": str(import_id),
+            "data_version": data_version,
+            "part": part,
+            "parts": max(1, -(-len(changes) // CHANGE_FEED_MESSAGE_SIZE)),
+            "changes": changes[start:start + CHANGE_FEED_MESSAGE_SIZE],
+        }
+        for part, start in enumerate(range(0, max(len(changes), 1), CHANGE_FEED_MESSAGE_SIZE), start=1)
+    ]
+
+    for message in messages:
+        _notify_subscribers(message, logger)
+
+    if not settings.CATALOG_CHANGE_FEED_REDIS_URL:
+        return
+
+    try:
+        client = redis.Redis.from_url(settings.CATALOG_CHANGE_FEED_REDIS_URL)
+        try:
+            for message in messages:
+                client.publish(CHANGE_FEED_CHANNEL, json.dumps(message, default=str))
+        finally:
+            client.close()
+    except redis.RedisError as e:
+        logger(f"WARNING: Could not publish the change feed to Redis ({e}), it is only in the log")
+        return
+
+    logger(f"Published {len(changes)} changes to '{CHANGE_FEED_CHANNEL}'.")
+
+
+def listen(logger=print):
+    """
+    Relays the messages published on CHANGE_FEED_CHANNEL by other processes to the subscribers
+    of this one, until interrupted. Requires CATALOG_CHANGE_FEED_REDIS_URL.
+    """
+    client = redis.Redis.from_url(settings.CATALOG_CHANGE_FEED_REDIS_URL)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    try:
+        pubsub.subscribe(CHANGE_FEED_CHANNEL)
+        _is_listening.set()
+        logger(f"Listening for changes on '{CHANGE_FEED_CHANNEL}'.")
+        for message in pubsub.listen():
+            try:
+                data = json.loads(message["data"])
+            except ValueError as e:
+                # anything can be published on the channel, and one bad message must not stop the relay
+                logger(f"WARNING: Ignoring a malformed change feed message: {e}")
+                continue
+            _notify_subscribers(data, logger)
+    finally:
+        _is_listening.clear()
+        pubsub.close()
+        client.close()
+
+
+def start_listener(logger=print):
+    """
+    Starts relaying the change feed from Redis to the subscribers of this process in a
+    background thread, once per process (a forked worker starts its own), reconnecting whenever
+    the connection is lost. Does nothing without CATALOG_CHANGE_FEED_REDIS_URL.
+    """
+    global _listener_pid
+
+    if not settings.CATALOG_CHANGE_FEED_REDIS_URL or _listener_pid == os.getpid():
+        return
+
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+        threading.Thread(
+            target=_listen_forever, args=(logger,), name="catalog-change-feed", daemon=True
+        ).start()
+
+
+def is_listening():
+    """
+    Whether this process is subscribed to the change feed in Redis right now, so that it is told
+    of every import as it is committed.
+    """
+    return _is_listening.is_set()
+
+
+def _listen_forever(logger):
+    while True:
+        try:
+            listen(logger=logger)
+        except redis.RedisError as e:
+            logger(
+                f"WARNING: Lost the change feed connection to Redis ({e}), "
+                f"listening again in {CHANGE_FEED_RECONNECT_SECONDS:g}s"
+            )
+        time.sleep(CHANGE_FEED_RECONNECT_SECONDS)
+
+
+def changes_since(change_id, entity_types=None):
+    """
+    Returns the logged changes after the change with the given id, oldest first, e.g. for a
+    subscriber catching up on what it missed.
+    """
+    changes = CatalogChange.objects.filter(pk__gt=change_id).order_by("pk")
+    if entity_types is not None:
+        changes = changes.filter(entity_type__in=entity_types)
+    return changes
+
+
+def get_last_change():
+    return CatalogChange.objects.order_by("-pk").first()
+
+
+def _notify_subscribers(message, logger):
+    with _subscribers_lock:
+        subscribers = list(_subscribers)
+
+    for callback in subscribers:
+        # subscribers refresh caches, which may be unreachable for a moment, and a failing one
+        # must neither keep the others from the message nor stop the relay that delivers it
+        try:
+            callback(message)
+        except Exception as e:  # noqa: BLE001
+            logger(f"WARNING: A change feed subscriber failed: {e!r}")
@@ -0,0 +1,351 @@
+import io
+
+from django.db import connection
+
+from .bulk_upsert import count_cascades, iter_changes
+
+# sequence column of the staging table, so that the last of several rows with the same key wins
+_SEQUENCE_COLUMN = "staging_seq"
+
+
+class CopyUpserter:
+    """
+    Upserts rows of a model on Postgres through a staging table, with the same counters,
+    changed keys and changes() as BulkUpserter.
+
+    The keys and hashes of the existing rows are loaded up front, so that unchanged rows are
+    never staged. Changed rows are streamed into a temporary (unlogged, transaction scoped)
+    staging table with COPY, in batches. On finish(), related objects are resolved with joins
+    against their tables and the live table is merged with a single INSERT ... ON CONFLICT DO
+    UPDATE statement.
+    """
+
+    # related objects are resolved by the database, from the lookup values given to add()
+    resolves_relationships = True
+
+    def __init__(
+        self, model, unique_fields, update_fields, relationships, hash_field, batch_size=5000, table_names=None
+    ):
+        self.model = model
+        self.unique_fields = list(unique_fields)
+        self.hash_field = hash_field
+        self.relationships = relationships
+        self.batch_size = batch_size
+        # model -> table name or (schema, table name), for loading into tables other than the
+        # models' own, e.g. shadow copies
+        self.table_names = table_names or {}
+
+        self.created_count = 0
+        self.updated_count = 0
+        self.unchanged_count = 0
+        self.deleted_count = 0
+        self.skipped_count = 0
+
+        self.inserted_keys = []
+        self.updated_keys = []
+        self.deleted_keys = []
+        # changed key -> (stored hash, new hash), None for a row that did not or no longer exists
+        self.changed_hashes = {}
+        # model -> rows deleted along with the missing rows, through on_delete=CASCADE
+        self.cascaded_counts = {}
+        # relationship field -> lookup values that did not match a related row
+        self.unresolved = {model_field: [] for model_field in relationships}
+
+        opts = model._meta
+        self._value_fields = [
+            opts.get_field(name) for name in self.unique_fields + list(update_fields) + [hash_field]
+            if name not in relationships
+        ]
+        self._lookup_columns = {
+            model_field: [
+                (f"{model_field}__{lookup_field}", rel_config["model"]._meta.get_field(lookup_field))
+                for lookup_field in rel_config["lookup_fields"]
+            ]
+            for model_field, rel_config in relationships.items()
+        }
+
+        self._key_fields = [opts.get_field(name) for name in self.unique_fields]
+        # existing key -> (pk, stored hash)
+        self._existing = {
+            tuple(row[1:-1]): (row[0], row[-1])
+            for row in model.objects.values_list("pk", *self.unique_fields, hash_field).iterator()
+        }
+        self._seen_keys = set()
+        self._unchanged_keys = set()
+
+        self._staging_table = f"staging_{model._meta.db_table}"
+        self._staging_created = False
+        self._buffer = io.StringIO()
+        self._buffered = 0
+        self._sequence = 0
+        self._missing = None
+
+    def add(self, values, related_lookups):
+        """
+        Queues a row, given as a dict of model field values and the lookup values of each related
+        object, and copies full batches into the staging table.
+        """
+        key = tuple(field.to_python(values[field.name]) for field in self._key_fields)
+        existing = self._existing.get(key)
+
+        if key not in self._seen_keys and existing is not None and existing[1] == values[self.hash_field]:
+            self.unchanged_count += 1
+            self._seen_keys.add(key)
+            self._unchanged_keys.add(key)
+            return
+
+        if key in self._unchanged_keys:
+            # a repeated key that does change the row after all
+            self._unchanged_keys.discard(key)
+            self.unchanged_count -= 1
+        self._seen_keys.add(key)
+
+        self._sequence += 1
+        row = [self._sequence]
+        row += [field.to_python(values.get(field.name)) for field in self._value_fields]
+        for model_field in self.relationships:
+            row += list(related_lookups[model_field])
+
+        self._buffer.write(",".join(_copy_value(value) for value in row))
+        self._buffer.write("\n")
+        self._buffered += 1
+
+        if self._buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Copies the queued rows into the staging table.
+        """
+        self._create_staging_table()
+        if not self._buffered:
+            return
+
+        columns = ", ".join(_quote(column) for column in self._staging_columns())
+        self._buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {self._staging()} ({columns}) FROM STDIN WITH (FORMAT csv)", self._buffer
+            )
+
+        self._buffer = io.StringIO()
+        self._buffered = 0
+
+    def finish(self):
+        """
+        Resolves related objects, merges the staged rows into the live table and releases the key
+        index, keeping only the ids of the existing rows that were never added, for delete_missing().
+        """
+        self.flush()
+
+        with connection.cursor() as cursor:
+            # temporary tables are never analyzed automatically, and the joins below need estimates
+            cursor.execute(f"ANALYZE {self._staging()}")
+
+            for model_field in self.relationships:
+                self._resolve_relationship(cursor, model_field)
+
+            cursor.execute(*self._merge_sql())
+            for row in cursor.fetchall():
+                key, new_hash, inserted = tuple(row[:-2]), row[-2], row[-1]
+                if inserted:
+                    self.created_count += 1
+                    self.inserted_keys.append(self._changeset_key(key))
+                    self.changed_hashes[self._changeset_key(key)] = (None, new_hash)
+                else:
+                    self.updated_count += 1
+                    self.updated_keys.append(self._changeset_key(key))
+                    self.changed_hashes[self._changeset_key(key)] = (self._existing.get(key, (None, None))[1], new_hash)
+
+        self._missing = [
+            (key, pk, stored_hash) for key, (pk, stored_hash) in self._existing.items() if key not in self._seen_keys
+        ]
+        self._existing = {}
+        self._seen_keys = set()
+        self._unchanged_keys = set()
+
+    def delete_missing(self):
+        """
+        Deletes the existing rows whose key was never added, through the ORM so that cascades
+        apply, and returns how many were deleted. Rows without a stored hash are kept.
+
+        Rows of a table other than the model's own are deleted directly, and their cascades are
+        left to the caller.
+        """
+        if self._missing is None:
+            self.finish()
+        # rows without a stored hash were last written by another importer, not from the source
+        self._missing = [missing for missing in self._missing if missing[2]]
+
+        for start in range(0, len(self._missing), self.batch_size):
+            pks = [pk for _, pk, _ in self._missing[start:start + self.batch_size]]
+            if self.model in self.table_names:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"DELETE FROM {self._live()} WHERE {_quote(self.model._meta.pk.column)} = ANY(%s)", [pks]
+                    )
+            else:
+                _, deleted = self.model.objects.filter(pk__in=pks).delete()
+                count_cascades(self.model, deleted, self.cascaded_counts)
+
+        self.deleted_count = len(self._missing)
+        self.deleted_keys = [self._changeset_key(key) for key, _, _ in self._missing]
+        for key, _, stored_hash in self._missing:
+            self.changed_hashes[self._changeset_key(key)] = (stored_hash, None)
+        self._missing = []
+        return self.deleted_count
+
+    def changes(self):
+        """
+        Yields the operation ('inserted', 'updated' or 'deleted'), key, stored hash and new hash
+        of every changed row.
+        """
+        yield from iter_changes(self)
+
+    def _resolve_relationship(self, cursor, model_field):
+        """
+        Records the staged rows whose related object does not exist. Rows missing a required
+        related object are removed from the staging table and counted as skipped.
+        """
+        rel_config = self.relationships[model_field]
+        lookup_columns = self._lookup_columns[model_field]
+        no_match = (
+            f"NOT EXISTS (SELECT 1 FROM {self._quote_table(rel_config['model'])} p "
+            f"WHERE {self._lookup_match(model_field, 's', 'p')})"
+        )
+
+        cursor.execute(
+            f"SELECT {', '.join('s.' + _quote(column) for column, _ in lookup_columns)} "
+            f"FROM {self._staging()} s WHERE {no_match} ORDER BY s.{_SEQUENCE_COLUMN}"
+        )
+        self.unresolved[model_field] = [tuple(row) for row in cursor.fetchall()]
+
+        if self.unresolved[model_field] and not self.model._meta.get_field(model_field).null:
+            cursor.execute(f"DELETE FROM {self._staging()} s WHERE {no_match} RETURNING {self._key_list('s')}")
+            skipped_keys = {tuple(row) for row in cursor.fetchall()}
+            self.skipped_count += len(skipped_keys)
+            # like records skipped by the ORM path, they do not keep their existing rows
+            self._seen_keys -= skipped_keys
+
+    def _merge_sql(self):
+        opts = self.model._meta
+        insert_columns = [field.column for field in self._value_fields]
+        select_columns = [f"s.{_quote(field.column)}" for field in self._value_fields]
+        joins = []
+
+        for index, (model_field, rel_config) in enumerate(self.relationships.items()):
+            alias = f"p{index}"
+            field = opts.get_field(model_field)
+            join = "LEFT JOIN" if field.null else "JOIN"
+            joins.append(
+                f"{join} {self._quote_table(rel_config['model'])} {alias} "
+                f"ON {self._lookup_match(model_field, 's', alias)}"
+            )
+            insert_columns.append(field.column)
+            select_columns.append(f"{alias}.{_quote(rel_config['model']._meta.pk.column)}")
+
+        update_columns = [column for column in insert_columns if column not in self._key_columns()]
+
+        # the remaining columns (e.g. the simulation eligibility flags) get their default when inserted
+        params = []
+        for field in opts.concrete_fields:
+            if field.primary_key or field.column in insert_columns:
+                continue
+            insert_columns.append(field.column)
+            select_columns.append(f"CAST(%s AS {field.db_type(connection)})")
+            params.append(field.get_db_prep_save(field.get_default(), connection))
+        if update_columns:
+            conflict_action = (
+                "DO UPDATE SET "
+                + ", ".join(f"{_quote(column)} = EXCLUDED.{_quote(column)}" for column in update_columns)
+                + f" WHERE l.{_quote(opts.get_field(self.hash_field).column)} IS DISTINCT FROM "
+                f"EXCLUDED.{_quote(opts.get_field(self.hash_field).column)}"
+            )
+        else:
+            conflict_action = "DO NOTHING"
+
+        sql = (
+            f"INSERT INTO {self._live()} AS l ({', '.join(_quote(column) for column in insert_columns)}) "
+            f"SELECT DISTINCT ON ({self._key_list('s')}) {', '.join(select_columns)} "
+            f"FROM {self._staging()} s {' '.join(joins)} "
+            f"ORDER BY {self._key_list('s')}, s.{_SEQUENCE_COLUMN} DESC "
+            f"ON CONFLICT ({', '.join(_quote(column) for column in self._key_columns())}) {conflict_action} "
+            # a row that did not exist before the statement has no deleting transaction id
+            f"RETURNING {self._key_list('l')}, l.{_quote(opts.get_field(self.hash_field).column)}, "
+            f"(l.xmax = 0) AS inserted"
+        )
+        return sql, params
+
+    def _create_staging_table(self):
+        if self._staging_created:
+            return
+
+        column_definitions = [f"{_SEQUENCE_COLUMN} bigint"]
+        column_definitions += [
+            f"{_quote(field.column)} {field.db_type(connection)}" for field in self._value_fields
+        ]
+        for lookup_columns in self._lookup_columns.values():
+            column_definitions += [
+                f"{_quote(column)} {field.db_type(connection)}" for column, field in lookup_columns
+            ]
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self._staging()}")
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {self._staging()} ({', '.join(column_definitions)}) ON COMMIT DROP"
+            )
+        self._staging_created = True
+
+    def _staging_columns(self):
+        columns = [_SEQUENCE_COLUMN] + [field.column for field in self._value_fields]
+        for lookup_columns in self._lookup_columns.values():
+            columns += [column for column, _ in lookup_columns]
+        return columns
+
+    def _key_columns(self):
+        return [self.model._meta.get_field(name).column for name in self.unique_fields]
+
+    def _key_list(self, alias):
+        return ", ".join(f"{alias}.{_quote(column)}" for column in self._key_columns())
+
+    def _lookup_match(self, model_field, staging_alias, related_alias):
+        conditions = []
+        for column, field in self._lookup_columns[model_field]:
+            # nullable lookup values match NULL, like the in-memory id maps of the ORM path
+            operator = "IS NOT DISTINCT FROM" if field.null else "="
+            conditions.append(f"{related_alias}.{_quote(field.column)} {operator} {staging_alias}.{_quote(column)}")
+        return " AND ".join(conditions)
+
+    def _quote_table(self, model):
+        table = self.table_names.get(model, model._meta.db_table)
+        if isinstance(table, tuple):
+            return ".".join(_quote(name) for name in table)
+        return _quote(table)
+
+    def _live(self):
+        return self._quote_table(self.model)
+
+    def _staging(self):
+        # qualified with the temporary schema, so that it can never refer to a regular table
+        return f"pg_temp.{_quote(self._staging_table)}"
+
+    def _changeset_key(self, key):
+        # single-field keys are reported as plain values
+        return key[0] if len(key) == 1 else tuple(key)
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _copy_value(value):
+    """
+    Formats a value for COPY in CSV format, where an unquoted empty value is NULL.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return '"' + str(value).replace('"', '""') + '"'
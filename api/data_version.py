@@ -0,0 +1,36 @@
+import time
+
+from .models import CatalogDataVersion
+
+# the one row holding the data version
+DATA_VERSION_ID = 1
+
+
+def get_data_version():
+    """
+    Returns the current catalog data version, an opaque token that changes on every import.
+
+    Anything derived from the catalog (in-process indexes, cached pages) can key on it to
+    know when it has gone stale. It is read from the database, so a version started by a worker
+    is seen by every web process.
+    """
+    version = CatalogDataVersion.objects.filter(pk=DATA_VERSION_ID).values_list("version", flat=True).first()
+    if version is None:
+        # a lost version starts a new one, so it can never match a previously seen version
+        row, _ = CatalogDataVersion.objects.get_or_create(pk=DATA_VERSION_ID, defaults={"version": new_data_version()})
+        version = row.version
+    return version
+
+
+def new_data_version():
+    return str(time.time_ns())
+
+
+def bump_data_version(version=None):
+    """
+    Starts a new catalog data version. Called by the importers once their changes are committed,
+    with the version their change feed was recorded under, if any.
+    """
+    version = version or new_data_version()
+    CatalogDataVersion.objects.update_or_create(pk=DATA_VERSION_ID, defaults={"version": version})
+    return version
@@ -0,0 +1,87 @@
+from django.apps import apps as django_apps
+from django.db.models import Q
+
+# the data each simulation needs, precomputed into an indexed boolean column per model
+SIMULATION_ELIGIBILITY = {
+    "StarSystem": {
+        "travel_sim_eligible": Q(distance_parsecs__isnull=False),
+    },
+    "Planet": {
+        "seasonality_sim_eligible": (
+            (
+                Q(host_star__luminosity_sun__isnull=False)
+                | (
+                    Q(host_star__radius_sun__isnull=False)
+                    & Q(host_star__effective_temperature_k__isnull=False)
+                )
+            )
+            & Q(semi_major_axis_au__isnull=False)
+            & Q(orbital_eccentricity__isnull=False)
+        ),
+        "tidal_locking_sim_eligible": (
+            Q(host_star__mass_sun__isnull=False)
+            & Q(host_star__age_gya__isnull=False)
+            & Q(mass_earth__isnull=False)
+            & Q(radius_earth__isnull=False)
+            & Q(semi_major_axis_au__isnull=False)
+        ),
+    },
+    "Star": {
+        "lifetime_sim_eligible": Q(mass_sun__isnull=False) & Q(age_gya__isnull=False),
+    },
+}
+
+# the app tables whose rows the flags of each model are computed from, and the lookup from
+# the names of their changed rows to the rows whose flags they can change
+SIMULATION_ELIGIBILITY_SOURCES = {
+    "StarSystem": {"star_systems": "name__in"},
+    "Planet": {"planets": "name__in", "stars": "host_star__name__in"},
+    "Star": {"stars": "name__in"},
+}
+
+# beyond this many changed names per model, its flags are recomputed for every row
+MAX_SCOPED_ELIGIBILITY_NAMES = 5000
+
+
+def refresh_simulation_eligibility(get_model=None, changed_names=None):
+    """
+    Recomputes the simulation eligibility flags, only writing rows whose flag changes.
+
+    'get_model' resolves a model name to a model class, so that migrations can pass
+    their historical models.
+
+    With 'changed_names' (app table -> names of its inserted and updated rows), only the flags
+    those rows can change are recomputed.
+    """
+    if get_model is None:
+        def get_model(model_name):
+            return django_apps.get_model("api", model_name)
+
+    for model_name, flags in SIMULATION_ELIGIBILITY.items():
+        model = get_model(model_name)
+        scope = _eligibility_scope(model_name, changed_names)
+        if scope is None:
+            continue
+        rows = model.objects.filter(scope)
+        for flag, condition in flags.items():
+            rows.filter(condition).exclude(**{flag: True}).update(**{flag: True})
+            rows.exclude(condition).exclude(**{flag: False}).update(**{flag: False})
+
+
+def _eligibility_scope(model_name, changed_names):
+    """
+    Returns the condition of the rows of a model whose flags may have changed, an empty one for
+    every row, or None if none did.
+    """
+    if changed_names is None:
+        return Q()
+
+    scope = None
+    for app_table, lookup in SIMULATION_ELIGIBILITY_SOURCES[model_name].items():
+        names = changed_names.get(app_table) or []
+        if len(names) > MAX_SCOPED_ELIGIBILITY_NAMES:
+            return Q()
+        if names:
+            condition = Q(**{lookup: names})
+            scope = condition if scope is None else scope | condition
+    return scope
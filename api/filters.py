@@ -1,4 +1,6 @@
+from django.db.models import Case, IntegerField, Q, Value, When
 from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
 
 from .models import Planet, Star, StarSystem
 from .widgets import LabeledRangeWidget
@@ -116,3 +118,61 @@ class StarSystemFilter(filters.FilterSet):
             "num_planets": ["exact"],
             "num_moons": ["exact"],
         }
+
+
+class IndexedSearchFilter(SearchFilter):
+    """
+    A drop-in replacement for DRF's SearchFilter that keeps ?search= index friendly.
+
+    Every term is still matched with 'icontains', but a related field such as 'host_star__name'
+    is matched with an IN subquery on the related table instead of a join, so each condition
+    can be answered by the trigram index on that table's name column. Results are ranked
+    (exact name, then name prefix, then any match) unless the client asks for an ordering.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+
+        if not search_fields or not search_terms:
+            return queryset
+
+        # lookup prefixes (^, =, @, $) are handled by the default implementation
+        if any(str(field)[0] in self.lookup_prefixes for field in search_fields):
+            return super().filter_queryset(request, queryset, view)
+
+        for term in search_terms:
+            conditions = Q()
+            for search_field in search_fields:
+                conditions |= self._build_condition(queryset.model, str(search_field), term)
+            queryset = queryset.filter(conditions)
+
+        return self._rank(queryset, str(search_fields[0]), search_terms)
+
+    @staticmethod
+    def _build_condition(model, search_field, term):
+        """
+        Builds the condition for a single search field, resolving one-hop relations with a subquery.
+        """
+        relation_name, _, related_field = search_field.partition("__")
+        if not related_field or "__" in related_field:
+            return Q(**{f"{search_field}__icontains": term})
+
+        related_model = model._meta.get_field(relation_name).related_model
+        related_ids = related_model.objects.filter(**{f"{related_field}__icontains": term}).values("pk")
+        return Q(**{f"{relation_name}__in": related_ids})
+
+    @staticmethod
+    def _rank(queryset, rank_field, search_terms):
+        """
+        Orders matches by relevance, keeping the queryset's own ordering as the tie-breaker.
+        """
+        search_rank = Case(
+            When(**{f"{rank_field}__iexact": " ".join(search_terms)}, then=Value(2)),
+            When(**{f"{rank_field}__istartswith": search_terms[0]}, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        return queryset.annotate(search_rank=search_rank).order_by(
+            "-search_rank", *queryset.query.order_by
+        )
@@ -0,0 +1,268 @@
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+from .models import ImportRun
+
+# stage of the work after the rows are loaded, e.g. pruning and committing, all database time
+FINALIZE_STAGE = "finalize"
+
+# least number of seconds between two progress reports
+PROGRESS_INTERVAL = 1.0
+
+# number of rows whose processing time makes up one sample of a stage's batch time histogram
+HISTOGRAM_BATCH_SIZE = 1000
+
+# upper bounds (in seconds) of the buckets of the batch time histograms, the last one is open
+HISTOGRAM_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+
+
+class ImportMetrics:
+    """
+    Collects the throughput of an import: the rows read and written by each stage (an app
+    table), how long each took and how much of that was spent in the database rather than
+    reading, parsing and hashing records, a histogram of the time taken per
+    HISTOGRAM_BATCH_SIZE rows, and the peak resident memory of the process during the import
+    and how much it grew over the memory the process held when the import started.
+
+    Memory is sampled with every batch of rows and at the end of every stage, so that a worker
+    process that ran a larger import before does not report that import's peak.
+
+    'on_progress' is called with progress() at most every PROGRESS_INTERVAL seconds while rows
+    are read, and whenever a stage starts or finishes. With 'expected_rows' (stage -> rows, e.g.
+    from the last run), progress includes how far along the import is.
+    """
+
+    def __init__(self, importer, stages, on_progress=None, expected_rows=None):
+        self.importer = str(importer)
+        self.stages = {stage: _new_stage_metrics() for stage in stages}
+        self.on_progress = on_progress
+        self.expected_rows = expected_rows or {}
+        self.current_stage = None
+
+        self._started_at = time.perf_counter()
+        self._completed_at = None
+        self._stage_started_at = None
+        self._batch_started_at = None
+        self._reported_at = 0.0
+
+        self._memory_at_start = get_resident_memory_mb()
+        self._peak_memory = self._memory_at_start
+
+    def start_stage(self, stage):
+        self.current_stage = stage
+        self._stage_started_at = self._batch_started_at = time.perf_counter()
+        self._report(force=True)
+
+    def finish_stage(self, rows_written=0, is_database=False):
+        """
+        Ends the current stage. With 'is_database', all of its time is counted as database time.
+        """
+        stage = self.stages[self.current_stage]
+        now = time.perf_counter()
+        stage["duration_seconds"] = now - self._stage_started_at
+        if is_database:
+            stage["db_seconds"] = stage["duration_seconds"]
+        stage["rows_written"] = rows_written
+        if stage["rows_read"] % HISTOGRAM_BATCH_SIZE:
+            self._add_batch_sample(stage, now)
+        else:
+            self._sample_memory(stage)
+        self._report(force=True)
+        self.current_stage = None
+
+    def row_read(self):
+        stage = self.stages[self.current_stage]
+        stage["rows_read"] += 1
+        if stage["rows_read"] % HISTOGRAM_BATCH_SIZE == 0:
+            now = time.perf_counter()
+            self._add_batch_sample(stage, now)
+            if now - self._reported_at >= PROGRESS_INTERVAL:
+                self._report()
+
+    @contextmanager
+    def database_time(self):
+        """
+        Counts the time spent in the block as database time of the current stage.
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[self.current_stage]["db_seconds"] += time.perf_counter() - started_at
+
+    def finish(self):
+        self._completed_at = time.perf_counter()
+
+    def progress(self):
+        """
+        The progress of the import, as reported to 'on_progress' and in the Celery task meta.
+        """
+        rows_read = sum(stage["rows_read"] for stage in self.stages.values())
+        elapsed = time.perf_counter() - self._started_at
+        expected = sum(self.expected_rows.get(stage, 0) for stage in self.stages)
+        return {
+            "importer": self.importer,
+            "stage": self.current_stage,
+            "stages_completed": sum(1 for stage in self.stages.values() if stage["duration_seconds"] is not None),
+            "stages_total": len(self.stages),
+            "rows_read": rows_read,
+            "rows_written": sum(stage["rows_written"] for stage in self.stages.values()),
+            "rows_per_second": _rate(rows_read, elapsed),
+            "elapsed_seconds": round(elapsed, 3),
+            "percent": min(100.0, round(100 * rows_read / expected, 1)) if expected else None,
+        }
+
+    def summary(self):
+        """
+        The totals of the import and the metrics of each stage, with the batch time histograms.
+        """
+        duration = (self._completed_at or time.perf_counter()) - self._started_at
+        stages = {name: _stage_summary(stage) for name, stage in self.stages.items()}
+        rows_read = sum(stage["rows_read"] for stage in stages.values())
+        db_seconds = sum(stage["db_seconds"] for stage in stages.values())
+        return {
+            "duration_seconds": round(duration, 3),
+            "rows_read": rows_read,
+            "rows_written": sum(stage["rows_written"] for stage in stages.values()),
+            "rows_per_second": _rate(rows_read, duration),
+            "db_seconds": round(db_seconds, 3),
+            "parse_seconds": round(sum(stage["parse_seconds"] for stage in stages.values()), 3),
+            "peak_memory_mb": self._peak_memory,
+            "memory_growth_mb": round(max(self._peak_memory - self._memory_at_start, 0.0), 1),
+            "stages": stages,
+        }
+
+    def summary_message(self):
+        summary = self.summary()
+        return (
+            f"Throughput: {summary['rows_read']} rows in {summary['duration_seconds']:.2f}s "
+            f"({summary['rows_per_second']:.0f} rows/s), database {summary['db_seconds']:.2f}s, "
+            f"parsing {summary['parse_seconds']:.2f}s, peak memory {summary['peak_memory_mb']:.0f} MB "
+            f"(+{summary['memory_growth_mb']:.0f} MB)\n"
+        )
+
+    def save(self, source, status, message="", task_id=""):
+        """
+        Records the run in the import history.
+        """
+        summary = self.summary()
+        return ImportRun.objects.create(
+            importer=self.importer,
+            source=source,
+            task_id=task_id or "",
+            status=status,
+            duration_seconds=summary["duration_seconds"],
+            rows_read=summary["rows_read"],
+            rows_written=summary["rows_written"],
+            rows_per_second=summary["rows_per_second"],
+            db_seconds=summary["db_seconds"],
+            parse_seconds=summary["parse_seconds"],
+            peak_memory_mb=summary["peak_memory_mb"],
+            memory_growth_mb=summary["memory_growth_mb"],
+            stages=summary["stages"],
+            message=message,
+        )
+
+    def _add_batch_sample(self, stage, now):
+        elapsed = now - self._batch_started_at
+        self._batch_started_at = now
+        stage["batch_seconds"].append(elapsed)
+        self._sample_memory(stage)
+
+    def _sample_memory(self, stage):
+        memory = get_resident_memory_mb()
+        stage["peak_memory_mb"] = max(stage["peak_memory_mb"] or 0.0, memory)
+        self._peak_memory = max(self._peak_memory, memory)
+
+    def _report(self, force=False):
+        if self.on_progress is None:
+            return
+        now = time.perf_counter()
+        if force or now - self._reported_at >= PROGRESS_INTERVAL:
+            self._reported_at = now
+            self.on_progress(self.progress())
+
+
+def get_expected_rows(importer, source):
+    """
+    Returns the rows each stage read in the last successful run of an importer, to estimate the
+    progress of the next one.
+    """
+    last_run = (
+        ImportRun.objects.filter(importer=importer, source=source, status=ImportRun.Status.SUCCESS)
+        .order_by("-started_at", "-pk")
+        .first()
+    )
+    if last_run is None:
+        return {}
+    return {name: stage["rows_read"] for name, stage in last_run.stages.items()}
+
+
+def get_resident_memory_mb():
+    """
+    The resident memory of the process, in MB. Where it cannot be read (outside Linux), the peak
+    resident memory of the process so far.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return round(resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except OSError:
+        pass
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes everywhere else
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _new_stage_metrics():
+    return {
+        "rows_read": 0,
+        "rows_written": 0,
+        "duration_seconds": None,
+        "db_seconds": 0.0,
+        "peak_memory_mb": None,
+        "batch_seconds": [],
+    }
+
+
+def _stage_summary(stage):
+    duration = stage["duration_seconds"] or 0.0
+    samples = sorted(stage["batch_seconds"])
+
+    # buckets in order, each with its upper bound ('lt'), None for the open one
+    histogram = [{"lt": bound, "count": 0} for bound in [*HISTOGRAM_BUCKETS, None]]
+    for sample in samples:
+        index = next((i for i, bound in enumerate(HISTOGRAM_BUCKETS) if sample < bound), len(HISTOGRAM_BUCKETS))
+        histogram[index]["count"] += 1
+
+    return {
+        "rows_read": stage["rows_read"],
+        "rows_written": stage["rows_written"],
+        "duration_seconds": round(duration, 3),
+        "rows_per_second": _rate(stage["rows_read"], duration),
+        "db_seconds": round(stage["db_seconds"], 3),
+        # everything but the database: reading, decoding, mapping and hashing the records
+        "parse_seconds": round(max(duration - stage["db_seconds"], 0.0), 3),
+        "peak_memory_mb": stage["peak_memory_mb"],
+        "batch_seconds": {
+            "rows_per_batch": HISTOGRAM_BATCH_SIZE,
+            "p50": round(_percentile(samples, 0.5), 4),
+            "p95": round(_percentile(samples, 0.95), 4),
+            "max": round(samples[-1], 4) if samples else 0.0,
+            "histogram": histogram,
+        },
+    }
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def _rate(rows, seconds):
+    return round(rows / seconds, 1) if seconds > 0 else 0.0
@@ -0,0 +1,121 @@
+import queue
+import threading
+
+# sentinel put on a reader queue once the source is exhausted
+_END = object()
+
+
+class ImportDependencyError(ValueError):
+    pass
+
+
+def resolve_import_levels(table_config):
+    """
+    Groups app tables into levels from their declared 'depends_on' tables (Kahn's algorithm).
+
+    Every table comes after all of its dependencies, and the tables within a level do not depend
+    on each other. Tables keep their declaration order within a level.
+    """
+    remaining = {app_table: set(config.get("depends_on", [])) for app_table, config in table_config.items()}
+
+    for app_table, dependencies in remaining.items():
+        unknown = dependencies - remaining.keys()
+        if unknown:
+            raise ImportDependencyError(f"'{app_table}' depends on unknown app tables: {sorted(unknown)}")
+
+    levels = []
+    while remaining:
+        level = [app_table for app_table, dependencies in remaining.items() if not dependencies]
+        if not level:
+            raise ImportDependencyError(f"Import dependencies contain a cycle between: {sorted(remaining)}")
+
+        for app_table in level:
+            del remaining[app_table]
+        for dependencies in remaining.values():
+            dependencies.difference_update(level)
+        levels.append(level)
+
+    return levels
+
+
+def find_critical_path(table_config, durations):
+    """
+    Returns the chain of dependent app tables with the longest total duration, and that duration.
+
+    This is the lower bound on the import time however many tables run concurrently.
+    """
+    # app table -> (duration of the longest chain ending with it, that chain)
+    longest = {}
+    for level in resolve_import_levels(table_config):
+        for app_table in level:
+            chain_duration, chain = max(
+                (longest[dependency] for dependency in table_config[app_table].get("depends_on", [])),
+                default=(0.0, []),
+                key=lambda item: item[0],
+            )
+            longest[app_table] = (chain_duration + durations.get(app_table, 0.0), [*chain, app_table])
+
+    if not longest:
+        return [], 0.0
+
+    duration, path = max(longest.values(), key=lambda item: item[0])
+    return path, duration
+
+
+class PrefetchingReader:
+    """
+    Iterates over records that are read on a background thread, up to 'max_chunks' chunks ahead.
+
+    Reading and decoding a file does not need the database, so the files of all app tables can be
+    read concurrently while the records of one table at a time are written. The bounded queue keeps
+    memory use independent of the file size.
+    """
+
+    def __init__(self, read_records, executor, chunk_size=1000, max_chunks=4):
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._closed = threading.Event()
+        self._future = executor.submit(self._read, read_records, chunk_size)
+
+    def __iter__(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is _END:
+                # surfaces an exception raised while reading
+                self._future.result()
+                return
+            yield from chunk
+
+    def close(self):
+        """
+        Stops the background read, e.g. when the import fails before the records are consumed.
+        """
+        self._closed.set()
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _read(self, read_records, chunk_size):
+        try:
+            chunk = []
+            for record in read_records():
+                chunk.append(record)
+                if len(chunk) >= chunk_size:
+                    if not self._put(chunk):
+                        return
+                    chunk = []
+            if chunk:
+                self._put(chunk)
+        finally:
+            self._put(_END)
+
+    def _put(self, item):
+        # a closed reader has no consumer left, so give up instead of blocking forever
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -1,10 +1,17 @@
 import csv
-from io import StringIO
+import uuid
 
 import requests
+from django.core.exceptions import FieldDoesNotExist
 from django.db import transaction
 
-from .models import Planet, PlanetDiscovery, Star, StarSystem
+from .bulk_upsert import BulkUpserter
+from .change_feed import publish_changes
+from .data_version import bump_data_version, new_data_version
+from .eligibility import refresh_simulation_eligibility
+from .import_metrics import FINALIZE_STAGE, ImportMetrics, get_expected_rows
+from .models import ImportRun, Planet, PlanetDiscovery, Star, StarSystem
+from .tap_cache import TapCacheError, fetch_tap_snapshot
 from .utils import build_nasa_tap_url
 
 COLUMN_MAPPING = {
@@ -109,9 +116,38 @@ TABLE_COLUMNS = {
 }
 
 
-def run_import(nasa_table, app_table, dry_run=False, logger=print):
+# number of rows written per INSERT ... ON CONFLICT statement
+DEFAULT_IMPORT_BATCH_SIZE = 1000
+
+# relationship fields that are set from the related id maps
+RELATED_FIELDS = ["system", "host_star", "discovery"]
+
+DISCOVERY_API_FIELDS = ["discoverymethod", "disc_year", "disc_locale", "disc_facility"]
+DISCOVERY_LOOKUP_FIELDS = ["method", "year", "locale", "facility"]
+
+# metrics stage of fetching the TAP response (or finding it in the cache)
+FETCH_STAGE = "fetch"
+
+
+def run_import(
+    nasa_table,
+    app_table,
+    dry_run=False,
+    logger=print,
+    batch_size=DEFAULT_IMPORT_BATCH_SIZE,
+    refresh=False,
+    offline=None,
+    on_progress=None,
+    task_id="",
+):
     """
     A Celery task to fetch data from NASA and populate the database
+
+    The response is served from the TAP snapshot cache when it is recent enough; 'refresh'
+    revalidates it with the service and 'offline' never touches the network.
+
+    While the import runs, 'on_progress' is called with its progress (see ImportMetrics), and
+    every import that is not a dry run is recorded in the import history (ImportRun).
     """
 
     logger(f"Starting import for '{app_table}'...")
@@ -127,22 +163,40 @@ def run_import(nasa_table, app_table, dry_run=False, logger=print):
         return "Import failed due to invalid arguments."
 
     url = build_nasa_tap_url(nasa_table, columns)
-    logger(f"Fetching data from: {url}")
+    source = f"{nasa_table}:{app_table}"
+    metrics = ImportMetrics(
+        ImportRun.Importer.NASA,
+        [FETCH_STAGE, app_table, FINALIZE_STAGE],
+        on_progress=on_progress,
+        expected_rows=get_expected_rows(ImportRun.Importer.NASA, source),
+    )
 
+    metrics.start_stage(FETCH_STAGE)
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
+        snapshot = fetch_tap_snapshot(url, logger=logger, refresh=refresh, offline=offline)
+    except (requests.exceptions.RequestException, TapCacheError) as e:
         logger(f"Failed to fetch data from NASA TAP service: {e}")
-        return f"Import failed: Could not fetch data. {e}"
+        result_message = f"Import failed: Could not fetch data. {e}"
+        if not dry_run:
+            metrics.finish()
+            metrics.save(source, ImportRun.Status.FAILURE, message=result_message, task_id=task_id)
+        return result_message
+    metrics.finish_stage()
 
-    csv_data = StringIO(response.text)
-    reader = csv.DictReader(csv_data)
     created_count, updated_count, skipped_count = 0, 0, 0
 
+    metrics.start_stage(app_table)
     try:
-        with transaction.atomic():
+        # rows are decompressed and parsed as they are read, so the response is never held in memory
+        with snapshot.open() as csv_file, transaction.atomic():
+            reader = csv.DictReader(csv_file)
+
+            upserter = None if dry_run else _build_upserter(meta, batch_size)
+            with metrics.database_time():
+                related_id_maps = None if dry_run else _load_related_id_maps(app_table)
+
             for row in reader:
+                metrics.row_read()
                 # any empty string is converted to None
                 cleaned_row = {k: v if v != "" else None for k, v in row.items()}
 
@@ -164,16 +218,15 @@ def run_import(nasa_table, app_table, dry_run=False, logger=print):
                         )
                         continue
 
-                    _add_related_objects_to_defaults(app_table, defaults, cleaned_row)
+                    _add_related_objects_to_defaults(app_table, defaults, cleaned_row, related_id_maps)
 
-                    _, created = model.objects.update_or_create(
-                        **lookup, defaults=defaults
-                    )
+                    # the row no longer matches the canonical record it was hashed from
+                    defaults["source_hash"] = ""
 
-                    if created:
-                        created_count += 1
-                    else:
-                        updated_count += 1
+                    # values are converted up front, so that a bad value skips its row instead of failing a batch
+                    values = _to_python(model, {**lookup, **defaults})
+                    with metrics.database_time():
+                        upserter.add(values)
                 except StarSystem.DoesNotExist:
                     logger(
                         f"Skipping star '{cleaned_row.get('hostname')}' because its host system '{cleaned_row.get('sy_name')}' does not exist. Import star systems first."
@@ -196,18 +249,52 @@ def run_import(nasa_table, app_table, dry_run=False, logger=print):
             # prevent committing empty transaction and carry out a rollback
             if dry_run:
                 raise InterruptedError("Dry run complete, rolling back transaction")
+
+            with metrics.database_time():
+                upserter.flush()
+            created_count, updated_count = upserter.created_count, upserter.updated_count
+            metrics.finish_stage(rows_written=created_count + updated_count)
+
+            metrics.start_stage(FINALIZE_STAGE)
+            refresh_simulation_eligibility()
+            data_version = new_data_version()
+            transaction.on_commit(lambda: bump_data_version(data_version))
+            # the rows it changed are not logged, so subscribers are only told that the catalog changed
+            transaction.on_commit(lambda: publish_changes(uuid.uuid4(), data_version, [], logger), robust=True)
+
+        metrics.finish_stage(is_database=True)
     except InterruptedError:
         logger("\n[DRY RUN] Finished. No changes were made to the database.")
         return "Dry run complete."
     except Exception as e:
         logger(f"An error occurred during the database transaction: {e}")
-        return f"Import failed: Transaction error. {e}"
+        result_message = f"Import failed: Transaction error. {e}"
+        if not dry_run:
+            metrics.finish()
+            metrics.save(source, ImportRun.Status.FAILURE, message=result_message, task_id=task_id)
+        return result_message
+
+    metrics.finish()
 
     result_message = f"Importing complete! Created: {created_count}, Updated: {updated_count}, Skipped: {skipped_count}"
     logger(result_message)
+    logger(metrics.summary_message())
+    metrics.save(source, ImportRun.Status.SUCCESS, message=result_message, task_id=task_id)
     return result_message
 
 
+def _build_upserter(meta, batch_size):
+    """Builds the batch upserter for an app table, updating every mapped and related field."""
+    model = meta["model"]
+    unique_fields = meta["unique_on"] if isinstance(meta["unique_on"], list) else [meta["unique_on"]]
+
+    update_fields = [field for field in meta["map"].values() if field not in unique_fields]
+    update_fields += [field for field in RELATED_FIELDS if _has_field(model, field)]
+    update_fields.append("source_hash")
+
+    return BulkUpserter(model, unique_fields, update_fields, batch_size=batch_size)
+
+
 def _build_defaults(row, field_map):
     """Builds a dictionary of model fields from the API row data"""
     return {
@@ -231,30 +318,62 @@ def _build_lookup(defaults, meta):
     return is_identifier_present, lookup
 
 
-def _add_related_objects_to_defaults(app_table, defaults, row):
-    """Fetches/creates related objects and adds them to the defaults. ONLY RUNS ON NON-DRY RUNS."""
+def _to_python(model, values):
+    """Converts raw API values to the Python types of their model fields."""
+    return {name: model._meta.get_field(name).to_python(value) for name, value in values.items()}
+
+
+def _has_field(model, name):
+    try:
+        model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+def _load_related_id_maps(app_table):
+    """
+    Loads the ids of the objects that the rows of an app table refer to, with one query per
+    related model, keyed by the values the rows refer to them with.
+    """
+    if app_table == "stars":
+        return {"system": dict(StarSystem.objects.values_list("name", "pk").iterator())}
+
+    if app_table == "planets":
+        return {
+            "host_star": dict(Star.objects.values_list("name", "pk").iterator()),
+            "discovery": {
+                tuple(row[1:]): row[0]
+                for row in PlanetDiscovery.objects.values_list("pk", *DISCOVERY_LOOKUP_FIELDS).iterator()
+            },
+        }
+
+    return {}
+
+
+def _add_related_objects_to_defaults(app_table, defaults, row, related_id_maps):
+    """Looks up related object ids and adds them to the defaults. ONLY RUNS ON NON-DRY RUNS."""
     if app_table == "stars":
-        system_name = row.get("sy_name")
-        if system_name:
-            system = StarSystem.objects.get(name=system_name)
-            defaults["system"] = system
+        # a star cannot be saved without its system, so a missing one skips the row
+        system_id = related_id_maps["system"].get(row.get("sy_name"))
+        if system_id is None:
+            raise StarSystem.DoesNotExist
+        defaults["system_id"] = system_id
 
     if app_table == "planets":
-        star_name = row.get("hostname")
-        if star_name:
-            star = Star.objects.get(name=star_name)
-            defaults["host_star"] = star
-
-        method = row.get("discoverymethod")
-        year = row.get("disc_year")
-        locale = row.get("disc_locale")
-        facility = row.get("disc_facility")
-
-        if any(field is not None for field in [method, year, locale, facility]):
-            discovery = PlanetDiscovery.objects.get(
-                method=method,
-                year=year,
-                locale=locale,
-                facility=facility,
+        star_id = related_id_maps["host_star"].get(row.get("hostname"))
+        if star_id is None:
+            raise Star.DoesNotExist
+        defaults["host_star_id"] = star_id
+
+        discovery_values = [row.get(api_field) for api_field in DISCOVERY_API_FIELDS]
+
+        if any(field is not None for field in discovery_values):
+            discovery_key = tuple(
+                PlanetDiscovery._meta.get_field(field).to_python(value)
+                for field, value in zip(DISCOVERY_LOOKUP_FIELDS, discovery_values, strict=True)
             )
-            defaults["discovery"] = discovery
+            discovery_id = related_id_maps["discovery"].get(discovery_key)
+            if discovery_id is None:
+                raise PlanetDiscovery.DoesNotExist
+            defaults["discovery_id"] = discovery_id
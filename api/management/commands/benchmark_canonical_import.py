@@ -0,0 +1,102 @@
+"""
+Compares the canonical import paths against the configured database: the original
+update_or_create loop, the ORM bulk path and, on Postgres, the COPY path.
+
+Every measurement runs in a transaction that is rolled back, so the database is left as it was.
+
+    python manage.py benchmark_canonical_import [--repeat 3]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api import canonical_data_importer as importer
+from api.canonical_files import iter_canonical_records
+from api.models import Planet, PlanetDiscovery, Star, StarSystem
+
+SCENARIOS = {
+    "fresh": "empty catalog tables",
+    "changed": "every record changed",
+    "unchanged": "no record changed",
+}
+
+
+def update_or_create_import():
+    """
+    The original import loop: a lookup per related object and an update_or_create per record.
+    """
+    for app_table in importer.IMPORT_ORDER:
+        config = importer.APP_TABLE_IMPORT_CONFIG[app_table]
+        model = config["model"]
+        for canonical_record in iter_canonical_records(importer._resolve_source_file(config["source_file"])):
+            defaults = {
+                app_field: canonical_record.get(nasa_field)
+                for nasa_field, app_field in config["field_map"].items()
+            }
+            lookup = importer._build_lookup(defaults, config)
+            if not lookup:
+                continue
+
+            for model_field, rel_config in config.get("relationships", {}).items():
+                related_lookup = {
+                    field: canonical_record.get(key)
+                    for field, key in zip(rel_config["lookup_fields"], rel_config["lookup_keys"], strict=True)
+                }
+                defaults[model_field] = rel_config["model"].objects.get(**related_lookup)
+
+            model.objects.update_or_create(**lookup, defaults=defaults)
+
+
+def bulk_import(backend):
+    importer.run_canonical_data_import(logger=lambda message: None, backend=backend)
+
+
+def prepare(scenario, run):
+    if scenario == "fresh":
+        for model in (Planet, Star, PlanetDiscovery, StarSystem):
+            model.objects.all().delete()
+    elif scenario == "changed":
+        run()
+        for model in (Planet, Star, PlanetDiscovery, StarSystem):
+            model.objects.update(source_hash="")
+    else:
+        run()
+
+
+def measure(scenario, run, repeat):
+    """
+    Returns the best wall time of 'repeat' runs, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        with transaction.atomic():
+            prepare(scenario, run)
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+            transaction.set_rollback(True)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = "Compare the wall time of the canonical import paths"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the best one is kept")
+        parser.add_argument(
+            "--skip-update-or-create", action="store_true", help="Skip the (slow) original import loop"
+        )
+
+    def handle(self, *args, **kwargs):
+        paths = {"orm": lambda: bulk_import("orm")}
+        if connection.vendor == "postgresql":
+            paths["copy"] = lambda: bulk_import("copy")
+        if not kwargs["skip_update_or_create"]:
+            paths = {"update_or_create": update_or_create_import, **paths}
+
+        self.stdout.write(f"database: {connection.vendor}")
+        for scenario, description in SCENARIOS.items():
+            self.stdout.write(f"\n{scenario} ({description})")
+            for name, run in paths.items():
+                self.stdout.write(f"  {name:<18} {measure(scenario, run, kwargs['repeat']):>8.2f} s")
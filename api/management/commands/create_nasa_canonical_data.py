@@ -6,9 +6,34 @@ from scripts.canonical_data_consolidater import run_canonical_data_consolidation
 class Command(BaseCommand):
     help = "Fetch data from NASA TAP service, consolidate data into canonical records, and save to JSON files"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            help="Revalidate cached TAP responses with the service, however recent they are",
+        )
+
+        parser.add_argument(
+            "--offline",
+            action="store_true",
+            help="Only replay cached TAP responses, never fetching from the service",
+        )
+
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Consolidate every record again, instead of only those whose NASA rows changed",
+        )
+
     def handle(self, *args, **kwargs):
         try:
-            result = run_canonical_data_consolidation(logger=self._command_logger)
+            result = run_canonical_data_consolidation(
+                logger=self._command_logger,
+                refresh=kwargs["refresh"],
+                # without the flag, the NASA_TAP_OFFLINE setting applies
+                offline=kwargs["offline"] or None,
+                full=kwargs["full"],
+            )
             self._command_logger(result)
         except Exception as e:
             raise CommandError("An error occurred") from e
@@ -6,6 +6,19 @@ from api.importer import run_import
 class Command(BaseCommand):
     help = "Populate database with data from NASA TAP API"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            help="Revalidate cached TAP responses with the service, however recent they are",
+        )
+
+        parser.add_argument(
+            "--offline",
+            action="store_true",
+            help="Only replay cached TAP responses, never fetching from the service",
+        )
+
     def handle(self, *args, **kwargs):
         self._command_logger("--- Starting Full Database Import ---\n")
 
@@ -22,6 +35,9 @@ class Command(BaseCommand):
                     nasa_table=nasa_table,
                     app_table=app_table,
                     logger=self._command_logger,
+                    refresh=kwargs["refresh"],
+                    # without the flag, the NASA_TAP_OFFLINE setting applies
+                    offline=kwargs["offline"] or None,
                 )
 
                 self._command_logger(f"Successfully populated {app_table} table.\n")
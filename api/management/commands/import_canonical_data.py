@@ -6,9 +6,23 @@ from api.canonical_data_importer import run_canonical_data_import
 class Command(BaseCommand):
     help = "Populate database with canonical data, consolidated from the NASA TAP API"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--shadow",
+            action="store_true",
+            help="Import into shadow copies of the tables and swap them in once validated (PostgreSQL only)",
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Delete the rows that are no longer in the canonical files",
+        )
+
     def handle(self, *args, **kwargs):
         try:
-            run_canonical_data_import(logger=self._command_logger)
+            run_canonical_data_import(
+                logger=self._command_logger, shadow=kwargs["shadow"], prune=kwargs["prune"]
+            )
         except Exception as e:
             raise CommandError("An error occurred") from e
 
@@ -32,10 +32,24 @@ class Command(BaseCommand):
             help="Print actions without modifying the database",
         )
 
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            help="Revalidate cached TAP responses with the service, however recent they are",
+        )
+
+        parser.add_argument(
+            "--offline",
+            action="store_true",
+            help="Only replay cached TAP responses, never fetching from the service",
+        )
+
     def handle(self, *args, **kwargs):
         nasa_table = kwargs["nasa_table"]
         app_table = kwargs["app_table"]
         dry_run = kwargs["dry_run"]
+        # without the flag, the NASA_TAP_OFFLINE setting applies
+        offline = kwargs["offline"] or None
 
         try:
             result = run_import(
@@ -43,6 +57,8 @@ class Command(BaseCommand):
                 app_table=app_table,
                 dry_run=dry_run,
                 logger=self._command_logger,
+                refresh=kwargs["refresh"],
+                offline=offline,
             )
 
             self.stdout.write(self.style.SUCCESS(f"Final result: {result}"))
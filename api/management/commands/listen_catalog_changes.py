@@ -0,0 +1,29 @@
+import contextlib
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.change_feed import listen, subscribe
+
+
+class Command(BaseCommand):
+    help = "Print the catalog change feed as imports publish it to Redis"
+
+    def handle(self, *args, **kwargs):
+        if not settings.CATALOG_CHANGE_FEED_REDIS_URL:
+            raise CommandError("CATALOG_CHANGE_FEED_REDIS_URL is not set")
+
+        subscribe(self._print_message)
+        with contextlib.suppress(KeyboardInterrupt):
+            listen(logger=self.stdout.write)
+
+    def _print_message(self, message):
+        self.stdout.write(
+            f"Import {message['import_id']} (data version {message['data_version']}), "
+            f"part {message['part']} of {message['parts']}:"
+        )
+        for change in message["changes"]:
+            self.stdout.write(
+                f"  {change['operation']} {change['entity_type']} {change['key']} "
+                f"{change['old_hash']} -> {change['new_hash']}"
+            )
@@ -0,0 +1,49 @@
+from django.db import DatabaseError, migrations, transaction
+
+# (index name, table) pairs for the name columns searched through ?search=
+TRIGRAM_INDEXES = [
+    ("star_systems_name_trgm_idx", "star_systems"),
+    ("stars_name_trgm_idx", "stars"),
+    ("planets_name_trgm_idx", "planets"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    Creates GIN trigram indexes that match the expression Django generates for 'icontains'
+    on Postgres (UPPER(name::text) LIKE UPPER(...)). Other databases, and Postgres servers
+    without the pg_trgm extension, keep the plain scan.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except DatabaseError:
+        return
+
+    for index_name, table in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{table}" '
+            f'USING gin ((UPPER("name"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for index_name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_rename_equilibrium_temperature_planet_equilibrium_temperature_k_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
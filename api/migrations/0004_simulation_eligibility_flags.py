@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_name_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='planet',
+            name='seasonality_sim_eligible',
+            field=models.BooleanField(db_index=True, default=False, help_text='Has the data required by the seasonality simulation'),
+        ),
+        migrations.AddField(
+            model_name='planet',
+            name='tidal_locking_sim_eligible',
+            field=models.BooleanField(db_index=True, default=False, help_text='Has the data required by the tidal locking simulation'),
+        ),
+        migrations.AddField(
+            model_name='star',
+            name='lifetime_sim_eligible',
+            field=models.BooleanField(db_index=True, default=False, help_text='Has the data required by the star lifetime simulation'),
+        ),
+        migrations.AddField(
+            model_name='starsystem',
+            name='travel_sim_eligible',
+            field=models.BooleanField(db_index=True, default=False, help_text='Has the data required by the travel time simulation'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+from api.eligibility import refresh_simulation_eligibility
+
+
+def backfill_simulation_eligibility(apps, schema_editor):
+    refresh_simulation_eligibility(get_model=lambda model_name: apps.get_model("api", model_name))
+
+
+class Migration(migrations.Migration):
+    # kept apart from the schema changes in 0004, as Postgres cannot create the deferred
+    # indexes of a migration once its rows have been updated in the same transaction
+
+    dependencies = [
+        ('api', '0004_simulation_eligibility_flags'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_simulation_eligibility, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:40
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_discoveries(apps, schema_editor):
+    """
+    Points planets at the oldest of any duplicate discoveries and deletes the rest,
+    so that the unique constraint can be created.
+    """
+    PlanetDiscovery = apps.get_model("api", "PlanetDiscovery")
+    Planet = apps.get_model("api", "Planet")
+
+    duplicate_groups = (
+        PlanetDiscovery.objects.values("method", "year", "locale", "facility")
+        .annotate(row_count=Count("id"), keep_id=Min("id"))
+        .filter(row_count__gt=1)
+    )
+
+    for group in duplicate_groups:
+        duplicate_ids = list(
+            PlanetDiscovery.objects.filter(
+                method=group["method"], year=group["year"], locale=group["locale"], facility=group["facility"]
+            )
+            .exclude(id=group["keep_id"])
+            .values_list("id", flat=True)
+        )
+        Planet.objects.filter(discovery_id__in=duplicate_ids).update(discovery_id=group["keep_id"])
+        PlanetDiscovery.objects.filter(id__in=duplicate_ids).delete()
+
+    if schema_editor.connection.vendor == "postgresql":
+        # the foreign key checks of the updates and deletes above are deferred to the end of the
+        # transaction, and Postgres cannot add the constraint while they are pending (see 0005)
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_backfill_simulation_eligibility'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_discoveries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='planetdiscovery',
+            constraint=models.UniqueConstraint(
+                fields=('method', 'year', 'locale', 'facility'), name='unique_planet_discovery', nulls_distinct=False
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 16:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_planet_discovery_unique_constraint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='planet',
+            name='source_hash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Hash of the canonical record this row was last imported from', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='planetdiscovery',
+            name='source_hash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Hash of the canonical record this row was last imported from', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='star',
+            name='source_hash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Hash of the canonical record this row was last imported from', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='starsystem',
+            name='source_hash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Hash of the canonical record this row was last imported from', max_length=32),
+        ),
+    ]
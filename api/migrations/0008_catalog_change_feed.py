@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_canonical_record_source_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('import_id', models.UUIDField(help_text='The import that made the change')),
+                ('data_version', models.CharField(db_index=True, help_text='The catalog data version the change was committed under', max_length=32)),
+                ('entity_type', models.CharField(help_text='The app table of the changed row', max_length=50)),
+                ('key', models.JSONField(blank=True, help_text='The unique key of the changed row', null=True)),
+                ('operation', models.CharField(choices=[('inserted', 'Inserted'), ('updated', 'Updated'), ('deleted', 'Deleted'), ('invalidated', 'Invalidated')], max_length=11)),
+                ('old_hash', models.CharField(blank=True, max_length=32, null=True)),
+                ('new_hash', models.CharField(blank=True, max_length=32, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'db_table': 'catalog_changes',
+            },
+        ),
+    ]
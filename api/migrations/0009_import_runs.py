@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_catalog_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('importer', models.CharField(choices=[('canonical', 'Canonical data'), ('nasa', 'NASA TAP')], max_length=10)),
+                ('source', models.CharField(max_length=100)),
+                ('task_id', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('SUCCESS', 'Success'), ('FAILURE', 'Failure')], max_length=10)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('duration_seconds', models.FloatField()),
+                ('rows_read', models.PositiveIntegerField()),
+                ('rows_written', models.PositiveIntegerField()),
+                ('rows_per_second', models.FloatField()),
+                ('db_seconds', models.FloatField(help_text='Time spent writing to the database')),
+                ('parse_seconds', models.FloatField(help_text='Time spent reading, parsing and hashing records')),
+                ('peak_memory_mb', models.FloatField(help_text='Peak resident memory of the importing process')),
+                ('stages', models.JSONField(blank=True, default=dict)),
+                ('message', models.TextField(blank=True)),
+            ],
+            options={
+                'db_table': 'import_runs',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['importer', 'source', '-started_at'], name='import_runs_importe_3842e2_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.3 on 2026-10-19 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_import_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=32)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'catalog_data_version',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_catalog_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importrun',
+            name='memory_growth_mb',
+            field=models.FloatField(blank=True, help_text='Growth of the resident memory of the process over the import', null=True),
+        ),
+        migrations.AlterField(
+            model_name='importrun',
+            name='peak_memory_mb',
+            field=models.FloatField(help_text='Peak resident memory of the importing process during the import'),
+        ),
+    ]
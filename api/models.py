@@ -15,6 +15,16 @@ class StarSystem(models.Model):
     )
     ra = models.FloatField(null=True, blank=True, help_text="Right Ascension")
     dec = models.FloatField(null=True, blank=True, help_text="Declination")
+    travel_sim_eligible = models.BooleanField(
+        default=False, db_index=True, help_text="Has the data required by the travel time simulation"
+    )
+    source_hash = models.CharField(
+        max_length=32,
+        blank=True,
+        default="",
+        editable=False,
+        help_text="Hash of the canonical record this row was last imported from",
+    )
 
     class Meta:
         db_table = "star_systems"
@@ -42,6 +52,16 @@ class Star(models.Model):
         null=True, blank=True, help_text="Amount of energy emitted"
     )
     age_gya = models.FloatField(null=True, blank=True, help_text="Age in Giga Years")
+    lifetime_sim_eligible = models.BooleanField(
+        default=False, db_index=True, help_text="Has the data required by the star lifetime simulation"
+    )
+    source_hash = models.CharField(
+        max_length=32,
+        blank=True,
+        default="",
+        editable=False,
+        help_text="Hash of the canonical record this row was last imported from",
+    )
 
     class Meta:
         db_table = "stars"
@@ -57,9 +77,24 @@ class PlanetDiscovery(models.Model):
         max_length=50, help_text="Location of observation (Ground or Space)"
     )
     facility = models.CharField(max_length=100, help_text="Name of facility")
+    source_hash = models.CharField(
+        max_length=32,
+        blank=True,
+        default="",
+        editable=False,
+        help_text="Hash of the canonical record this row was last imported from",
+    )
 
     class Meta:
         db_table = "planet_discoveries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["method", "year", "locale", "facility"],
+                name="unique_planet_discovery",
+                # discoveries without a year are upserted on the same key as the others
+                nulls_distinct=False,
+            )
+        ]
         verbose_name = "Planet Discovery"
         verbose_name_plural = "Planet Discoveries"
 
@@ -100,6 +135,19 @@ class Planet(models.Model):
         null=True,
         blank=True,
     )
+    seasonality_sim_eligible = models.BooleanField(
+        default=False, db_index=True, help_text="Has the data required by the seasonality simulation"
+    )
+    tidal_locking_sim_eligible = models.BooleanField(
+        default=False, db_index=True, help_text="Has the data required by the tidal locking simulation"
+    )
+    source_hash = models.CharField(
+        max_length=32,
+        blank=True,
+        default="",
+        editable=False,
+        help_text="Hash of the canonical record this row was last imported from",
+    )
 
     objects = PlanetManager()
 
@@ -108,3 +156,96 @@ class Planet(models.Model):
 
     def __str__(self):
         return f"{self.name} (orbits {self.host_star.name})"
+
+
+class CatalogDataVersion(models.Model):
+    """
+    The current catalog data version, a single row shared by every web and worker process, so
+    that a version started by an import is seen by all of them whatever cache they are given.
+    """
+
+    version = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "catalog_data_version"
+
+    def __str__(self):
+        return self.version
+
+
+class CatalogChange(models.Model):
+    """
+    An entry of the catalog change feed: a row the canonical importer inserted, updated or
+    deleted, with the hash of the canonical record before and after.
+
+    An 'invalidated' entry has no key, and means that rows of the entity type changed without
+    being listed (e.g. deleted through a cascade), so anything derived from them must be rebuilt.
+    """
+
+    class Operation(models.TextChoices):
+        INSERTED = "inserted", "Inserted"
+        UPDATED = "updated", "Updated"
+        DELETED = "deleted", "Deleted"
+        INVALIDATED = "invalidated", "Invalidated"
+
+    import_id = models.UUIDField(help_text="The import that made the change")
+    data_version = models.CharField(
+        max_length=32, db_index=True, help_text="The catalog data version the change was committed under"
+    )
+    entity_type = models.CharField(max_length=50, help_text="The app table of the changed row")
+    key = models.JSONField(null=True, blank=True, help_text="The unique key of the changed row")
+    operation = models.CharField(max_length=11, choices=Operation.choices)
+    old_hash = models.CharField(max_length=32, null=True, blank=True)
+    new_hash = models.CharField(max_length=32, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = "catalog_changes"
+
+    def __str__(self):
+        return f"{self.operation} {self.entity_type} {self.key}"
+
+
+class ImportRun(models.Model):
+    """
+    A run of one of the importers, with its throughput, to compare runs as the catalog grows.
+    """
+
+    class Importer(models.TextChoices):
+        CANONICAL = "canonical", "Canonical data"
+        NASA = "nasa", "NASA TAP"
+
+    class Status(models.TextChoices):
+        SUCCESS = "SUCCESS", "Success"
+        FAILURE = "FAILURE", "Failure"
+
+    importer = models.CharField(max_length=10, choices=Importer.choices)
+    # what was imported, e.g. 'ps:planets' for a NASA import
+    source = models.CharField(max_length=100)
+    task_id = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices)
+    started_at = models.DateTimeField(auto_now_add=True)
+    duration_seconds = models.FloatField()
+    rows_read = models.PositiveIntegerField()
+    rows_written = models.PositiveIntegerField()
+    rows_per_second = models.FloatField()
+    db_seconds = models.FloatField(help_text="Time spent writing to the database")
+    parse_seconds = models.FloatField(help_text="Time spent reading, parsing and hashing records")
+    peak_memory_mb = models.FloatField(help_text="Peak resident memory of the importing process during the import")
+    memory_growth_mb = models.FloatField(
+        null=True, blank=True, help_text="Growth of the resident memory of the process over the import"
+    )
+    # stage -> rows, timings and batch time histogram
+    stages = models.JSONField(default=dict, blank=True)
+    message = models.TextField(blank=True)
+
+    class Meta:
+        db_table = "import_runs"
+        ordering = ["-started_at"]
+        indexes = [
+            models.Index(fields=["importer", "source", "-started_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.importer}:{self.source} ({self.status})"
@@ -2,6 +2,7 @@ import graphene
 from graphene_django.filter import DjangoFilterConnectionField
 from graphene_django.types import DjangoObjectType
 
+from .autocomplete import AUTOCOMPLETE_ENTITY_TYPES, get_autocomplete_index
 from .filters import PlanetFilter, StarFilter, StarSystemFilter
 from .models import Planet, PlanetDiscovery, Star, StarSystem
 
@@ -64,6 +65,7 @@ class StarType(DjangoObjectType):
 class PlanetDiscoveryType(DjangoObjectType):
     class Meta:
         model = PlanetDiscovery
+        exclude = ("source_hash",)
 
 
 class PlanetType(DjangoObjectType):
@@ -81,6 +83,17 @@ class PlanetType(DjangoObjectType):
         return getattr(self, "habitability_score", None)
 
 
+AutocompleteEntityTypeEnum = graphene.Enum(
+    "AutocompleteEntityTypeEnum", [(entity_type.upper(), entity_type) for entity_type in AUTOCOMPLETE_ENTITY_TYPES]
+)
+
+
+class AutocompleteSuggestionType(graphene.ObjectType):
+    type = graphene.Field(AutocompleteEntityTypeEnum)
+    id = graphene.Int()
+    name = graphene.String()
+
+
 class Query(graphene.ObjectType):
     planet_by_name = graphene.Field(PlanetType, name=graphene.String())
     all_planets = DjangoFilterConnectionField(PlanetType, filterset_class=PlanetFilter)
@@ -93,6 +106,13 @@ class Query(graphene.ObjectType):
 
     search_star_systems = graphene.List(graphene.String, query=graphene.String(required=True))
 
+    autocomplete = graphene.List(
+        graphene.NonNull(AutocompleteSuggestionType),
+        query=graphene.String(required=True),
+        limit=graphene.Int(default_value=10),
+        types=graphene.List(graphene.NonNull(AutocompleteEntityTypeEnum)),
+    )
+
     def resolve_planet_by_name(self, info, name):
         return Planet.objects.filter(name=name).first()
 
@@ -109,12 +129,18 @@ class Query(graphene.ObjectType):
         if not query:
             return []
 
-        queryset = (
-            StarSystem.objects.filter(name__istartswith=query)
-            .values_list("name", flat=True)[:10]
-        )
+        suggestions = get_autocomplete_index().search(query, limit=10, entity_types=["star_system"])
+
+        return [suggestion["name"] for suggestion in suggestions]
+
+    def resolve_autocomplete(self, info, query, limit, types=None):
+        """
+        Typeahead suggestions across planets, stars and star systems, served from memory.
+        """
+        limit = max(0, min(limit, 25))
+        entity_types = [getattr(entity_type, "value", entity_type) for entity_type in types] if types else None
 
-        return list(queryset)
+        return get_autocomplete_index().search(query, limit=limit, entity_types=entity_types)
 
 
 schema = graphene.Schema(query=Query)
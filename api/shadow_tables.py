@@ -0,0 +1,225 @@
+from django.db import DatabaseError, connection, models
+
+# schema the shadow copies are built in, under the same names as the live tables
+SHADOW_SCHEMA = "catalog_shadow"
+
+# largest share of a table's rows an import may remove before its shadow copy is rejected
+SHADOW_MAX_ROW_LOSS = 0.25
+
+# longest wait for readers to release the live tables before the swap gives up
+SHADOW_SWAP_LOCK_TIMEOUT = "10s"
+
+
+class ShadowValidationError(Exception):
+    pass
+
+
+class ShadowTables:
+    """
+    Complete copies of a set of tables on Postgres, loaded and validated next to the live tables
+    and then swapped in at once.
+
+    The copies are built in their own schema under the live tables' names, so that their indexes
+    and constraints can take the names of the live ones (which the migrations refer to), and are
+    moved over on swap(). Everything runs in the caller's transaction: until swap() the live
+    tables are only read, so readers never wait on the import, and a failed import leaves
+    nothing behind.
+
+    'models' are given parents first.
+    """
+
+    def __init__(self, models, schema=SHADOW_SCHEMA):
+        self.models = list(models)
+        self.schema = schema
+        self.live_schema = None
+        # constraint and index statements left for validate()
+        self._pending_statements = []
+
+    @property
+    def table_names(self):
+        """
+        Model -> (schema, table) of its shadow copy, for the table_names of CopyUpserter.
+        """
+        return {model: (self.schema, model._meta.db_table) for model in self.models}
+
+    def create(self):
+        """
+        Creates the shadow tables as copies of the live ones, rows and primary keys included, so
+        that unchanged rows keep their ids. Only their unique keys are added here, the other
+        constraints and indexes are added by validate(), once the rows are loaded.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT current_schema()")
+            self.live_schema = cursor.fetchone()[0]
+
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {_quote(self.schema)}")
+            self.drop()
+            keys, self._pending_statements = self._schema_statements(cursor)
+
+            for model in self.models:
+                shadow, live = self._shadow(model), self._live(model)
+                cursor.execute(
+                    f"CREATE TABLE {shadow} (LIKE {live} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING GENERATED)"
+                )
+                cursor.execute(f"INSERT INTO {shadow} OVERRIDING SYSTEM VALUE SELECT * FROM {live}")
+
+                # the copy has its own identity sequence, which continues after the copied ids
+                pk_column = model._meta.pk.column
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX({_quote(pk_column)}), 0) + 1, false) "
+                    f"FROM {shadow}",
+                    [shadow, pk_column],
+                )
+
+            # upserts need the unique keys they conflict on, the rest waits until the rows are in
+            for statement in keys:
+                cursor.execute(statement)
+
+    def cascade_deletes(self):
+        """
+        Deletes the rows whose parent row was deleted, like the ORM does for on_delete=CASCADE on
+        the live tables, and returns how many rows of each model were deleted.
+        """
+        cascaded_counts = {}
+        with connection.cursor() as cursor:
+            # parents first, so that deletes cascade down to grandchildren
+            for model in self.models:
+                for field in model._meta.concrete_fields:
+                    if not field.is_relation or field.related_model not in self.models:
+                        continue
+                    if field.remote_field.on_delete is not models.CASCADE:
+                        continue
+
+                    parent = field.related_model
+                    cursor.execute(
+                        f"DELETE FROM {self._shadow(model)} c WHERE c.{_quote(field.column)} IS NOT NULL "
+                        f"AND NOT EXISTS (SELECT 1 FROM {self._shadow(parent)} p "
+                        f"WHERE p.{_quote(parent._meta.pk.column)} = c.{_quote(field.column)})"
+                    )
+                    if cursor.rowcount:
+                        cascaded_counts[model] = cascaded_counts.get(model, 0) + cursor.rowcount
+        return cascaded_counts
+
+    def validate(self, logger=print):
+        """
+        Checks that no table lost more than SHADOW_MAX_ROW_LOSS of its rows, then adds the
+        constraints and indexes of the live tables, which checks the keys and every relationship,
+        and analyzes the tables so that queries are planned well from the first read after the
+        swap. Raises ShadowValidationError if a copy is not fit to replace its live table.
+        """
+        with connection.cursor() as cursor:
+            for model in self.models:
+                cursor.execute(f"SELECT COUNT(*) FROM {self._live(model)}")
+                live_count = cursor.fetchone()[0]
+                cursor.execute(f"SELECT COUNT(*) FROM {self._shadow(model)}")
+                shadow_count = cursor.fetchone()[0]
+
+                logger(f"Shadow '{model._meta.db_table}' has {shadow_count} rows ({live_count} live).")
+                if live_count and shadow_count < live_count * (1 - SHADOW_MAX_ROW_LOSS):
+                    raise ShadowValidationError(
+                        f"Shadow '{model._meta.db_table}' lost {live_count - shadow_count} of {live_count} rows, "
+                        f"more than the allowed {SHADOW_MAX_ROW_LOSS:.0%}"
+                    )
+
+            for statement in self._pending_statements:
+                try:
+                    cursor.execute(statement)
+                except DatabaseError as e:
+                    raise ShadowValidationError(f"Shadow tables failed validation: {e}") from e
+
+            for model in self.models:
+                cursor.execute(f"ANALYZE {self._shadow(model)}")
+
+    def swap(self):
+        """
+        Replaces the live tables with their shadow copies. The live tables are locked (readers
+        wait at most the few statements this takes) and dropped, and the copies are moved in
+        with their indexes, constraints and identity sequences.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT current_setting('lock_timeout'), set_config('lock_timeout', %s, true)",
+                [SHADOW_SWAP_LOCK_TIMEOUT],
+            )
+            lock_timeout = cursor.fetchone()[0]
+            cursor.execute(
+                f"LOCK TABLE {', '.join(self._live(model) for model in self.models)} IN ACCESS EXCLUSIVE MODE"
+            )
+            # children first, so that no table is dropped while another refers to it
+            for model in reversed(self.models):
+                cursor.execute(f"DROP TABLE {self._live(model)}")
+            for model in self.models:
+                cursor.execute(f"ALTER TABLE {self._shadow(model)} SET SCHEMA {_quote(self.live_schema)}")
+            cursor.execute("SELECT set_config('lock_timeout', %s, true)", [lock_timeout])
+
+    def drop(self):
+        """
+        Drops the shadow tables, e.g. when there is nothing to swap in.
+        """
+        with connection.cursor() as cursor:
+            for model in reversed(self.models):
+                cursor.execute(f"DROP TABLE IF EXISTS {self._shadow(model)}")
+
+    def _schema_statements(self, cursor):
+        """
+        Returns the statements that give the shadow tables the constraints and indexes of the
+        live ones, under the same names: the keys that upserts conflict on, and the rest. Foreign
+        keys come last, once every primary key exists, and refer to the shadow tables.
+        """
+        # with an empty search path, definitions name every table with its schema
+        cursor.execute("SELECT current_setting('search_path')")
+        search_path = cursor.fetchone()[0]
+        cursor.execute("SELECT set_config('search_path', '', true)")
+        try:
+            # live table name as Postgres prints it in definitions -> shadow table name
+            renames = {}
+            for model in self.models:
+                cursor.execute(
+                    "SELECT quote_ident(%s) || '.' || quote_ident(%s)", [self.live_schema, model._meta.db_table]
+                )
+                renames[cursor.fetchone()[0]] = self._shadow(model)
+
+            keys, statements, foreign_keys = [], [], []
+            for printed_live, shadow in renames.items():
+                cursor.execute(
+                    "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+                    "WHERE conrelid = %s::regclass ORDER BY conname",
+                    [printed_live],
+                )
+                for name, constraint_type, definition in cursor.fetchall():
+                    statement = f"ALTER TABLE {shadow} ADD CONSTRAINT {_quote(name)} {definition}"
+                    if constraint_type in ("p", "u"):
+                        keys.append(statement)
+                    elif constraint_type == "f":
+                        for printed_parent, shadow_parent in renames.items():
+                            statement = statement.replace(
+                                f" REFERENCES {printed_parent}(", f" REFERENCES {shadow_parent}("
+                            )
+                        foreign_keys.append(statement)
+                    else:
+                        statements.append(statement)
+
+                # indexes of their own, not the ones backing a primary key or unique constraint
+                cursor.execute(
+                    "SELECT i.indisunique, pg_get_indexdef(i.indexrelid) FROM pg_index i "
+                    "WHERE i.indrelid = %s::regclass "
+                    "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid) "
+                    "ORDER BY i.indexrelid",
+                    [printed_live],
+                )
+                for is_unique, definition in cursor.fetchall():
+                    statement = definition.replace(f" ON {printed_live} ", f" ON {shadow} ", 1)
+                    (keys if is_unique else statements).append(statement)
+        finally:
+            cursor.execute("SELECT set_config('search_path', %s, true)", [search_path])
+        return keys, statements + foreign_keys
+
+    def _live(self, model):
+        return f"{_quote(self.live_schema)}.{_quote(model._meta.db_table)}"
+
+    def _shadow(self, model):
+        return f"{_quote(self.schema)}.{_quote(model._meta.db_table)}"
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
@@ -0,0 +1,327 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from django.conf import settings
+
+# seconds to wait for the TAP service to connect and to send the next chunk of the response
+TAP_REQUEST_TIMEOUT = (10, 300)
+
+# number of bytes read from the TAP response at a time
+TAP_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# responses worth retrying: rate limiting and temporary server or gateway failures
+TAP_RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# snapshots are stored once per content digest, and each query's index entry points at one
+_INDEX_DIR = "index"
+_OBJECTS_DIR = "objects"
+# progress of multi-chunk fetches, so that an interrupted one resumes where it stopped
+_CHECKPOINTS_DIR = "checkpoints"
+_SNAPSHOT_SUFFIX = ".csv.gz"
+_FILE_MODE = 0o644
+
+
+class TapCacheError(Exception):
+    pass
+
+
+class TapSnapshot:
+    """
+    A cached TAP response: the path of its compressed body and the metadata it was stored with.
+    """
+
+    def __init__(self, path, metadata):
+        self.path = path
+        self.metadata = metadata
+
+    @property
+    def content_sha256(self):
+        return self.metadata["content_sha256"]
+
+    @property
+    def age(self):
+        """
+        Seconds since the snapshot was last fetched or confirmed unchanged by the TAP service.
+        """
+        return time.time() - self.metadata["validated_at"]
+
+    def open(self):
+        """
+        Opens the response body as text, decompressed as it is read.
+        """
+        # newline="" keeps line breaks inside quoted CSV values intact
+        return gzip.open(self.path, "rt", encoding=self.metadata.get("encoding") or "utf-8", newline="")
+
+
+def tap_query_key(url):
+    """
+    Returns the cache key of a TAP URL, a digest of its query parameters.
+
+    The base URL is not part of the key, so that a local stand-in server replays the snapshots
+    of the real service.
+    """
+    params = sorted(parse_qsl(urlsplit(url).query, keep_blank_values=True))
+    return hashlib.sha256(json.dumps(params).encode()).hexdigest()
+
+
+def get_cache_dir(cache_dir=None):
+    return Path(cache_dir or settings.NASA_TAP_CACHE_DIR)
+
+
+def get_cached_snapshot(url, cache_dir=None):
+    """
+    Returns the cached snapshot of a TAP URL, or None if it has not been fetched before.
+    """
+    return _load_snapshot(get_cache_dir(cache_dir), tap_query_key(url))
+
+
+def fetch_tap_snapshot(url, logger=print, refresh=False, offline=None, cache_dir=None):
+    """
+    Returns a snapshot of the response to a TAP URL, downloading it only when needed.
+
+    A snapshot younger than NASA_TAP_CACHE_MAX_AGE is used as is. An older one (or any, with
+    'refresh') is revalidated with a conditional request, and only downloaded again if the
+    service reports a change. When offline, or when the service cannot be reached, the cached
+    snapshot is replayed however old it is.
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    offline = settings.NASA_TAP_OFFLINE if offline is None else offline
+    key = tap_query_key(url)
+    snapshot = _load_snapshot(cache_dir, key)
+
+    if snapshot is not None:
+        if offline or (not refresh and snapshot.age < settings.NASA_TAP_CACHE_MAX_AGE):
+            logger(f"Using cached TAP snapshot {snapshot.content_sha256[:12]} ({_format_age(snapshot.age)} old)")
+            return snapshot
+    elif offline:
+        raise TapCacheError(f"No cached TAP snapshot for {url}, and fetching is disabled (offline)")
+
+    try:
+        return _download_snapshot_with_retries(url, cache_dir, key, snapshot, logger)
+    except requests.exceptions.RequestException as e:
+        if snapshot is None:
+            raise
+        logger(f"WARNING: Could not refresh TAP snapshot ({e}), using the cached one")
+        return snapshot
+
+
+def fetch_tap_snapshots(urls, logger=print, refresh=False, offline=None, max_workers=None, cache_dir=None):
+    """
+    Returns snapshots of several TAP URLs, e.g. the chunks of one large query, in the same order.
+    Chunks are fetched concurrently, at most 'max_workers' (NASA_TAP_CHUNK_CONCURRENCY by default)
+    at a time.
+
+    Every completed chunk is checkpointed. When a fetch is interrupted, e.g. by a failing chunk,
+    the next fetch of the same URLs resumes it: the chunks that had completed are taken from the
+    cache as they are, even with 'refresh', and only the others are fetched.
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    max_workers = max_workers or settings.NASA_TAP_CHUNK_CONCURRENCY
+    checkpoint_path = cache_dir / _CHECKPOINTS_DIR / f"{_checkpoint_key(urls)}.json"
+
+    try:
+        with open(checkpoint_path) as f:
+            completed = json.load(f)["completed"]
+        logger(f"Resuming an interrupted fetch, {len(completed)} of {len(urls)} chunks already completed")
+    except FileNotFoundError:
+        completed = {}
+
+    snapshots = {}
+    for url in urls:
+        snapshot = _load_snapshot(cache_dir, tap_query_key(url))
+        if snapshot is not None and completed.get(tap_query_key(url)) == snapshot.content_sha256:
+            snapshots[url] = snapshot
+
+    lock = threading.Lock()
+
+    def fetch_chunk(url):
+        snapshot = fetch_tap_snapshot(url, logger=logger, refresh=refresh, offline=offline, cache_dir=cache_dir)
+        with lock:
+            completed[tap_query_key(url)] = snapshot.content_sha256
+            _write_json(checkpoint_path, {"urls": urls, "completed": completed})
+        return snapshot
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tap-chunk")
+    try:
+        futures = {executor.submit(fetch_chunk, url): url for url in urls if url not in snapshots}
+        for future in as_completed(futures):
+            snapshots[futures[future]] = future.result()
+    finally:
+        # once a chunk has failed, the remaining ones are abandoned rather than waited for
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # every chunk is in, so the next fetch starts over
+    checkpoint_path.unlink(missing_ok=True)
+
+    return [snapshots[url] for url in urls]
+
+
+def _download_snapshot_with_retries(url, cache_dir, key, snapshot, logger):
+    """
+    Downloads a snapshot, retrying failed connections, interrupted responses and temporary
+    server errors with an exponential backoff.
+
+    The whole download is retried, since a TAP query cannot be resumed part way through.
+    """
+    retries = settings.NASA_TAP_FETCH_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            return _download_snapshot(url, cache_dir, key, snapshot, logger)
+        except requests.exceptions.RequestException as e:
+            if attempt == retries or not _is_retryable(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            logger(f"WARNING: Fetching from the TAP service failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def _is_retryable(error):
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is not None and error.response.status_code in TAP_RETRY_STATUS_CODES
+    return isinstance(
+        error,
+        (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ),
+    )
+
+
+def _retry_delay(error, attempt):
+    # a rate limited or unavailable service may say how long to wait
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return settings.NASA_TAP_FETCH_BACKOFF * 2 ** attempt
+
+
+def _download_snapshot(url, cache_dir, key, snapshot, logger):
+    headers = {}
+    if snapshot is not None:
+        if snapshot.metadata.get("etag"):
+            headers["If-None-Match"] = snapshot.metadata["etag"]
+        if snapshot.metadata.get("last_modified"):
+            headers["If-Modified-Since"] = snapshot.metadata["last_modified"]
+
+    logger(f"Fetching data from: {url}")
+    with requests.get(url, headers=headers, stream=True, timeout=TAP_REQUEST_TIMEOUT) as response:
+        response.raise_for_status()
+
+        if response.status_code == 304 and snapshot is not None:
+            logger(f"TAP snapshot {snapshot.content_sha256[:12]} is unchanged")
+            snapshot.metadata["validated_at"] = time.time()
+            _write_index(cache_dir, key, snapshot.metadata)
+            return snapshot
+
+        objects_dir = cache_dir / _OBJECTS_DIR
+        objects_dir.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+
+        # the body is compressed to a temporary file as it arrives, and moved into place once complete
+        fd, temp_path = tempfile.mkstemp(dir=objects_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, gzip.GzipFile(fileobj=f, mode="wb", compresslevel=6, mtime=0) as gz:
+                for chunk in response.iter_content(TAP_DOWNLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    gz.write(chunk)
+
+            content_sha256 = digest.hexdigest()
+            object_path = _object_path(cache_dir, content_sha256)
+            if object_path.exists():
+                os.remove(temp_path)
+            else:
+                # temporary files are only readable by their owner
+                os.chmod(temp_path, _FILE_MODE)
+                os.replace(temp_path, object_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        now = time.time()
+        metadata = {
+            "url": url,
+            "content_sha256": content_sha256,
+            "size": size,
+            "encoding": response.encoding,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": now,
+            "validated_at": now,
+        }
+
+    _write_index(cache_dir, key, metadata)
+
+    if snapshot is not None and snapshot.content_sha256 == content_sha256:
+        logger(f"TAP snapshot {content_sha256[:12]} is unchanged ({size} bytes)")
+    else:
+        logger(f"Stored TAP snapshot {content_sha256[:12]} ({size} bytes)")
+        if snapshot is not None:
+            _remove_unreferenced_object(cache_dir, snapshot.content_sha256)
+
+    return TapSnapshot(_object_path(cache_dir, content_sha256), metadata)
+
+
+def _load_snapshot(cache_dir, key):
+    try:
+        with open(cache_dir / _INDEX_DIR / f"{key}.json") as f:
+            metadata = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    path = _object_path(cache_dir, metadata["content_sha256"])
+    if not path.exists():
+        return None
+    return TapSnapshot(path, metadata)
+
+
+def _write_index(cache_dir, key, metadata):
+    _write_json(cache_dir / _INDEX_DIR / f"{key}.json", metadata)
+
+
+def _write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # written to a temporary file first, so that a reader never sees a partial file
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f, indent=4)
+    os.chmod(temp_path, _FILE_MODE)
+    os.replace(temp_path, path)
+
+
+def _checkpoint_key(urls):
+    return hashlib.sha256(json.dumps([tap_query_key(url) for url in urls]).encode()).hexdigest()
+
+
+def _remove_unreferenced_object(cache_dir, content_sha256):
+    for index_file in (cache_dir / _INDEX_DIR).glob("*.json"):
+        with open(index_file) as f:
+            if json.load(f)["content_sha256"] == content_sha256:
+                return
+    _object_path(cache_dir, content_sha256).unlink(missing_ok=True)
+
+
+def _object_path(cache_dir, content_sha256):
+    return cache_dir / _OBJECTS_DIR / f"{content_sha256}{_SNAPSHOT_SUFFIX}"
+
+
+def _format_age(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 60 * 60:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / (60 * 60):.1f}h"
@@ -1,3 +1,193 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import io
+import json
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from scripts import canonical_data_consolidater as consolidater
+from scripts.serve_tap_cache import TapCacheRequestHandler
+
+from .canonical_data_importer import APP_TABLE_IMPORT_CONFIG, _import_app_table_data_from_file
+from .canonical_files import iter_json_array
+from .import_metrics import ImportMetrics
+from .models import ImportRun
+from .tap_cache import _object_path, _write_index, tap_query_key
+from .utils import build_nasa_tap_url
+
+
+class SyntheticCanonicalFile(io.TextIOBase):
+    """
+    A canonical JSON file of 'count' star system records, generated as it is read, so that the
+    file itself takes no memory however many records it holds.
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self._index = 0
+        self._pending = "["
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while (size < 0 or len(self._pending) < size) and self._index <= self.count:
+            if self._index == self.count:
+                self._pending += "]"
+            else:
+                separator = "," if self._index else ""
+                self._pending += separator + json.dumps(
+                    {"sy_name": f"System {self._index:08d}", "sy_dist": 10.0 + self._index, "sy_snum": 1}
+                )
+            self._index += 1
+
+        if size < 0:
+            size = len(self._pending)
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+
+def measure_peak_memory(consume):
+    """
+    Returns the peak memory (in bytes) allocated while 'consume' runs.
+    """
+    tracemalloc.start()
+    try:
+        consume()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class CanonicalFileMemoryTests(SimpleTestCase):
+    """
+    Reading a canonical file must take the same memory however many records it holds.
+    """
+
+    def test_json_array_reader_memory_stays_flat(self):
+        def read(count):
+            for _ in iter_json_array(SyntheticCanonicalFile(count)):
+                pass
+
+        small_peak = measure_peak_memory(lambda: read(2_000))
+        large_peak = measure_peak_memory(lambda: read(50_000))
+
+        self.assertLess(large_peak, small_peak * 1.25)
+
+    def test_json_array_reader_yields_every_record(self):
+        records = list(iter_json_array(SyntheticCanonicalFile(3_000), chunk_size=100))
+
+        self.assertEqual(len(records), 3_000)
+        self.assertEqual(records[-1]["sy_name"], "System 00002999")
+
+
+class CanonicalImportMemoryTests(TestCase):
+    """
+    Reading and mapping the records of an app table must take the same memory however many
+    records its file holds.
+    """
+
+    def test_import_memory_stays_flat(self):
+        app_table = "star_systems"
+
+        def import_records(count):
+            metrics = ImportMetrics(ImportRun.Importer.CANONICAL, [app_table])
+            metrics.start_stage(app_table)
+            _import_app_table_data_from_file(
+                app_table, APP_TABLE_IMPORT_CONFIG[app_table], "synthetic.json",
+                iter_json_array(SyntheticCanonicalFile(count)),
+                dry_run=True, logger=lambda message: None, batch_size=1000, backend="orm",
+                related_id_maps={}, metrics=metrics,
+            )
+
+        small_peak = measure_peak_memory(lambda: import_records(2_000))
+        large_peak = measure_peak_memory(lambda: import_records(50_000))
+
+        self.assertLess(large_peak, small_peak * 1.25)
+
+
+def cache_table_snapshot(cache_dir, url, rows):
+    """
+    Stores 'rows' (the header first) as the cached TAP snapshot of 'url'.
+    """
+    output = io.StringIO()
+    csv.writer(output).writerows(rows)
+    body = output.getvalue().encode()
+    content_sha256 = hashlib.sha256(body).hexdigest()
+
+    object_path = _object_path(cache_dir, content_sha256)
+    object_path.parent.mkdir(parents=True, exist_ok=True)
+    object_path.write_bytes(gzip.compress(body))
+    _write_index(cache_dir, tap_query_key(url), {
+        "url": url,
+        "content_sha256": content_sha256,
+        "size": len(body),
+        "encoding": "utf-8",
+        "fetched_at": time.time(),
+        "validated_at": time.time(),
+    })
+
+
+class ChunkedTapFetchTests(SimpleTestCase):
+    """
+    Fetching a table in key range chunks must give the same rows as fetching it whole.
+    """
+
+    # on both sides of every chunk boundary, on the boundaries themselves, and without a value
+    HOSTNAMES = (
+        "", "11 Com", "HD 189733", "HD", "K2-18", "Kepler-10", "Kepler-1", "Kepler-22", "Kepler-2",
+        "Kepler-7", "Kepler-6", "L 98-59", "O'Brien-1", "TOI-700", "V1298 Tau", "WASP-12", "tau Boo",
+    )
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.served_cache_dir = Path(temp_dir.name) / "served"
+
+        nasa_table = "stellarhosts"
+        self.app_table = consolidater.CONSOLIDATION_SOURCES[nasa_table][0]
+        columns = consolidater.TABLE_FIELD_SELECTION_CONFIG[nasa_table][self.app_table]
+        rows = [columns]
+        for index, hostname in enumerate(self.HOSTNAMES * 3):
+            row = {column: f"{column} {index}" for column in columns}
+            row["hostname"] = hostname
+            rows.append([row[column] for column in columns])
+        cache_table_snapshot(self.served_cache_dir, build_nasa_tap_url(nasa_table, columns), rows)
+
+        handler = type("QuietHandler", (TapCacheRequestHandler,), {
+            "cache_dir": self.served_cache_dir,
+            "log_message": lambda self, *args: None,
+        })
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        settings_override = override_settings(
+            NASA_TAP_BASE_URL=f"http://127.0.0.1:{server.server_port}/TAP/sync",
+            NASA_TAP_CACHE_DIR=Path(temp_dir.name) / "client",
+            NASA_TAP_OFFLINE=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def fetch(self):
+        return consolidater.fetch_raw_nasa_data("stellarhosts", self.app_table, logger=lambda message: None)
+
+    def test_chunked_rows_match_the_whole_table(self):
+        chunked = self.fetch()
+        with mock.patch.dict(consolidater.TABLE_CHUNK_CONFIG, clear=True):
+            whole = self.fetch()
+
+        self.assertGreater(len(consolidater.build_table_urls("stellarhosts", self.app_table)), 1)
+        self.assertEqual(chunked.columns, whole.columns)
+        self.assertEqual(len(whole), len(self.HOSTNAMES) * 3)
+        self.assertCountEqual(chunked.rows, whole.rows)
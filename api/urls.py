@@ -14,6 +14,7 @@ router.register(r"stars", rest.StarViewSet, basename="star")
 
 urlpatterns = [
     path("", web.planets, name="planets"),
+    path("rest/autocomplete/", rest.AutocompleteView.as_view(), name="autocomplete"),
     path("rest/", include(router.urls)),
     path("graphql/", csrf_exempt(graphql.PrivateGraphQLView.as_view()), name="graphql"),
 ]
@@ -1,7 +1,11 @@
+import hashlib
+import itertools
+from urllib.parse import quote_plus
+
 from django.conf import settings
 
 
-def build_nasa_tap_url(table, columns, format="csv"):
+def build_nasa_tap_url(table, columns, format="csv", where=None):
     if not columns:
         raise ValueError("columns cannot be empty")
 
@@ -14,6 +18,35 @@ def build_nasa_tap_url(table, columns, format="csv"):
 
     query_columns = ",".join(columns)
 
-    query_param_value = f"select {query_columns} from {table}".replace(" ", "+")
+    query = f"select {query_columns} from {table}"
+    if where:
+        query += f" where {where}"
+
+    query_param_value = quote_plus(query, safe=",")
 
     return f"{base_url}?query={query_param_value}&format={format}"
+
+
+def build_key_range_conditions(column, boundaries):
+    """
+    Returns ADQL conditions that split a table into ranges of a column's values, at the given
+    (sorted) boundaries. Every row matches exactly one condition, including rows without a value.
+    """
+    if not boundaries:
+        raise ValueError("boundaries cannot be empty")
+
+    quoted = ["'" + boundary.replace("'", "''") + "'" for boundary in boundaries]
+
+    conditions = [f"{column} is null", f"{column} < {quoted[0]}"]
+    for lower, upper in itertools.pairwise(quoted):
+        conditions.append(f"{column} >= {lower} and {column} < {upper}")
+    conditions.append(f"{column} >= {quoted[-1]}")
+    return conditions
+
+
+def file_sha256(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
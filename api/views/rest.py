@@ -1,9 +1,14 @@
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema, inline_serializer
+from rest_framework import filters, serializers, status
 from rest_framework.authentication import SessionAuthentication
+from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
+from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from api.filters import PlanetFilter, StarFilter, StarSystemFilter
+from api.autocomplete import AUTOCOMPLETE_ENTITY_TYPES, get_autocomplete_index
+from api.filters import IndexedSearchFilter, PlanetFilter, StarFilter, StarSystemFilter
 from api.models import Planet, Star, StarSystem
 from api.serializers import PlanetSerializer, StarSerializer, StarSystemSerializer
 from api_keys.authentication import APIKeyAuthentication
@@ -27,7 +32,7 @@ class PlanetViewSet(ReadOnlyModelViewSet):
     )
     serializer_class = PlanetSerializer
     filter_backends = [
-        filters.SearchFilter,
+        IndexedSearchFilter,
         DjangoFilterBackend,
         filters.OrderingFilter,
     ]
@@ -53,7 +58,7 @@ class StarSystemViewSet(ReadOnlyModelViewSet):
 
     queryset = StarSystem.objects.all().order_by("name")
     serializer_class = StarSystemSerializer
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    filter_backends = [IndexedSearchFilter, DjangoFilterBackend]
     search_fields = ["name"]
     filterset_class = StarSystemFilter
 
@@ -70,6 +75,66 @@ class StarViewSet(ReadOnlyModelViewSet):
 
     queryset = Star.objects.select_related("system").order_by("name")
     serializer_class = StarSerializer
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    filter_backends = [IndexedSearchFilter, DjangoFilterBackend]
     search_fields = ["name", "system__name"]
     filterset_class = StarFilter
+
+
+@extend_schema(
+    summary="Typeahead suggestions for planet, star and star system names.",
+    parameters=[
+        OpenApiParameter("q", str, description="The name prefix to complete.", required=True),
+        OpenApiParameter("limit", int, description="Maximum number of suggestions (1-25, default 10)."),
+        OpenApiParameter(
+            "type",
+            str,
+            description="Restrict suggestions to an entity type. May be repeated.",
+            enum=list(AUTOCOMPLETE_ENTITY_TYPES),
+            many=True,
+        ),
+    ],
+    responses={
+        200: OpenApiResponse(
+            response=inline_serializer(
+                name="AutocompleteResponse",
+                fields={
+                    "query": serializers.CharField(help_text="The prefix that was completed."),
+                    "results": serializers.ListField(
+                        child=serializers.DictField(),
+                        help_text="Ranked suggestions, each with a 'type', 'id' and 'name'.",
+                    ),
+                },
+            )
+        ),
+    },
+)
+class AutocompleteView(APIView):
+    """
+    Read-only API endpoint for name autocompletion, served from an in-memory index.
+    This is a private resource.
+    """
+
+    authentication_classes = [APIKeyAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticatedOrPublic]
+    is_public_resource = False
+
+    # clients send a request per keystroke, so lookups are throttled per minute on their own scope
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "autocomplete"
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get("q", "")
+
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 10)), 25))
+        except ValueError:
+            limit = 10
+
+        entity_types = [
+            entity_type for entity_type in request.query_params.getlist("type")
+            if entity_type in AUTOCOMPLETE_ENTITY_TYPES
+        ] or None
+
+        results = get_autocomplete_index().search(query, limit=limit, entity_types=entity_types)
+
+        return Response({"query": query, "results": results}, status=status.HTTP_200_OK)
@@ -1,13 +1,95 @@
+from functools import cached_property
+
 from django.shortcuts import render
 
+from api.data_version import get_data_version
 from api.models import Planet
 
+PLANETS_PAGE_SIZE = 50
+# rendered pages are keyed on the data version, so this only bounds how long stale versions linger
+PLANETS_PAGE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+class PlanetKeysetPage:
+    """
+    A page of planets navigated by name (keyset pagination) rather than by offset.
+
+    Rows are only queried when the template first reads them, so a cached page
+    fragment costs no database queries beyond resolving its cursor.
+    """
+
+    def __init__(self, after=None, before=None, page_size=PLANETS_PAGE_SIZE):
+        self.after = after
+        self.before = before
+        self.page_size = page_size
+
+    @classmethod
+    def from_cursors(cls, after=None, before=None, page_size=PLANETS_PAGE_SIZE):
+        """
+        Returns the page for the cursors a client sent, moved to the planet names that give the
+        same page, so that only names of real rows (which the rendered pages are keyed on) are
+        ever used. A cursor with no such name falls back to the first page.
+        """
+        planet_names = Planet.objects.values_list("name", flat=True)
+        if after is not None:
+            # the page after a missing name is the page after the last name before it
+            after = planet_names.filter(name__lte=after).order_by("-name").first()
+            return cls(after=after, page_size=page_size)
+        if before is not None:
+            before = planet_names.filter(name__gte=before).order_by("name").first()
+        return cls(before=before, page_size=page_size)
+
+    @cached_property
+    def _rows_and_overflow(self):
+        queryset = Planet.objects.values("name", "host_star__name", "orbital_period_days", "radius_earth")
+
+        if self.before is not None:
+            rows = list(queryset.filter(name__lt=self.before).order_by("-name")[:self.page_size + 1])
+            has_more = len(rows) > self.page_size
+            return list(reversed(rows[:self.page_size])), has_more
+
+        if self.after is not None:
+            queryset = queryset.filter(name__gt=self.after)
+
+        rows = list(queryset.order_by("name")[:self.page_size + 1])
+        return rows[:self.page_size], len(rows) > self.page_size
+
+    @property
+    def rows(self):
+        return self._rows_and_overflow[0]
+
+    @property
+    def has_next(self):
+        if self.before is not None:
+            return True
+        return self._rows_and_overflow[1]
+
+    @property
+    def has_previous(self):
+        if self.before is not None:
+            return self._rows_and_overflow[1]
+        return self.after is not None
+
+    @property
+    def next_cursor(self):
+        return self.rows[-1]["name"] if self.rows else None
+
+    @property
+    def previous_cursor(self):
+        return self.rows[0]["name"] if self.rows else None
+
 
 def planets(request):
     """
-    A view to display a list of all planets in the database
+    A view to display a paginated catalog of planets, navigated with ?after= and ?before= planet names
     """
-    planets = Planet.objects.select_related("host_star").order_by("name")
-    context = {"api": planets}
+    after = request.GET.get("after") or None
+    before = request.GET.get("before") or None
+
+    context = {
+        "page": PlanetKeysetPage.from_cursors(after=after, before=before),
+        "data_version": get_data_version(),
+        "cache_timeout": PLANETS_PAGE_CACHE_TIMEOUT,
+    }
 
     return render(request, "planets/planets.html", context)
@@ -0,0 +1,163 @@
+import gzip
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_max_age, patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli is a dependency, but gzip still works without it
+    brotli = None
+
+ACCEPT_ENCODING_PATTERN = re.compile(r"\s*([a-z0-9*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?", re.IGNORECASE)
+
+# never compress pages that embed a CSRF token (BREACH)
+CSRF_TOKEN_MARKER = b"csrfmiddlewaretoken"
+
+# Cache-Control directives of responses that must not be stored
+UNCACHEABLE_DIRECTIVES = ("private", "no-store", "no-cache")
+
+
+def compress_payload(content, encoding):
+    """
+    Compresses the given bytes with the given content encoding.
+    """
+    if encoding == "br":
+        return brotli.compress(content, quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY)
+
+    # mtime is pinned so that identical payloads always compress to identical bytes
+    return gzip.compress(content, compresslevel=settings.RESPONSE_COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def get_precompressed_payload(content, encoding):
+    """
+    Returns the compressed variant of the given bytes, compressing them only on a cache miss.
+
+    Variants are keyed on a digest of the uncompressed content, so any cached or repeated
+    response body is compressed once and then served from the cache on every other hit.
+    """
+    digest = hashlib.blake2b(content, digest_size=20).hexdigest()
+    cache_key = f"compressed-response:{encoding}:{digest}"
+
+    compressed_content = cache.get(cache_key)
+    if compressed_content is None:
+        compressed_content = compress_payload(content, encoding)
+        cache.set(cache_key, compressed_content, settings.RESPONSE_COMPRESSION_CACHE_TIMEOUT)
+
+    return compressed_content
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Picks the preferred supported content encoding from an Accept-Encoding header value.
+    Returns None if the client does not accept any supported encoding.
+    """
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+    qualities = {}
+    for part in accept_encoding.split(","):
+        match = ACCEPT_ENCODING_PATTERN.match(part)
+        if not match:
+            continue
+        coding, quality = match.group(1).lower(), match.group(2)
+        try:
+            qualities[coding] = float(quality) if quality is not None else 1.0
+        except ValueError:
+            continue
+
+    best_encoding, best_quality = None, 0.0
+    for encoding in supported:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        # ties go to the earlier, better compressing, encoding
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+
+    return best_encoding
+
+
+class CompressedResponseMiddleware:
+    """
+    Compresses API responses with brotli or gzip, depending on what the client accepts.
+
+    Short responses are left as is. Compressed variants of shared responses (see _is_shared)
+    are cached by content digest so that repeated payloads are not compressed on every hit,
+    every other response is compressed inline.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if not self._should_compress(request, response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        encoding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if self._is_shared(request, response):
+            compressed_content = get_precompressed_payload(response.content, encoding)
+        else:
+            compressed_content = compress_payload(response.content, encoding)
+        # return the compressed content only if it's actually shorter
+        if len(compressed_content) >= len(response.content):
+            return response
+
+        response.content = compressed_content
+        response.headers["Content-Length"] = str(len(compressed_content))
+        response.headers["Content-Encoding"] = encoding
+
+        # a strong ETag must be weakened once the representation has been encoded
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+
+        return response
+
+    @staticmethod
+    def _is_shared(request, response):
+        """
+        Whether a response is public and cacheable: the same for every anonymous client of a URL
+        without a query string, so that the variants cached for it are bounded by the catalog
+        rather than by what clients ask for. Per-user, paginated and filtered responses are not.
+        """
+        if request.method not in ("GET", "HEAD") or response.status_code != 200:
+            return False
+
+        if request.META.get("QUERY_STRING") or request.META.get("HTTP_AUTHORIZATION"):
+            return False
+
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return False
+
+        cache_control = response.get("Cache-Control", "").lower()
+        if any(directive in cache_control for directive in UNCACHEABLE_DIRECTIVES):
+            return False
+
+        return get_max_age(response) != 0
+
+    @staticmethod
+    def _should_compress(request, response):
+        if response.streaming or response.has_header("Content-Encoding"):
+            return False
+
+        if not request.path.startswith(tuple(settings.RESPONSE_COMPRESSION_PATH_PREFIXES)):
+            return False
+
+        if len(response.content) < settings.RESPONSE_COMPRESSION_MIN_SIZE:
+            return False
+
+        content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type.endswith("json"):
+            return True
+
+        if content_type == "text/html":
+            return CSRF_TOKEN_MARKER not in response.content
+
+        return False
@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # compress API responses last, after every other middleware has touched the body
+    "config.middleware.CompressedResponseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -135,6 +137,9 @@ REST_FRAMEWORK = {
     "DEFAULT_THROTTLE_RATES": {
         "anon": "10/day",  # 5 requests per day for anonymous users
         "user": "100/day",  # 100 requests per day for users with an API key or session
+        "autocomplete": "120/minute",  # autocomplete lookups, one per keystroke
+        "task_status": "60/minute",  # task status lookups, polled by clients following their tasks
+        "task_status_wait": "12/minute",  # task status lookups that wait, each holding a worker
     },
 }
 
@@ -158,6 +163,52 @@ CELERY_BEAT_SCHEDULE = {
     }
 }
 
+# API response compression settings
+# responses shorter than this (in bytes) are not worth compressing
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+RESPONSE_COMPRESSION_PATH_PREFIXES = ["/api/"]
+RESPONSE_COMPRESSION_GZIP_LEVEL = 6
+RESPONSE_COMPRESSION_BROTLI_QUALITY = 5
+# precompressed payloads of public, cacheable responses are cached by content digest for a day
+RESPONSE_COMPRESSION_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Canonical import settings
+# load the nightly import into shadow copies of the catalog tables and swap them in at once
+# (PostgreSQL only), so that readers never wait on the import or see a half-updated catalog
+CANONICAL_IMPORT_SHADOW_SWAP = False
+# let the nightly import delete the rows that are no longer in the canonical files; off unless
+# the canonical files are the only source of the catalog tables
+CANONICAL_IMPORT_PRUNE = False
+# Redis the change feed of every import is published to (on the catalog:changes channel), and
+# that web processes listen to so that their caches are updated as soon as an import commits,
+# or None to only log it in the database and notify subscribers in the importing process
+CATALOG_CHANGE_FEED_REDIS_URL = None
+# change feed entries older than this (in days) are removed by the next import
+CATALOG_CHANGE_FEED_RETENTION_DAYS = 30
+
+# Task event settings
+# Redis the state transitions of the users' tasks are published to, and streamed from to the
+# dashboard as server-sent events, or None to have clients poll the task status instead. The
+# stream is only served under ASGI (config.asgi), since every open stream would hold a WSGI
+# worker; under WSGI the endpoint answers 503 and clients poll
+TASK_EVENTS_REDIS_URL = None
+
+# NASA TAP response cache settings
+# snapshots of TAP responses, keyed by query, so that reruns do not download the tables again
+NASA_TAP_CACHE_DIR = BASE_DIR / "data" / "tap_cache"
+# snapshots younger than this (in seconds) are used without asking the TAP service
+NASA_TAP_CACHE_MAX_AGE = 12 * 60 * 60
+# replay cached snapshots only, never fetching from the TAP service
+NASA_TAP_OFFLINE = False
+# number of TAP tables downloaded at the same time
+NASA_TAP_FETCH_CONCURRENCY = 2
+# number of chunks of a chunked TAP table downloaded at the same time
+NASA_TAP_CHUNK_CONCURRENCY = 4
+# failed downloads are retried this many times, waiting NASA_TAP_FETCH_BACKOFF seconds,
+# then twice as long before each further attempt
+NASA_TAP_FETCH_RETRIES = 3
+NASA_TAP_FETCH_BACKOFF = 2
+
 # Graphene-Django settings
 GRAPHENE = {
     "SCHEMA": "config.schema.schema",
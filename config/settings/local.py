@@ -32,6 +32,10 @@ DATABASES = {
     )
 }
 
+CACHES = {
+    "default": env.cache_url("CACHE_URL", default="locmemcache://"),
+}
+
 CELERY_TIMEZONE = env("CELERY_TIMEZONE", default="UTC")
 
 CELERY_BROKER_URL = env("CELERY_BROKER_URL")
@@ -40,4 +44,13 @@ CELERY_BROKER_URL = env("CELERY_BROKER_URL")
 # use Redis database #1
 CELERY_RESULT_BACKEND = env("CELERY_RESULT_BACKEND")
 
-NASA_TAP_BASE_URL = "https://exoplanetarchive.ipac.caltech.edu/TAP/sync"
+NASA_TAP_BASE_URL = env("NASA_TAP_BASE_URL", default="https://exoplanetarchive.ipac.caltech.edu/TAP/sync")
+NASA_TAP_CACHE_DIR = env("NASA_TAP_CACHE_DIR", default=NASA_TAP_CACHE_DIR)
+NASA_TAP_CACHE_MAX_AGE = env.int("NASA_TAP_CACHE_MAX_AGE", default=NASA_TAP_CACHE_MAX_AGE)
+NASA_TAP_OFFLINE = env.bool("NASA_TAP_OFFLINE", default=NASA_TAP_OFFLINE)
+
+CANONICAL_IMPORT_SHADOW_SWAP = env.bool("CANONICAL_IMPORT_SHADOW_SWAP", default=CANONICAL_IMPORT_SHADOW_SWAP)
+CANONICAL_IMPORT_PRUNE = env.bool("CANONICAL_IMPORT_PRUNE", default=CANONICAL_IMPORT_PRUNE)
+CATALOG_CHANGE_FEED_REDIS_URL = env("CATALOG_CHANGE_FEED_REDIS_URL", default=CATALOG_CHANGE_FEED_REDIS_URL)
+
+TASK_EVENTS_REDIS_URL = env("TASK_EVENTS_REDIS_URL", default=TASK_EVENTS_REDIS_URL)
@@ -63,6 +63,11 @@ DATABASES = {
     )
 }
 
+# shared by all web and worker processes
+CACHES = {
+    "default": env.cache_url("CACHE_URL", default="rediscache://redis:6379/2"),
+}
+
 MIDDLEWARE.insert(1, "whitenoise.middleware.WhiteNoiseMiddleware")
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
@@ -76,4 +81,14 @@ CELERY_BROKER_URL = env("CELERY_BROKER_URL", default="redis://redis:6379/0")
 # use Redis database #1
 CELERY_RESULT_BACKEND = env("CELERY_RESULT_BACKEND", default="redis://redis:6379/1")
 
-NASA_TAP_BASE_URL = "https://exoplanetarchive.ipac.caltech.edu/TAP/sync"
+NASA_TAP_BASE_URL = env("NASA_TAP_BASE_URL", default="https://exoplanetarchive.ipac.caltech.edu/TAP/sync")
+NASA_TAP_CACHE_DIR = env("NASA_TAP_CACHE_DIR", default=NASA_TAP_CACHE_DIR)
+NASA_TAP_CACHE_MAX_AGE = env.int("NASA_TAP_CACHE_MAX_AGE", default=NASA_TAP_CACHE_MAX_AGE)
+NASA_TAP_OFFLINE = env.bool("NASA_TAP_OFFLINE", default=NASA_TAP_OFFLINE)
+
+CANONICAL_IMPORT_SHADOW_SWAP = env.bool("CANONICAL_IMPORT_SHADOW_SWAP", default=True)
+CANONICAL_IMPORT_PRUNE = env.bool("CANONICAL_IMPORT_PRUNE", default=False)
+# the broker's database, so that every web and worker process can subscribe
+CATALOG_CHANGE_FEED_REDIS_URL = env("CATALOG_CHANGE_FEED_REDIS_URL", default="redis://redis:6379/0")
+
+TASK_EVENTS_REDIS_URL = env("TASK_EVENTS_REDIS_URL", default=None)
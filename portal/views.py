@@ -1,13 +1,11 @@
 from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views import View
 from django.views.generic import CreateView
 from rest_framework.reverse import reverse_lazy
 
-from api.models import Planet, Star, StarSystem
 from api_keys.models import APIKey
 from portal.forms import SignupForm
 
@@ -44,50 +42,9 @@ class PortalDashboardView(LoginRequiredMixin, View):
         """
         api_keys = APIKey.objects.filter(user=request.user)
 
-        # simulation data models
-        travel_sim_star_systems = StarSystem.objects.filter(
-            distance_parsecs__isnull=False
-        ).order_by("name")
-
-        seasonality_sim_planets = (
-            Planet.objects.filter(
-                Q(host_star__luminosity_sun__isnull=False)
-                | (
-                        Q(host_star__radius_sun__isnull=False)
-                        & Q(host_star__effective_temperature_k__isnull=False)
-                ),
-                semi_major_axis_au__isnull=False,
-                orbital_eccentricity__isnull=False,
-            )
-            .select_related("host_star")
-            .order_by("name")
-            .distinct()
-        )
-
-        tidal_locking_sim_planets = (
-            Planet.objects.filter(
-                Q(host_star__mass_sun__isnull=False) & Q(host_star__age_gya__isnull=False),
-                mass_earth__isnull=False,
-                radius_earth__isnull=False,
-                semi_major_axis_au__isnull=False,
-            )
-            .select_related("host_star")
-            .order_by("name")
-            .distinct()
-        )
-
-        star_lifetime_sim_stars = Star.objects.filter(
-            mass_sun__isnull=False,
-            age_gya__isnull=False,
-        ).order_by("name")
-
         context = {
             "api_keys": api_keys,
             "api_key_count": api_keys.count(),
-            "travel_sim_star_systems": travel_sim_star_systems,
-            "seasonality_sim_planets": seasonality_sim_planets,
-            "tidal_locking_sim_planets": tidal_locking_sim_planets,
-            "star_lifetime_sim_stars": star_lifetime_sim_stars,
         }
 
         return render(request, self.template_name, context)
@@ -0,0 +1,107 @@
+"""
+Compares the size and load time of the canonical data files in JSON and in the binary format.
+
+Run from the project root:
+
+    python -m scripts.benchmark_canonical_formats [--repeat 5]
+"""
+import argparse
+import io
+import json
+import time
+from pathlib import Path
+
+from api.canonical_files import iter_canonical_binary, iter_json_array, write_canonical_binary
+from scripts.canonical_data_consolidater import CANONICAL_APP_TABLES, CANONICAL_FIELD_TYPES, canonical_data_filepath
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def best_time(func, repeat):
+    """
+    Returns the best wall time of 'repeat' calls, in milliseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+# what the numeric fields read back as
+_FIELD_CONVERTERS = {"int64": int, "float64": float}
+
+
+def _present_values(record):
+    return {
+        name: _FIELD_CONVERTERS[CANONICAL_FIELD_TYPES[name]](value) if name in CANONICAL_FIELD_TYPES else value
+        for name, value in record.items()
+        if value is not None
+    }
+
+
+def benchmark_file(json_file, repeat):
+    json_bytes = json_file.read_bytes()
+    records = json.loads(json_bytes)
+
+    compressed = io.BytesIO()
+    write_canonical_binary(records, compressed, CANONICAL_FIELD_TYPES)
+    uncompressed = io.BytesIO()
+    write_canonical_binary(records, uncompressed, CANONICAL_FIELD_TYPES, compress=False)
+
+    # the binary format must round trip to the same records, with numeric fields read back as numbers
+    # and missing values as None
+    decoded = list(iter_canonical_binary(io.BytesIO(compressed.getvalue())))
+    assert [_present_values(record) for record in decoded] == [_present_values(record) for record in records]
+
+    return {
+        "file": json_file.name,
+        "records": len(records),
+        "sizes": {
+            "json": len(json_bytes),
+            "binary": len(compressed.getvalue()),
+            "binary (uncompressed)": len(uncompressed.getvalue()),
+        },
+        "load_ms": {
+            "json.load": best_time(lambda: json.loads(json_bytes), repeat),
+            "json (streamed)": best_time(
+                lambda: sum(1 for _ in iter_json_array(io.StringIO(json_bytes.decode()))), repeat
+            ),
+            "binary": best_time(
+                lambda: sum(1 for _ in iter_canonical_binary(io.BytesIO(compressed.getvalue()))), repeat
+            ),
+            "binary (uncompressed)": best_time(
+                lambda: sum(1 for _ in iter_canonical_binary(io.BytesIO(uncompressed.getvalue()))), repeat
+            ),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement, the best one is kept")
+    args = parser.parse_args()
+
+    totals = {}
+    for app_table in CANONICAL_APP_TABLES:
+        json_file = PROJECT_ROOT / canonical_data_filepath(app_table)
+        result = benchmark_file(json_file, args.repeat)
+        print(f"\n{result['file']} ({result['records']} records)")
+        for fmt, size in result["sizes"].items():
+            print(f"  size  {fmt:<24} {size / 1024:>9.1f} KiB")
+            totals.setdefault(("size", fmt), 0)
+            totals[("size", fmt)] += size
+        for fmt, load_ms in result["load_ms"].items():
+            print(f"  load  {fmt:<24} {load_ms:>9.1f} ms")
+            totals.setdefault(("load", fmt), 0)
+            totals[("load", fmt)] += load_ms
+
+    print("\ntotal")
+    for (kind, fmt), value in totals.items():
+        unit = f"{value / 1024:>9.1f} KiB" if kind == "size" else f"{value:>9.1f} ms"
+        print(f"  {kind:<5} {fmt:<24} {unit}")
+
+
+if __name__ == "__main__":
+    main()
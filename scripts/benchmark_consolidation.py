@@ -0,0 +1,227 @@
+"""
+Compares transform_and_consolidate with the original implementation on the raw NASA tables,
+and checks that both produce the same canonical records. Also compares the peak memory of
+fetching and consolidating each table as tuples with the original rows of dicts.
+
+The raw tables are read from the TAP snapshot cache (NASA_TAP_CACHE_DIR), so they must have been
+fetched once, e.g. by running the create_nasa_canonical_data command. Run from the project root:
+
+    python -m scripts.benchmark_consolidation [--repeat 3] [--distinct-references]
+
+Memoized reference years gain the most where many rows cite the same reference, so the number
+of distinct references is printed with the timings. With --distinct-references, every row cites
+a reference of its own (of the same shape and text), which is the worst case for memoization.
+"""
+import argparse
+import csv
+import os
+import re
+import time
+import tracemalloc
+
+from api.tap_cache import get_cached_snapshot
+from scripts import canonical_data_consolidater as consolidater
+
+SORT_CONFIGS = {
+    "ps": (
+        "pl_name",
+        {"sort_key_name": "publication_year", "source_field_name": "pl_refname", "derive_sort_key": True},
+    ),
+    "stellarhosts": (
+        "hostname",
+        {"sort_key_name": "publication_year", "source_field_name": "st_refname", "derive_sort_key": True},
+    ),
+}
+
+
+def reference_publication_year(reference_string):
+    """
+    The original year parser: a new HTML parser and regex search for every reference.
+    """
+    default_year = 1900
+
+    if not isinstance(reference_string, str):
+        return default_year
+
+    parser = consolidater.LinkTextParser()
+    parser.feed(reference_string)
+    clean_text = parser.text or reference_string
+
+    found_years = re.findall(r'\b(19|20)\d{2}\b', clean_text)
+    if found_years:
+        return max([int(year) for year in found_years])
+
+    return default_year
+
+
+def reference_transform_and_consolidate(raw_data, group_by_key, sort_config):
+    """
+    The original consolidation: a field by field merge of every record, then a second pass over
+    all of them for the fields that stayed empty.
+    """
+    grouped_data = {}
+    for record in raw_data:
+        key = record.get(group_by_key)
+        if key:
+            grouped_data.setdefault(key, []).append(record)
+
+    canonical_records = []
+    for records in grouped_data.values():
+        if sort_config.get("derive_sort_key"):
+            for record in records:
+                record[sort_config["sort_key_name"]] = (
+                    reference_publication_year(record[sort_config["source_field_name"]])
+                )
+
+            records.sort(key=lambda r: int(r.get(sort_config["sort_key_name"]) or 0), reverse=True)
+
+        canonical_record = {}
+        for record in records:
+            for field, value in record.items():
+                if canonical_record.get(field) is None and value is not None:
+                    canonical_record[field] = value
+
+        all_fields = {k for r in records for k in r}
+        for field in all_fields:
+            if field not in canonical_record:
+                canonical_record[field] = None
+
+        canonical_records.append(canonical_record)
+
+    return canonical_records
+
+
+def with_distinct_references(raw_data, reference_field):
+    """
+    Returns a copy of a raw table in which every row cites a reference string of its own, of the
+    same shape: links get an attribute of their own and plain text a suffix of letters, which
+    leave their text, and so their publication year, unchanged.
+    """
+    index = raw_data.index(reference_field)
+    rows = []
+    for row_number, row in enumerate(raw_data.rows):
+        row = list(row)
+        reference = row[index]
+        if reference is not None and reference.startswith("<a "):
+            row[index] = f"<a data-row={row_number} {reference[3:]}"
+        elif reference is not None:
+            row[index] = f"{reference} {_letters(row_number)}"
+        rows.append(tuple(row))
+    return consolidater.RawTable(raw_data.columns, rows, raw_data.source_digest)
+
+
+def _letters(number):
+    letters = ""
+    while True:
+        number, remainder = divmod(number, 26)
+        letters += chr(ord("a") + remainder)
+        if not number:
+            return letters
+
+
+def reference_fetch_raw_nasa_data(nasa_table, app_table):
+    """
+    The original raw rows: a dict per row, read from the cached TAP snapshots.
+    """
+    records = []
+    for url in consolidater.build_table_urls(nasa_table, app_table):
+        with get_cached_snapshot(url).open() as csv_file:
+            records += [{k: v if v != "" else None for k, v in row.items()} for row in csv.DictReader(csv_file)]
+    return records
+
+
+def best_time(func, make_input, repeat):
+    """
+    Returns the best wall time of 'repeat' calls on fresh input, which the original consolidation
+    modifies, in seconds, and the result of the last call.
+    """
+    timings = []
+    for _ in range(repeat):
+        data = make_input()
+        # every run starts without memoized reference years
+        consolidater._parse_publication_year.cache_clear()
+        start = time.perf_counter()
+        result = func(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def peak_memory(func):
+    """
+    Returns the peak memory allocated while calling 'func', in bytes.
+    """
+    consolidater._parse_publication_year.cache_clear()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def compare_table(nasa_table, app_table, repeat, distinct_references=False):
+    """
+    Prints the wall time and peak memory of both consolidations of a NASA table, once checked
+    that they produce the same canonical records.
+    """
+    raw_data = consolidater.fetch_raw_nasa_data(nasa_table, app_table, logger=lambda message: None, offline=True)
+    group_by_key, sort_config = SORT_CONFIGS[nasa_table]
+    reference_field = sort_config["source_field_name"]
+    if distinct_references:
+        raw_data = with_distinct_references(raw_data, reference_field)
+    reference_index = raw_data.index(reference_field)
+    reference_count = len({row[reference_index] for row in raw_data.rows})
+
+    reference_time, expected = best_time(
+        lambda records: reference_transform_and_consolidate(records, group_by_key, sort_config),
+        raw_data.to_records,
+        repeat,
+    )
+    optimized_time, result = best_time(
+        lambda table: consolidater.transform_and_consolidate(table, group_by_key, sort_config),
+        lambda: raw_data,
+        repeat,
+    )
+
+    assert result == expected, f"consolidated '{nasa_table}' records differ from the original implementation"
+
+    reference_peak = peak_memory(
+        lambda: reference_transform_and_consolidate(
+            reference_fetch_raw_nasa_data(nasa_table, app_table), group_by_key, sort_config
+        )
+    )
+    optimized_peak = peak_memory(
+        lambda: consolidater.transform_and_consolidate(
+            consolidater.fetch_raw_nasa_data(nasa_table, app_table, logger=lambda message: None, offline=True),
+            group_by_key,
+            sort_config,
+        )
+    )
+
+    print(
+        f"\n{nasa_table} ({len(raw_data)} rows, {reference_count} distinct references, {len(result)} canonical "
+        f"records, identical output)"
+    )
+    print(f"  original  {reference_time * 1000:>9.1f} ms  peak {reference_peak / 2 ** 20:>7.1f} MiB")
+    print(
+        f"  optimized {optimized_time * 1000:>9.1f} ms  peak {optimized_peak / 2 ** 20:>7.1f} MiB"
+        f"  ({reference_time / optimized_time:.1f}x faster)"
+    )
+
+
+def main():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the best one is kept")
+    parser.add_argument(
+        "--distinct-references", action="store_true", help="Give every row a reference of its own (worst case)"
+    )
+    args = parser.parse_args()
+
+    for nasa_table, (app_table, _) in consolidater.CONSOLIDATION_SOURCES.items():
+        compare_table(nasa_table, app_table, args.repeat, args.distinct_references)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compares fetching and consolidating the NASA tables one at a time and concurrently, against a
+rate limited local stand-in for the TAP service that replays the cached snapshots.
+
+The snapshots of the consolidation queries must be cached first, e.g. by running the
+create_nasa_canonical_data command once. Run from the project root:
+
+    python -m scripts.benchmark_tap_fetch [--rate 2048] [--latency 1] [--repeat 3]
+"""
+import argparse
+import functools
+import os
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+from django.conf import settings
+
+from api.tap_cache import get_cache_dir
+from scripts import canonical_data_consolidater as consolidater
+from scripts.serve_tap_cache import TapCacheRequestHandler
+
+
+def best_time(func, repeat):
+    """
+    Returns the best wall time of 'repeat' calls, in seconds. Every call starts with an empty
+    cache, so that it downloads everything from the stand-in server.
+    """
+    timings = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            settings.NASA_TAP_CACHE_DIR = cache_dir
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def fetch_table(nasa_table):
+    app_table, consolidate = consolidater.CONSOLIDATION_SOURCES[nasa_table]
+    consolidate(consolidater.fetch_raw_nasa_data(nasa_table, app_table, logger=lambda message: None))
+
+
+def main():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rate", type=int, default=2048, help="KiB per second served per response")
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds before each response starts")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the best one is kept")
+    args = parser.parse_args()
+
+    TapCacheRequestHandler.cache_dir = get_cache_dir()
+    TapCacheRequestHandler.rate = args.rate * 1024
+    TapCacheRequestHandler.latency = args.latency
+    TapCacheRequestHandler.log_message = lambda *args: None
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TapCacheRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.NASA_TAP_BASE_URL = f"http://127.0.0.1:{server.server_port}/TAP/sync"
+
+    try:
+        print(f"stand-in TAP service: {args.rate} KiB/s per response, {args.latency}s latency")
+        table_timings = {}
+        for nasa_table in consolidater.CONSOLIDATION_SOURCES:
+            table_timings[nasa_table] = best_time(functools.partial(fetch_table, nasa_table), args.repeat)
+            print(f"  {nasa_table:<24} {table_timings[nasa_table]:>8.2f} s")
+
+        print(f"  {'sum':<24} {sum(table_timings.values()):>8.2f} s")
+        print(f"  {'slowest':<24} {max(table_timings.values()):>8.2f} s")
+
+        for max_workers in (1, len(consolidater.CONSOLIDATION_SOURCES)):
+            timing = best_time(
+                functools.partial(
+                    consolidater.fetch_and_consolidate, logger=lambda message: None, max_workers=max_workers
+                ),
+                args.repeat,
+            )
+            print(f"  {f'consolidation, {max_workers} worker(s)':<24} {timing:>8.2f} s")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,20 @@
 import csv
-import io
+import hashlib
+import html
 import json
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cache
 from html.parser import HTMLParser
+from pathlib import Path
 
 import requests
+from django.conf import settings
 
-from api.utils import build_nasa_tap_url
+from api.canonical_files import CANONICAL_BINARY_SUFFIX, iter_canonical_records, write_canonical_binary
+from api.tap_cache import TapCacheError, fetch_tap_snapshots
+from api.utils import build_key_range_conditions, build_nasa_tap_url, file_sha256
 
 TABLE_FIELD_SELECTION_CONFIG = {
     "ps": {
@@ -48,6 +56,85 @@ TABLE_FIELD_SELECTION_CONFIG = {
     },
 }
 
+# types of the numeric NASA fields, which canonical binary files store as numbers rather than as
+# the strings the TAP service returns
+CANONICAL_FIELD_TYPES = {
+    "pl_orbper": "float64",
+    "pl_rade": "float64",
+    "pl_masse": "float64",
+    "pl_eqt": "float64",
+    "pl_orbsmax": "float64",
+    "pl_insol": "float64",
+    "pl_orbeccen": "float64",
+    "disc_year": "int64",
+    "st_mass": "float64",
+    "st_rad": "float64",
+    "st_teff": "float64",
+    "st_lum": "float64",
+    "st_age": "float64",
+    "sy_snum": "int64",
+    "sy_pnum": "int64",
+    "sy_mnum": "int64",
+    "sy_dist": "float64",
+    "ra": "float64",
+    "dec": "float64",
+}
+
+
+# digests of the raw rows behind the canonical files, so that the next run only merges what changed
+# (not named like a canonical file, which tools find by their canonical_<app table> names)
+CONSOLIDATION_STATE_FILE = Path("data/consolidation_state.json")
+# bumped whenever the consolidation rules change, so that the next run consolidates everything
+# (3: binary files written before their numeric columns were typed are in an older format)
+CONSOLIDATION_STATE_VERSION = 3
+
+# the year of references without one, which sorts them after every dated reference
+DEFAULT_PUBLICATION_YEAR = 1900
+PUBLICATION_YEAR_PATTERN = re.compile(r'\b(19|20)\d{2}\b')
+# the usual reference: a single link, whose text is read without an HTML parser
+REFERENCE_LINK_PATTERN = re.compile(r"<a\b[^<>]*>([^<>]*)</a>")
+
+
+# NASA table -> the column its TAP queries are split on, and the boundaries of the value ranges,
+# so that each chunk is a bounded query that can be retried and resumed on its own
+TABLE_CHUNK_CONFIG = {
+    "ps": {
+        "column": "hostname",
+        "boundaries": ["HD", "K2-", "Kepler-1", "Kepler-2", "Kepler-6", "L", "TOI-", "V"],
+    },
+    "stellarhosts": {
+        "column": "hostname",
+        "boundaries": ["HD", "K2-", "Kepler-1", "Kepler-2", "Kepler-6", "L", "TOI-", "V"],
+    },
+}
+
+
+class RawTable:
+    """
+    The rows of a TAP table, as tuples of values in the order of 'columns'.
+
+    A tuple holds a row in a fraction of the memory of a dict with the same fields, and the
+    rows only refer to the schema instead of each carrying its own keys.
+    """
+
+    __slots__ = ("_column_indexes", "columns", "rows", "source_digest")
+
+    def __init__(self, columns, rows, source_digest=None):
+        self.columns = tuple(columns)
+        self.rows = rows
+        # digest of the TAP response the rows were read from
+        self.source_digest = source_digest
+        self._column_indexes = {column: index for index, column in enumerate(self.columns)}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def index(self, column):
+        return self._column_indexes[column]
+
+    def to_records(self):
+        return [dict(zip(self.columns, row, strict=True)) for row in self.rows]
+
 
 class LinkTextParser(HTMLParser):
     def __init__(self):
@@ -62,51 +149,99 @@ def get_publication_year_from_reference(reference_string):
     """
     Extracts the latest plausible year from a reference string, which may contain HTML.
     """
-    default_year = 1900
-
     if not isinstance(reference_string, str):
-        return default_year
-
-    parser = LinkTextParser()
-    parser.feed(reference_string)
-    clean_text = parser.text or reference_string
-
-    found_years = re.findall(r'\b(19|20)\d{2}\b', clean_text)
+        return DEFAULT_PUBLICATION_YEAR
+
+    return _parse_publication_year(reference_string)
+
+
+@cache
+def _parse_publication_year(reference_string):
+    # the same few thousand references are repeated across every row that cites them
+    link = REFERENCE_LINK_PATTERN.fullmatch(reference_string)
+    if link:
+        # the text the parser would give, character references included
+        clean_text = html.unescape(link.group(1)) or reference_string
+    elif "<" not in reference_string and "&" not in reference_string:
+        clean_text = reference_string
+    else:
+        parser = LinkTextParser()
+        parser.feed(reference_string)
+        clean_text = parser.text or reference_string
+
+    found_years = PUBLICATION_YEAR_PATTERN.findall(clean_text)
     if found_years:
         return max([int(year) for year in found_years])
 
-    return default_year
+    return DEFAULT_PUBLICATION_YEAR
 
 
-def fetch_raw_nasa_data(nasa_table, app_table, logger=print):
+def build_table_urls(nasa_table, app_table):
     """
-    Fetches raw data from the NASA API for a given table and returns it as a
-    list of dictionaries (one for each row).
+    Returns the TAP URLs that select the columns of 'app_table' from a NASA table: one for each
+    key range of a chunked table, or a single one.
     """
-    logger(f"Starting data extraction for '{app_table}' from NASA table '{nasa_table}'...")
-
     columns = TABLE_FIELD_SELECTION_CONFIG[nasa_table][app_table]
+    chunk_config = TABLE_CHUNK_CONFIG.get(nasa_table)
+    if not chunk_config:
+        return [build_nasa_tap_url(nasa_table, columns)]
 
-    try:
-        url = build_nasa_tap_url(nasa_table, columns)
+    return [
+        build_nasa_tap_url(nasa_table, columns, where=condition)
+        for condition in build_key_range_conditions(chunk_config["column"], chunk_config["boundaries"])
+    ]
 
-        logger(f"Fetching data from: {url}")
 
-        response = requests.get(url)
-        response.raise_for_status()
+def fetch_raw_nasa_data(nasa_table, app_table, logger=print, refresh=False, offline=None):
+    """
+    Fetches raw data from the NASA API for a given table and returns it as a
+    RawTable (one tuple for each row).
 
-        csv_data = io.StringIO(response.text)
-        reader = csv.DictReader(csv_data)
+    Large tables are fetched in key range chunks (TABLE_CHUNK_CONFIG) that resume after an
+    interruption. Responses are served from the TAP snapshot cache when recent enough.
+    """
+    logger(f"Starting data extraction for '{app_table}' from NASA table '{nasa_table}'...")
 
-        # convert the reader object to a list of dictionaries
-        data = [{k: v if v != "" else None for k, v in row.items()} for row in reader]
+    try:
+        snapshots = fetch_tap_snapshots(
+            build_table_urls(nasa_table, app_table), logger=logger, refresh=refresh, offline=offline
+        )
+
+        # every distinct value is stored once, however many rows repeat it (names, references...)
+        values = {}
+        rows = []
+        header = None
+        for snapshot in snapshots:
+            with snapshot.open() as csv_file:
+                reader = csv.reader(csv_file)
+                chunk_header = next(reader, [])
+                if header is None:
+                    header = chunk_header
+                elif chunk_header != header:
+                    raise ValueError(f"Chunks of NASA table '{nasa_table}' have different columns")
+
+                for row in reader:
+                    if not row:
+                        continue
+                    if len(row) < len(header):
+                        row += [""] * (len(header) - len(row))
+                    # any empty string is converted to None
+                    rows.append(tuple([values.setdefault(v, v) if v != "" else None for v in row[:len(header)]]))
+
+        if len(snapshots) == 1:
+            source_digest = snapshots[0].content_sha256
+        else:
+            source_digest = hashlib.sha256(
+                "".join(snapshot.content_sha256 for snapshot in snapshots).encode()
+            ).hexdigest()
+        data = RawTable(header, rows, source_digest=source_digest)
 
         logger(f"Successfully extracted {len(data)} raw records for '{app_table}'.")
 
         return data
     except AttributeError as e:
         raise e
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, TapCacheError) as e:
         logger(f"[ERROR] Failed to fetch data from NASA TAP service: {e}")
         raise e
     except Exception as e:
@@ -114,39 +249,61 @@ def fetch_raw_nasa_data(nasa_table, app_table, logger=print):
         raise e
 
 
-def transform_and_consolidate(raw_data, group_by_key, sort_config):
+def group_raw_rows(raw_data, group_by_key):
     """
-    Groups, sorts and merges fragmented records into a single canonical record.
+    Groups the rows of a RawTable by the value of a column, skipping rows without one.
     """
+    key_index = raw_data.index(group_by_key)
     grouped_data = {}
-    for record in raw_data:
-        key = record.get(group_by_key)
+    for row in raw_data.rows:
+        key = row[key_index]
         if key:
-            grouped_data.setdefault(key, []).append(record)
+            grouped_data.setdefault(key, []).append(row)
+    return grouped_data
 
-    canonical_records = []
-    for key, records in grouped_data.items():
-        if sort_config.get("derive_sort_key"):
-            # generate a sort key for each record by parsing the reference string
-            for record in records:
-                record[sort_config["sort_key_name"]] = (
-                    get_publication_year_from_reference(record[sort_config["source_field_name"]])
-                )
-
-            records.sort(key=lambda r: int(r.get(sort_config["sort_key_name"]) or 0), reverse=True)
-
-        canonical_record = {}
-        for record in records:
-            for field, value in record.items():
-                if canonical_record.get(field) is None and value is not None:
-                    canonical_record[field] = value
-
-        # create a set of all fields across all records
-        all_fields = {k for r in records for k in r.keys()}
-        for field in all_fields:
-            if field not in canonical_record:
-                canonical_record[field] = None
 
+def transform_and_consolidate(raw_data, group_by_key, sort_config):
+    """
+    Groups, sorts and merges fragmented records (a RawTable) into a single canonical record.
+    """
+    grouped_data = group_raw_rows(raw_data, group_by_key)
+
+    columns = raw_data.columns
+    derive_sort_key = sort_config.get("derive_sort_key")
+    if derive_sort_key:
+        sort_key_name = sort_config["sort_key_name"]
+        source_index = raw_data.index(sort_config["source_field_name"])
+
+        def publication_year(row):
+            return get_publication_year_from_reference(row[source_index])
+
+    canonical_records = []
+    for rows in grouped_data.values():
+        if derive_sort_key and len(rows) > 1:
+            # newest references first, by the year parsed from the reference string
+            rows.sort(key=publication_year, reverse=True)
+
+        if len(rows) == 1:
+            values = rows[0]
+        else:
+            # every field takes the first non-empty value, in sort order
+            values = list(rows[0])
+            missing_indexes = [index for index, value in enumerate(values) if value is None]
+            for row in rows[1:]:
+                if not missing_indexes:
+                    break
+                still_missing = []
+                for index in missing_indexes:
+                    value = row[index]
+                    if value is None:
+                        still_missing.append(index)
+                    else:
+                        values[index] = value
+                missing_indexes = still_missing
+
+        canonical_record = dict(zip(columns, values, strict=True))
+        if derive_sort_key:
+            canonical_record[sort_key_name] = publication_year(rows[0])
         canonical_records.append(canonical_record)
 
     return canonical_records
@@ -154,16 +311,70 @@ def transform_and_consolidate(raw_data, group_by_key, sort_config):
 
 def extract_unique_from_raw_data(raw_data, unique_on_keys):
     """
-    Extracts unique records based on a composite key.
+    Extracts unique records based on a composite key, as a RawTable of those keys.
     """
-    unique_records = set()
-    for row in raw_data:
-        unique_vals = tuple(row.get(key) for key in unique_on_keys)
+    key_indexes = [raw_data.index(key) for key in unique_on_keys]
+    unique_records = {}
+    for row in raw_data.rows:
+        unique_vals = tuple([row[index] for index in key_indexes])
         if any(item is not None for item in unique_vals):
-            unique_records.add(unique_vals)
+            unique_records[unique_vals] = None
 
-    record_list = [dict(zip(unique_on_keys, unique_vals)) for unique_vals in unique_records]
-    return record_list
+    return RawTable(unique_on_keys, list(unique_records))
+
+
+def consolidate_changed_groups(raw_data, group_by_key, sort_config, previous=None):
+    """
+    Consolidates only the groups whose raw rows changed since the previous run.
+
+    'previous' holds the canonical records and the digests of the raw rows of every group from
+    the previous run. Changed and new groups are consolidated again and patched into those
+    records in place, new ones at the end, and groups that no longer exist are dropped. Without
+    'previous', every group is consolidated.
+
+    Returns the canonical records, the digests of this run and the number of consolidated groups.
+    """
+    grouped_data = group_raw_rows(raw_data, group_by_key)
+    # the merge depends on the rows of a group and their order, and on nothing else
+    digests = {
+        key: hashlib.blake2b(json.dumps(rows).encode(), digest_size=16).hexdigest()
+        for key, rows in grouped_data.items()
+    }
+
+    if previous is None:
+        changed_keys = list(grouped_data)
+    else:
+        previous_digests = previous["digests"]
+        changed_keys = [key for key, digest in digests.items() if previous_digests.get(key) != digest]
+
+    changed_rows = RawTable(raw_data.columns, [row for key in changed_keys for row in grouped_data[key]])
+    changed_records = transform_and_consolidate(changed_rows, group_by_key, sort_config)
+    if previous is None:
+        return changed_records, digests, len(changed_keys)
+
+    changed_by_key = {record[group_by_key]: record for record in changed_records}
+    canonical_records = []
+    for record in previous["records"]:
+        key = record.get(group_by_key)
+        if key in digests:
+            changed_record = changed_by_key.pop(key, None)
+            canonical_records.append(changed_record or _as_consolidated(record, sort_config))
+    canonical_records.extend(changed_by_key.values())
+
+    return canonical_records, digests, len(changed_keys)
+
+
+def _as_consolidated(record, sort_config):
+    """
+    Returns a canonical record read back from a file with the value types a consolidation gives
+    it: raw values as strings and the derived sort key as an int, so that the records kept from
+    the previous run hash the same as when they were consolidated.
+    """
+    derived_key = sort_config["sort_key_name"] if sort_config.get("derive_sort_key") else None
+    return {
+        field: value if value is None or isinstance(value, str) or field == derived_key else str(value)
+        for field, value in record.items()
+    }
 
 
 def write_data_to_file(data, filepath):
@@ -177,43 +388,240 @@ def write_data_to_file(data, filepath):
         raise e
 
 
-def run_canonical_data_consolidation(logger=print):
+def write_binary_data_to_file(data, filepath):
     """
-    Runs the canonical data consolidation process.
+    Writes canonical data to a compact binary file, next to the JSON file of the same name.
     """
-    try:
-        logger("--- Starting Canonical Data Consolidation ---")
+    binary_filepath = Path(filepath).with_suffix(CANONICAL_BINARY_SUFFIX)
+    with open(binary_filepath, "wb") as f:
+        write_canonical_binary(data, f, CANONICAL_FIELD_TYPES)
+
+
+def write_canonical_data_files(data, filepath, write_json=True):
+    """
+    Writes canonical data to its binary file, which is what the importer reads, and optionally
+    to a readable JSON file for debugging.
+    """
+    if write_json:
+        # written first, so that the binary file is never older than the JSON file
+        write_data_to_file(data, filepath)
+    write_binary_data_to_file(data, filepath)
+
+
+def consolidate_star_data(raw_star_data, previous=None, logger=print):
+    """
+    Consolidates the raw 'stellarhosts' rows into canonical stars and star systems, and returns
+    them with the digests of the raw rows of every star.
+
+    Only the stars whose rows changed since the 'previous' run are merged again. Star systems
+    are a single pass over the rows, and are always consolidated in full.
+    """
+    star_system_sort_config = {"sort_key_name": "sy_name"}
+    star_sort_config = {
+        "sort_key_name": "publication_year",
+        "source_field_name": "st_refname",
+        "derive_sort_key": True
+    }
+
+    unique_star_system_keys = ["sy_name", "sy_snum", "sy_pnum", "sy_mnum", "sy_dist", "ra", "dec"]
+    raw_star_system_data = extract_unique_from_raw_data(raw_star_data, unique_star_system_keys)
+
+    stars, star_digests, changed_count = consolidate_changed_groups(
+        raw_star_data, "hostname", star_sort_config, (previous or {}).get("stars")
+    )
+    logger(f"Consolidated {changed_count} of {len(star_digests)} stars.")
+
+    return {
+        "stars": stars,
+        "star_systems": transform_and_consolidate(raw_star_system_data, "sy_name", star_system_sort_config),
+    }, {"stars": star_digests}
+
+
+def consolidate_planet_data(raw_planet_data, previous=None, logger=print):
+    """
+    Consolidates the raw 'ps' rows into canonical planets and planet discoveries, and returns
+    them with the digests of the raw rows of every planet.
+
+    Only the planets whose rows changed since the 'previous' run are merged again. Planet
+    discoveries are a single pass over the rows, and are always extracted in full.
+    """
+    planet_sort_config = {
+        "sort_key_name": "publication_year",
+        "source_field_name": "pl_refname",
+        "derive_sort_key": True
+    }
+
+    unique_planet_discovery_keys = ["discoverymethod", "disc_year", "disc_locale", "disc_facility"]
+
+    planets, planet_digests, changed_count = consolidate_changed_groups(
+        raw_planet_data, "pl_name", planet_sort_config, (previous or {}).get("planets")
+    )
+    logger(f"Consolidated {changed_count} of {len(planet_digests)} planets.")
+
+    return {
+        "planets": planets,
+        "planet_discoveries": extract_unique_from_raw_data(raw_planet_data, unique_planet_discovery_keys).to_records(),
+    }, {"planets": planet_digests}
+
+
+# NASA table -> (app table its fields are selected for, consolidation of its raw rows)
+CONSOLIDATION_SOURCES = {
+    "stellarhosts": ("stars", consolidate_star_data),
+    "ps": ("planets", consolidate_planet_data),
+}
+
+
+class PreviousConsolidation:
+    """
+    The state of the previous consolidation run: the TAP snapshot each NASA table was read from,
+    the app tables consolidated from it with the digests of the raw rows of every group, and
+    the digests of the canonical files it wrote.
 
-        star_system_sort_config = {"sort_key_name": "sy_name"}
-        star_sort_config = {
-            "sort_key_name": "publication_year",
-            "source_field_name": "st_refname",
-            "derive_sort_key": True
+    Canonical records are only read back from files that are still the ones that run wrote.
+    """
+
+    def __init__(self, state, write_json=True):
+        self.state = state
+        self.write_json = write_json
+
+    @classmethod
+    def load(cls, write_json=True):
+        """
+        Returns the state of the previous run, or None if there is none that is still usable.
+        """
+        try:
+            with open(CONSOLIDATION_STATE_FILE) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        if state.get("version") != CONSOLIDATION_STATE_VERSION:
+            return None
+        return cls(state, write_json)
+
+    def source_state(self, nasa_table):
+        return self.state["sources"].get(nasa_table)
+
+    def is_unchanged(self, nasa_table, source_digest):
+        """
+        Whether the canonical files of a NASA table are up to date with its TAP snapshot.
+        """
+        source = self.source_state(nasa_table)
+        return (
+            source is not None
+            and source["snapshot"] == source_digest
+            and all(self._is_intact(app_table) for app_table in source["app_tables"])
+        )
+
+    def load_source(self, nasa_table):
+        """
+        Returns the canonical records and group digests of the app tables consolidated from a NASA
+        table, for those whose files are intact.
+        """
+        source = self.source_state(nasa_table) or {"digests": {}}
+        return {
+            app_table: {"records": list(iter_canonical_records(self._filepath(app_table))), "digests": digests}
+            for app_table, digests in source["digests"].items()
+            if self._is_intact(app_table)
         }
-        planet_sort_config = {
-            "sort_key_name": "publication_year",
-            "source_field_name": "pl_refname",
-            "derive_sort_key": True
+
+    def _filepath(self, app_table):
+        filepath = Path(canonical_data_filepath(app_table))
+        return filepath if self.write_json else filepath.with_suffix(CANONICAL_BINARY_SUFFIX)
+
+    def _is_intact(self, app_table):
+        filepath = self._filepath(app_table)
+        return filepath.exists() and file_sha256(filepath) == self.state["files"].get(filepath.name)
+
+
+# app tables a canonical file is written for
+CANONICAL_APP_TABLES = ("star_systems", "stars", "planet_discoveries", "planets")
+
+
+def canonical_data_filepath(app_table):
+    return f"data/canonical_{app_table}.json"
+
+
+def fetch_and_consolidate(logger=print, refresh=False, offline=None, max_workers=None, previous=None):
+    """
+    Fetches the NASA tables concurrently and consolidates each one as soon as it has arrived,
+    while the others are still downloading.
+
+    With the state of a 'previous' run, a NASA table whose TAP response has not changed is not
+    consolidated at all, and only the changed groups of the others are. Returns the canonical
+    records of the app tables that were consolidated, and the state of every NASA table.
+
+    'max_workers' bounds the number of concurrent downloads, NASA_TAP_FETCH_CONCURRENCY by default.
+    """
+    max_workers = max_workers or settings.NASA_TAP_FETCH_CONCURRENCY
+    fetch_options = {"logger": logger, "refresh": refresh, "offline": offline}
+    canonical_data = {}
+    sources = {}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tap-fetch")
+    try:
+        futures = {
+            executor.submit(
+                fetch_raw_nasa_data, nasa_table=nasa_table, app_table=app_table, **fetch_options
+            ): nasa_table
+            for nasa_table, (app_table, _) in CONSOLIDATION_SOURCES.items()
         }
+        for future in as_completed(futures):
+            nasa_table = futures[future]
+            raw_data = future.result()
+
+            if previous is not None and previous.is_unchanged(nasa_table, raw_data.source_digest):
+                logger(f"NASA table '{nasa_table}' is unchanged since the last consolidation.")
+                sources[nasa_table] = previous.source_state(nasa_table)
+                continue
+
+            consolidate = CONSOLIDATION_SOURCES[nasa_table][1]
+            source_data, digests = consolidate(
+                raw_data, previous=previous and previous.load_source(nasa_table), logger=logger
+            )
+            canonical_data.update(source_data)
+            sources[nasa_table] = {
+                "snapshot": raw_data.source_digest,
+                "app_tables": list(source_data),
+                "digests": digests,
+            }
+    finally:
+        # once a download has failed, the remaining ones are abandoned rather than waited for
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return canonical_data, sources
+
+
+def run_canonical_data_consolidation(logger=print, write_json=True, refresh=False, offline=None, full=False):
+    """
+    Runs the canonical data consolidation process.
 
-        raw_star_data = fetch_raw_nasa_data(nasa_table="stellarhosts", app_table="stars", logger=logger)
-        raw_planet_data = fetch_raw_nasa_data(nasa_table="ps", app_table="planets", logger=logger)
+    Only what changed since the previous run is consolidated again, unless 'full' is set.
+    """
+    try:
+        logger("--- Starting Canonical Data Consolidation ---")
 
-        unique_star_system_keys = ["sy_name", "sy_snum", "sy_pnum", "sy_mnum", "sy_dist", "ra", "dec"]
-        raw_star_system_data = extract_unique_from_raw_data(raw_star_data, unique_star_system_keys)
+        previous = None if full else PreviousConsolidation.load(write_json)
+        canonical_data, sources = fetch_and_consolidate(
+            logger=logger, refresh=refresh, offline=offline, previous=previous
+        )
 
-        unique_planet_discovery_keys = ["discoverymethod", "disc_year", "disc_locale", "disc_facility"]
-        canonical_discoveries = extract_unique_from_raw_data(raw_planet_data, unique_planet_discovery_keys)
+        files = dict(previous.state["files"]) if previous is not None else {}
+        for app_table, data in canonical_data.items():
+            filepath = Path(canonical_data_filepath(app_table))
+            write_canonical_data_files(data, filepath, write_json)
 
-        canonical_planets = transform_and_consolidate(raw_planet_data, "pl_name", planet_sort_config)
-        canonical_stars = transform_and_consolidate(raw_star_data, "hostname", star_sort_config)
-        canonical_star_systems = transform_and_consolidate(raw_star_system_data, "sy_name", star_system_sort_config)
+            binary_filepath = filepath.with_suffix(CANONICAL_BINARY_SUFFIX)
+            files[binary_filepath.name] = file_sha256(binary_filepath)
+            if write_json:
+                files[filepath.name] = file_sha256(filepath)
+            else:
+                # a JSON file left from an earlier run no longer matches the binary file
+                files.pop(filepath.name, None)
 
-        write_data_to_file(canonical_stars, "data/canonical_stars.json")
-        write_data_to_file(canonical_planets, "data/canonical_planets.json")
-        write_data_to_file(canonical_star_systems, "data/canonical_star_systems.json")
-        write_data_to_file(canonical_discoveries, "data/canonical_planet_discoveries.json")
+        write_consolidation_state({"version": CONSOLIDATION_STATE_VERSION, "sources": sources, "files": files})
 
+        if not canonical_data:
+            return "Canonical data is already up to date."
         return "Successfully completed canonical data consolidation."
     except Exception as e:
         message = "[ERROR] An error occurred while fetching data from NASA TAP service"
@@ -221,5 +629,13 @@ def run_canonical_data_consolidation(logger=print):
         raise Exception(message) from e
 
 
+def write_consolidation_state(state):
+    # written to a temporary file first, so that an interrupted run never leaves a partial state
+    temp_path = CONSOLIDATION_STATE_FILE.with_suffix(".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(temp_path, CONSOLIDATION_STATE_FILE)
+
+
 if __name__ == "__main__":
     run_canonical_data_consolidation()
@@ -0,0 +1,172 @@
+"""
+Serves the cached TAP snapshots as a local stand-in for the NASA TAP service.
+
+Point the importers at it with NASA_TAP_BASE_URL=http://127.0.0.1:8765/TAP/sync to run them,
+or benchmark them, without the network. Responses carry the snapshot digest as their ETag, so
+conditional requests are answered with 304 Not Modified. A key range query (a chunk of a table)
+without a snapshot of its own is answered by filtering the snapshot of the whole table.
+Run from the project root:
+
+    python -m scripts.serve_tap_cache [--port 8765] [--rate 512] [--latency 0.5]
+"""
+import argparse
+import csv
+import hashlib
+import io
+import os
+import re
+import shutil
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from api.tap_cache import TAP_DOWNLOAD_CHUNK_SIZE, get_cache_dir, get_cached_snapshot
+
+# the conditions of api.utils.build_key_range_conditions
+_STRING = r"'((?:[^']|'')*)'"
+_KEY_RANGE_CONDITIONS = [
+    (re.compile(r"(\w+) is null$"), lambda value, bounds: value == ""),
+    (re.compile(rf"(\w+) < {_STRING}$"), lambda value, bounds: value != "" and value < bounds[0]),
+    (
+        re.compile(rf"(\w+) >= {_STRING} and \w+ < {_STRING}$"),
+        lambda value, bounds: value != "" and bounds[0] <= value < bounds[1],
+    ),
+    (re.compile(rf"(\w+) >= {_STRING}$"), lambda value, bounds: value != "" and value >= bounds[0]),
+]
+
+
+class TapCacheRequestHandler(BaseHTTPRequestHandler):
+    cache_dir = None
+    # bytes per second sent to the client, or None for no limit
+    rate = None
+    # seconds before the response starts, like a TAP service running the query
+    latency = 0.0
+
+    def do_GET(self):
+        snapshot = get_cached_snapshot(self.path, cache_dir=self.cache_dir)
+        if snapshot is None:
+            body = self._filter_table_snapshot()
+            if body is None:
+                self.send_error(404, "No cached snapshot for this query")
+                return
+
+            time.sleep(self.latency)
+            self._send_filtered(body)
+            return
+
+        time.sleep(self.latency)
+
+        etag = f'"{snapshot.content_sha256}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        # snapshots are stored gzipped, so they are sent as they are to clients that accept it
+        is_gzip_accepted = "gzip" in self.headers.get("Accept-Encoding", "")
+
+        self.send_response(200)
+        self.send_header("Content-Type", f"text/csv; charset={snapshot.metadata.get('encoding') or 'utf-8'}")
+        self.send_header("ETag", etag)
+        if is_gzip_accepted:
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(snapshot.path.stat().st_size))
+        else:
+            self.send_header("Content-Length", str(snapshot.metadata["size"]))
+        self.end_headers()
+
+        if is_gzip_accepted:
+            with open(snapshot.path, "rb") as f:
+                self._send_body(f)
+        else:
+            with snapshot.open() as f:
+                self._send_body(f.buffer)
+
+    def _filter_table_snapshot(self):
+        """
+        Returns the rows of the cached whole table that match the key range condition of the
+        query, as CSV, or None if the query is not a key range query of a cached table.
+        """
+        params = dict(parse_qsl(urlsplit(self.path).query))
+        table_query, _, condition = params.get("query", "").partition(" where ")
+        if not condition:
+            return None
+
+        for pattern, matches in _KEY_RANGE_CONDITIONS:
+            match = pattern.match(condition)
+            if match:
+                bounds = [bound.replace("''", "'") for bound in match.groups()[1:]]
+                return self._filter_rows(params, table_query, match.group(1), matches, bounds)
+        return None
+
+    def _filter_rows(self, params, table_query, column, matches, bounds):
+        table_snapshot = get_cached_snapshot(
+            "?" + urlencode({**params, "query": table_query}), cache_dir=self.cache_dir
+        )
+        if table_snapshot is None:
+            return None
+
+        output = io.StringIO()
+        writer = csv.writer(output)
+        with table_snapshot.open() as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            writer.writerow(header)
+            index = header.index(column)
+            writer.writerows(row for row in reader if matches(row[index], bounds))
+        return output.getvalue().encode()
+
+    def _send_filtered(self, body):
+        etag = f'"{hashlib.sha256(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self._send_body(io.BytesIO(body))
+
+    def _send_body(self, f):
+        if self.rate is None:
+            shutil.copyfileobj(f, self.wfile, TAP_DOWNLOAD_CHUNK_SIZE)
+            return
+
+        chunk_size = min(TAP_DOWNLOAD_CHUNK_SIZE, self.rate)
+        while chunk := f.read(chunk_size):
+            self.wfile.write(chunk)
+            time.sleep(len(chunk) / self.rate)
+
+
+def main():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache-dir", default=None, help="Defaults to the NASA_TAP_CACHE_DIR setting")
+    parser.add_argument("--rate", type=int, default=None, help="Limit responses to this many KiB per second")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response")
+    args = parser.parse_args()
+
+    TapCacheRequestHandler.cache_dir = get_cache_dir(args.cache_dir)
+    TapCacheRequestHandler.rate = args.rate * 1024 if args.rate else None
+    TapCacheRequestHandler.latency = args.latency
+
+    server = ThreadingHTTPServer((args.host, args.port), TapCacheRequestHandler)
+    print(f"Serving TAP snapshots from {TapCacheRequestHandler.cache_dir} on http://{args.host}:{args.port}/TAP/sync")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ class SimulationRunSerializer(serializers.ModelSerializer):
         model = SimulationRun
         fields = [
             "id",
+            "task_id",
             "user",
             "status",
             "simulation_type",
@@ -24,6 +25,15 @@ class SimulationRunSerializer(serializers.ModelSerializer):
         ]
 
 
+class SimulationTargetSerializer(serializers.Serializer):
+    """
+    A lightweight serializer for the objects a simulation can be run against.
+    """
+
+    id = serializers.IntegerField(read_only=True)
+    name = serializers.CharField(read_only=True)
+
+
 class TravelTimeInputSerializer(serializers.Serializer):
     """
     A class to serialize input data for validation
@@ -3,6 +3,7 @@ from django.urls import path
 from .views import (
     SeasonalTempsSimulationView,
     SimulationHistoryView,
+    SimulationTargetListView,
     StarLifetimeSimulationView,
     TidalLockingSimulationView,
     TravelTimeSimulationView,
@@ -32,4 +33,9 @@ urlpatterns = [
         name="simulation-star-lifetime",
     ),
     path("history/", SimulationHistoryView.as_view(), name="simulation-history"),
+    path(
+        "targets/<str:simulation_type>/",
+        SimulationTargetListView.as_view(),
+        name="simulation-targets",
+    ),
 ]
@@ -1,22 +1,35 @@
-from drf_spectacular.utils import extend_schema, OpenApiResponse, inline_serializer
-from rest_framework import status, serializers
+from django.http import Http404
+from drf_spectacular.utils import OpenApiResponse, extend_schema, inline_serializer
+from rest_framework import serializers, status
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from api.filters import IndexedSearchFilter
+from api.models import Planet, Star, StarSystem
 from api_keys.authentication import APIKeyAuthentication
 from api_keys.permissions import IsAuthenticatedOrPublic
 from simulations.serializers import (
     SeasonalTempInputSerializer,
     SimulationRunSerializer,
+    SimulationTargetSerializer,
     StarLifetimeInputSerializer,
     TidalLockingInputSerializer,
     TravelTimeInputSerializer,
 )
 from tasks.tasks import run_simulation_task
+
 from .models import SimulationRun
 
+# simulation type -> (model, precomputed eligibility flag) of the objects it can run against
+SIMULATION_TARGETS = {
+    "travel-time": (StarSystem, "travel_sim_eligible"),
+    "seasonal-temps": (Planet, "seasonality_sim_eligible"),
+    "tidal-locking": (Planet, "tidal_locking_sim_eligible"),
+    "star-lifetime": (Star, "lifetime_sim_eligible"),
+}
+
 
 @extend_schema(
     summary="[INTERNAL] Get the user's history of simulation runs.",
@@ -43,6 +56,37 @@ class SimulationHistoryView(ListAPIView):
         )
 
 
+@extend_schema(
+    summary="[INTERNAL] List the objects a simulation can be run against.",
+    description="**Warning:** This is an internal endpoint. "
+                "It is documented here for informational purposes. Direct use is not recommended."
+)
+class SimulationTargetListView(ListAPIView):
+    """
+    A paginated, searchable, read-only view of the ids and names of simulation-eligible objects.
+    Backs the typeahead inputs of the simulation lab.
+    """
+
+    authentication_classes = [APIKeyAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticatedOrPublic]
+    is_public_resource = False
+
+    serializer_class = SimulationTargetSerializer
+    filter_backends = [IndexedSearchFilter]
+    search_fields = ["name"]
+
+    # disable throttling
+    throttle_classes = []
+
+    def get_queryset(self):
+        try:
+            model, eligibility_flag = SIMULATION_TARGETS[self.kwargs["simulation_type"]]
+        except KeyError:
+            raise Http404("Unknown simulation type.") from None
+
+        return model.objects.filter(**{eligibility_flag: True}).only("id", "name").order_by("name")
+
+
 @extend_schema(
     summary="[INTERNAL] Run a simulation.",
     description="**Warning:** This is an internal endpoint. "
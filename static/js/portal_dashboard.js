@@ -22,7 +22,62 @@ document.addEventListener('DOMContentLoaded', function () {
         form.addEventListener('submit', handleSimSubmit);
     });
 
+    // typeahead inputs load eligible simulation targets on demand instead of with the page
+    document.querySelectorAll('.simulation-target-input').forEach(setupTargetTypeahead);
+
+    function setupTargetTypeahead(input) {
+        const datalist = document.getElementById(input.getAttribute('list'));
+        const hiddenInput = input.form.querySelector(`input[type="hidden"][name="${input.dataset.targetField}"]`);
+        // option name -> object id for the latest suggestions
+        let suggestionIds = new Map();
+        let debounceTimeoutId = null;
+        let latestRequest = 0;
+
+        function loadSuggestions() {
+            const requestNumber = ++latestRequest;
+            const url = `${input.dataset.targetsUrl}?search=${encodeURIComponent(input.value.trim())}`;
+
+            fetch(url)
+                .then(response => response.ok ? response.json() : null)
+                .then(data => {
+                    // ignore responses that arrive after a newer request was sent
+                    if (!data || requestNumber !== latestRequest) return;
+
+                    suggestionIds = new Map(data.results.map(target => [target.name, target.id]));
+                    datalist.innerHTML = '';
+                    data.results.forEach(target => {
+                        const option = document.createElement('option');
+                        option.value = target.name;
+                        datalist.appendChild(option);
+                    });
+                    selectTarget();
+                })
+                .catch(() => {
+                });
+        }
+
+        function selectTarget() {
+            const targetId = suggestionIds.get(input.value);
+            hiddenInput.value = targetId !== undefined ? targetId : '';
+        }
+
+        input.addEventListener('focus', () => {
+            if (suggestionIds.size === 0) loadSuggestions();
+        });
+
+        input.addEventListener('input', () => {
+            selectTarget();
+            clearTimeout(debounceTimeoutId);
+            debounceTimeoutId = setTimeout(loadSuggestions, 250);
+        });
+    }
+
     let pollingIntervalId = null;
+    let taskEvents = null;
+    let useTaskEvents = 'EventSource' in window;
+    // simulations submitted from this page whose history records the worker has not created yet
+    const awaitedTaskIds = new Set();
+    const taskEventsUrl = '/tasks/events/';
     let historyPrevUrl = null;
     let historyNextUrl = null;
     const initialHistoryUrl = '/simulations/history/';
@@ -70,7 +125,8 @@ document.addEventListener('DOMContentLoaded', function () {
             })
             .then(data => {
                 displaySimulationMessage(`Simulation started successfully! Task ID: ${data.task_id}`, 'success');
-                startPolling();
+                awaitedTaskIds.add(data.task_id);
+                startWatching();
             })
             .catch(error => {
                 // network error, fetch fails, api errors
@@ -87,8 +143,11 @@ document.addEventListener('DOMContentLoaded', function () {
             .then(data => {
                 if (!historyTableBody || !data) return;
 
+                data.results.forEach(run => awaitedTaskIds.delete(run.task_id));
+
                 if (data.results.length === 0) {
                     historyTableBody.innerHTML = `<tr><td colspan="4" class="px-6 py-4 text-center text-sm text-gray-500">No simulation history found.</td></tr>`;
+                    updateWatching(false);
                     return;
                 }
 
@@ -131,17 +190,13 @@ document.addEventListener('DOMContentLoaded', function () {
                 });
                 historyTableBody.innerHTML = tableHtml;
 
-                if (isAnySimRunning) {
-                    startPolling();
-                } else {
-                    stopPolling();
-                }
+                updateWatching(isAnySimRunning);
             })
             .catch(error => {
                 if (historyTableBody) {
                     historyTableBody.innerHTML = `<tr><td colspan="4" class="px-6 py-4 text-center text-sm text-red-500">Error loading history. Are you logged in?</td></tr>`;
                 }
-                stopPolling();
+                stopWatching();
             });
     }
 
@@ -174,6 +229,47 @@ document.addEventListener('DOMContentLoaded', function () {
         nextButtons.forEach(btn => btn.disabled = !data.next);
     }
 
+    // follows pending simulations through the task event stream, or by polling the history
+    // where the stream is not available
+    function startWatching() {
+        if (!useTaskEvents) {
+            startPolling();
+            return;
+        }
+        if (taskEvents) return;
+
+        taskEvents = new EventSource(taskEventsUrl);
+        // catches up on anything that finished while the stream was connecting
+        taskEvents.addEventListener('open', () => updateHistoryTable());
+        taskEvents.addEventListener('task', () => updateHistoryTable());
+        taskEvents.addEventListener('error', () => {
+            // the browser reconnects on its own unless the stream was refused
+            if (taskEvents && taskEvents.readyState === EventSource.CLOSED) {
+                taskEvents.close();
+                taskEvents = null;
+                useTaskEvents = false;
+                startPolling();
+            }
+        });
+    }
+
+    // keeps watching while a simulation is pending, or one submitted here is not in the history yet
+    function updateWatching(isAnySimRunning) {
+        if (isAnySimRunning || awaitedTaskIds.size > 0) {
+            startWatching();
+        } else {
+            stopWatching();
+        }
+    }
+
+    function stopWatching() {
+        if (taskEvents) {
+            taskEvents.close();
+            taskEvents = null;
+        }
+        stopPolling();
+    }
+
     function startPolling() {
         if (!pollingIntervalId) {
             pollingIntervalId = setInterval(updateHistoryTable, 2000);
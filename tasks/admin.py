@@ -1,3 +1,21 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import PipelineStageRun
+
+
+@admin.register(PipelineStageRun)
+class PipelineStageRunAdmin(admin.ModelAdmin):
+    """
+    Admin class that lists the runs of the nightly pipeline stages, as a read-only history.
+    """
+
+    list_display = ("pipeline", "stage", "status", "started_at", "duration_seconds", "task_id")
+    ordering = ("-started_at",)
+    search_fields = ("stage", "task_id")
+    list_filter = ("pipeline", "stage", "status")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
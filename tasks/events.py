@@ -0,0 +1,108 @@
+import json
+import time
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from rest_framework.renderers import BaseRenderer
+
+# channel of the task events of each user
+TASK_EVENTS_CHANNEL = "tasks:user:{user_id}"
+
+# seconds between keep-alive comments on an idle stream, so that proxies keep it open and a
+# closed connection is noticed
+TASK_EVENTS_HEARTBEAT_SECONDS = 15
+
+# seconds a stream stays open before the client is asked to reconnect
+TASK_EVENTS_STREAM_SECONDS = 15 * 60
+
+# milliseconds clients wait before reconnecting to a closed stream
+TASK_EVENTS_RETRY_MS = 1000
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets views negotiate 'text/event-stream', which EventSource asks for. Only errors are
+    rendered through it, as JSON; the streams themselves are returned as they are.
+    """
+
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode()
+
+
+def task_events_channel(user_id):
+    return TASK_EVENTS_CHANNEL.format(user_id=user_id)
+
+
+def publish_task_event(user_id, task_id, status, logger=print, **fields):
+    """
+    Publishes a state transition of a user's task to the streams of the user, when
+    TASK_EVENTS_REDIS_URL is set. A failure is reported rather than raised, since clients
+    can still read the state from the task status and history endpoints.
+    """
+    if not settings.TASK_EVENTS_REDIS_URL:
+        return
+
+    event = {"task_id": task_id, "status": status, **fields}
+    try:
+        client = redis.Redis.from_url(settings.TASK_EVENTS_REDIS_URL)
+        try:
+            client.publish(task_events_channel(user_id), json.dumps(event, default=str))
+        finally:
+            client.close()
+    except redis.RedisError as e:
+        logger(f"WARNING: Could not publish the event of task '{task_id}' ({e})")
+
+
+def is_task_events_available(request):
+    """
+    Returns whether the task event stream can be served for a request: TASK_EVENTS_REDIS_URL
+    must be set and the request served under ASGI, since an open stream would hold a WSGI worker.
+    """
+    return bool(settings.TASK_EVENTS_REDIS_URL) and isinstance(request, ASGIRequest)
+
+
+def format_event(data=None, event=None, retry=None, comment=None):
+    lines = []
+    if comment is not None:
+        lines.append(f": {comment}")
+    if retry is not None:
+        lines.append(f"retry: {retry}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    if data is not None:
+        lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream_task_events(user_id):
+    """
+    Yields the server-sent events of a user's tasks, until the stream has been open for
+    TASK_EVENTS_STREAM_SECONDS. It is asynchronous, so that an open stream holds no thread.
+    """
+    client = redis.asyncio.Redis.from_url(settings.TASK_EVENTS_REDIS_URL)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    try:
+        await pubsub.subscribe(task_events_channel(user_id))
+        yield format_event(retry=TASK_EVENTS_RETRY_MS, comment="connected")
+
+        closes_at = time.monotonic() + TASK_EVENTS_STREAM_SECONDS
+        while (remaining := closes_at - time.monotonic()) > 0:
+            message = await pubsub.get_message(timeout=min(TASK_EVENTS_HEARTBEAT_SECONDS, remaining))
+            yield _message_event(message)
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+
+def _message_event(message):
+    if message is None:
+        return format_event(comment="keep-alive")
+
+    data = message["data"]
+    return format_event(data=data.decode() if isinstance(data, bytes) else data, event="task")
@@ -1,3 +1,38 @@
 from django.db import models
 
-# Create your models here.
+
+class PipelineStageRun(models.Model):
+    """
+    A run of one stage of a nightly pipeline, and the checkpoint later runs of the stage compare
+    their inputs against.
+    """
+
+    class Status(models.TextChoices):
+        RUNNING = "RUNNING", "Running"
+        SUCCESS = "SUCCESS", "Success"
+        FAILURE = "FAILURE", "Failure"
+        SKIPPED = "SKIPPED", "Skipped"
+
+    pipeline = models.CharField(max_length=100)
+    stage = models.CharField(max_length=100)
+    task_id = models.CharField(max_length=255, blank=True)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.RUNNING
+    )
+    # digest of everything the stage reads, e.g. the TAP snapshots or canonical files
+    input_hash = models.CharField(max_length=64, blank=True)
+    # path -> sha256 of the files the stage wrote
+    output_artifacts = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    duration_seconds = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-started_at"]
+        indexes = [
+            models.Index(fields=["pipeline", "stage", "status", "-started_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.pipeline}:{self.stage} ({self.status})"
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Avg, Count, Max, Q
+from django.db.models.functions import Now
+
+from api.canonical_data_importer import IMPORT_ORDER, get_source_files
+from api.canonical_files import CANONICAL_BINARY_SUFFIX
+from api.importer import TABLE_COLUMNS
+from api.models import ImportRun
+from api.tap_cache import get_cached_snapshot
+from api.utils import build_nasa_tap_url, file_sha256
+from scripts.canonical_data_consolidater import (
+    CONSOLIDATION_SOURCES,
+    CONSOLIDATION_STATE_VERSION,
+    build_table_urls,
+    canonical_data_filepath,
+)
+
+from .models import PipelineStageRun
+
+CANONICAL_IMPORT_PIPELINE = "nightly_canonical_import"
+CANONICAL_CONSOLIDATION_STAGE = "consolidation"
+CANONICAL_IMPORT_STAGE = "import"
+
+NASA_IMPORT_PIPELINE = "nightly_nasa_import"
+# (NASA table, app table) of each stage, in the order they run; every stage depends on the ones before it
+NASA_IMPORT_STAGES = [
+    ("stellarhosts", "star_systems"),
+    ("stellarhosts", "stars"),
+    ("ps", "planet_discoveries"),
+    ("ps", "planets"),
+]
+
+# number of recent runs of each stage that its timings are computed from
+STAGE_TIMINGS_WINDOW = 30
+
+
+def run_stage(pipeline, stage, run, inputs=None, outputs=None, task_id="", force=False, logger=print):
+    """
+    Runs a stage of a pipeline, unless its last successful run read the same inputs and the files
+    it wrote are still intact, in which case that run's result is returned. Every run, including a
+    skipped one, is recorded with its duration.
+
+    'run' performs the stage and returns its result. 'inputs' returns the (JSON serializable)
+    digests of everything the stage reads, or None when they are only known once the stage has
+    run, e.g. TAP responses that are not cached. They are fingerprinted again once the stage has
+    run, so that its checkpoint holds the state it left behind, e.g. the import run it recorded.
+    'outputs' returns the paths of the files the stage writes. With 'force', the stage always runs.
+    """
+    input_hash = _fingerprint(inputs)
+
+    checkpoint = get_checkpoint(pipeline, stage)
+    if (
+        not force
+        and input_hash
+        and checkpoint is not None
+        and checkpoint.input_hash == input_hash
+        and _are_artifacts_intact(checkpoint.output_artifacts)
+    ):
+        logger(f"Skipping stage '{stage}' of '{pipeline}': its inputs are unchanged since run {checkpoint.pk}.")
+        PipelineStageRun.objects.create(
+            pipeline=pipeline,
+            stage=stage,
+            task_id=task_id or "",
+            status=PipelineStageRun.Status.SKIPPED,
+            input_hash=input_hash,
+            result=checkpoint.result,
+            completed_at=Now(),
+            duration_seconds=0.0,
+        )
+        return checkpoint.result
+
+    stage_run = PipelineStageRun.objects.create(
+        pipeline=pipeline, stage=stage, task_id=task_id or "", input_hash=input_hash
+    )
+    started_at = time.perf_counter()
+    try:
+        result = run()
+    except Exception as e:
+        PipelineStageRun.objects.filter(pk=stage_run.pk).update(
+            status=PipelineStageRun.Status.FAILURE,
+            result={"error": str(e)},
+            completed_at=Now(),
+            duration_seconds=time.perf_counter() - started_at,
+        )
+        raise
+
+    duration = time.perf_counter() - started_at
+    PipelineStageRun.objects.filter(pk=stage_run.pk).update(
+        status=PipelineStageRun.Status.SUCCESS,
+        # inputs fetched or written by the stage itself can only be fingerprinted now
+        input_hash=_fingerprint(inputs) or input_hash,
+        output_artifacts={str(path): file_sha256(path) for path in (outputs() if outputs else [])},
+        result=result,
+        completed_at=Now(),
+        duration_seconds=duration,
+    )
+    logger(f"Stage '{stage}' of '{pipeline}' completed in {duration:.2f}s.")
+    return result
+
+
+def get_checkpoint(pipeline, stage):
+    """
+    Returns the last successful run of a stage, or None if it never completed.
+    """
+    return (
+        PipelineStageRun.objects.filter(pipeline=pipeline, stage=stage, status=PipelineStageRun.Status.SUCCESS)
+        .order_by("-started_at", "-pk")
+        .first()
+    )
+
+
+def get_stage_timings(pipeline):
+    """
+    Returns the number of runs and the average and longest duration of the recent runs of every
+    stage of a pipeline that did the work (were not skipped), with the status of its last run.
+    """
+    stages = (
+        PipelineStageRun.objects.filter(pipeline=pipeline)
+        .values_list("stage", flat=True)
+        .distinct()
+        .order_by("stage")
+    )
+
+    timings = []
+    for stage in stages:
+        runs = PipelineStageRun.objects.filter(pipeline=pipeline, stage=stage).order_by("-started_at", "-pk")
+        last_run = runs.first()
+        recent_pks = runs.filter(status=PipelineStageRun.Status.SUCCESS).values_list("pk", flat=True)[
+            :STAGE_TIMINGS_WINDOW
+        ]
+        summary = PipelineStageRun.objects.filter(pk__in=list(recent_pks)).aggregate(
+            runs=Count("pk"), average_seconds=Avg("duration_seconds"), max_seconds=Max("duration_seconds")
+        )
+        timings.append(
+            {
+                "stage": stage,
+                "last_status": last_run.status,
+                "last_started_at": last_run.started_at,
+                "last_duration_seconds": last_run.duration_seconds,
+                **summary,
+            }
+        )
+    return timings
+
+
+def consolidation_inputs():
+    """
+    The digests of the TAP snapshots the consolidation would read, or None if any of them would
+    have to be fetched (or revalidated) first.
+    """
+    digests = [CONSOLIDATION_STATE_VERSION]
+    for nasa_table, (app_table, _) in CONSOLIDATION_SOURCES.items():
+        for url in build_table_urls(nasa_table, app_table):
+            digest = _fresh_snapshot_digest(url)
+            if digest is None:
+                return None
+            digests.append(digest)
+    return digests
+
+
+def consolidation_outputs():
+    paths = []
+    for app_table in IMPORT_ORDER:
+        json_path = Path(canonical_data_filepath(app_table))
+        paths += [path for path in (json_path, json_path.with_suffix(CANONICAL_BINARY_SUFFIX)) if path.exists()]
+    return paths
+
+
+def canonical_import_inputs():
+    """
+    The digests of the canonical files the import reads, and the last import into the catalog
+    tables, so that the import runs again once another one has written to them.
+    """
+    return {
+        "files": {app_table: file_sha256(path) for app_table, path in get_source_files().items() if path.exists()},
+        "last_import": last_import_run_id(),
+    }
+
+
+def nasa_import_inputs(nasa_table, app_table):
+    """
+    The digest of the TAP snapshot an import stage reads, the checkpoints of the stages before it,
+    since rows link to the rows those stages imported, and the last import into its table. None
+    if the snapshot is not cached.
+    """
+    digest = _fresh_snapshot_digest(build_nasa_tap_url(nasa_table, TABLE_COLUMNS[nasa_table][app_table]))
+    if digest is None:
+        return None
+
+    upstream = []
+    for stage_tables in NASA_IMPORT_STAGES[:NASA_IMPORT_STAGES.index((nasa_table, app_table))]:
+        checkpoint = get_checkpoint(NASA_IMPORT_PIPELINE, nasa_import_stage(*stage_tables))
+        upstream.append(checkpoint.pk if checkpoint is not None else None)
+    return [digest, upstream, last_import_run_id(app_table)]
+
+
+def last_import_run_id(app_table=None):
+    """
+    The id of the last successful import into the catalog tables, or into 'app_table' (by the
+    canonical importer, or the NASA importer of that table). None if there was none.
+    """
+    runs = ImportRun.objects.filter(status=ImportRun.Status.SUCCESS)
+    if app_table is not None:
+        runs = runs.filter(Q(importer=ImportRun.Importer.CANONICAL) | Q(source__endswith=f":{app_table}"))
+    return runs.order_by("-pk").values_list("pk", flat=True).first()
+
+
+def nasa_import_stage(nasa_table, app_table):
+    return f"{nasa_table}:{app_table}"
+
+
+def _fresh_snapshot_digest(url):
+    """
+    The digest of the cached snapshot of a TAP URL if it would be used as is, without asking the
+    TAP service, otherwise None.
+    """
+    snapshot = get_cached_snapshot(url)
+    if snapshot is None:
+        return None
+    if not settings.NASA_TAP_OFFLINE and snapshot.age >= settings.NASA_TAP_CACHE_MAX_AGE:
+        return None
+    return snapshot.content_sha256
+
+
+def _fingerprint(inputs):
+    values = inputs() if inputs else None
+    if values is None:
+        return ""
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest()
+
+
+def _are_artifacts_intact(artifacts):
+    return all(Path(path).exists() and file_sha256(path) == digest for path, digest in artifacts.items())
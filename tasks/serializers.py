@@ -0,0 +1,27 @@
+from rest_framework import serializers
+
+from .status import TASK_STATUS_BATCH_MAX_IDS, TASK_STATUS_MAX_WAIT_SECONDS
+
+
+class TaskStatusBatchInputSerializer(serializers.Serializer):
+    """
+    A class to serialize input data for validation
+    """
+
+    task_ids = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        min_length=1,
+        max_length=TASK_STATUS_BATCH_MAX_IDS,
+        help_text="The IDs of the Celery tasks.",
+    )
+    timeout = serializers.FloatField(
+        min_value=0,
+        max_value=TASK_STATUS_MAX_WAIT_SECONDS,
+        default=0,
+        help_text="Seconds to wait for at least one of the tasks to be ready before responding, 0 to respond "
+                  "right away.",
+    )
+
+    def validate_task_ids(self, task_ids):
+        # each task once, in the order given
+        return list(dict.fromkeys(task_ids))
@@ -0,0 +1,153 @@
+import time
+
+from celery import current_app, states
+from celery.backends.base import KeyValueStoreBackend
+from celery.result import AsyncResult
+
+from simulations.models import SimulationRun
+
+from .tasks import TASK_PROGRESS_STATE
+
+# most task ids one batch status request may ask for
+TASK_STATUS_BATCH_MAX_IDS = 500
+
+# longest a batch status request may wait for a task to finish; a waiting request holds a
+# worker, so the wait is kept short and clients poll again
+TASK_STATUS_MAX_WAIT_SECONDS = 2
+
+# seconds between two lookups of the tasks' statuses while a request waits
+TASK_STATUS_POLL_SECONDS = 0.5
+
+
+def get_task_status(task_id):
+    """
+    Returns the status of a task as reported by the Celery result backend: its state, its
+    result (or error) once it is ready and its progress while it reports any.
+    """
+    task_result = AsyncResult(task_id)
+    return _backend_status(task_id, task_result.status, task_result.result)
+
+
+def get_user_task_status(task_id, user):
+    """
+    Returns the status of a task for 'user'. The simulations of other users are reported as
+    unknown, the way the result backend reports an id it has never seen.
+    """
+    if SimulationRun.objects.filter(task_id=task_id).exclude(user=user).exists():
+        return _unknown_status(task_id)
+    return get_task_status(task_id)
+
+
+def get_task_statuses(task_ids, user):
+    """
+    Returns the statuses of many tasks for 'user', in the order of their ids. The user's
+    simulation tasks are looked up in their history records with a single query, and other
+    users' simulations are reported as unknown. Only the remaining ids (e.g. import tasks, or
+    simulations a worker has not picked up yet) are asked of the Celery result backend, all
+    at once.
+    """
+    return wait_for_task_statuses(task_ids, user, timeout=0)
+
+
+def wait_for_task_statuses(task_ids, user, timeout):
+    """
+    Returns the statuses of many tasks for 'user' once at least one of them is ready (has
+    succeeded or failed), or after 'timeout' seconds, whichever comes first. Clients polling a
+    set of tasks drop the ready ones from their next request.
+    """
+    closes_at = time.monotonic() + timeout
+
+    others = set(
+        SimulationRun.objects.filter(task_id__in=task_ids).exclude(user=user).values_list("task_id", flat=True)
+    )
+    statuses = {task_id: _unknown_status(task_id) for task_id in others}
+    # other users' tasks are never looked up, so only the caller's can become ready
+    waiting = [task_id for task_id in task_ids if task_id not in others]
+
+    while waiting:
+        statuses.update(_lookup_statuses(waiting, user))
+        remaining = closes_at - time.monotonic()
+        if remaining <= 0 or any(statuses[task_id]["status"] in states.READY_STATES for task_id in waiting):
+            break
+        time.sleep(min(TASK_STATUS_POLL_SECONDS, remaining))
+
+    return [statuses[task_id] for task_id in task_ids]
+
+
+def _lookup_statuses(task_ids, user):
+    # the user's simulation runs, then the result backend for the ids without one
+    runs = SimulationRun.objects.filter(task_id__in=task_ids, user=user).values_list("task_id", "status", "result")
+    statuses = {task_id: _run_status(task_id, run_status, result) for task_id, run_status, result in runs}
+
+    unresolved = [task_id for task_id in task_ids if task_id not in statuses]
+    if unresolved:
+        statuses.update(_get_backend_statuses(unresolved))
+    return statuses
+
+
+def _get_backend_statuses(task_ids):
+    """
+    Returns the statuses of tasks from the Celery result backend, read with a single request
+    when it is a key-value store (e.g. Redis), or one task at a time otherwise.
+    """
+    backend = current_app.backend
+    if not isinstance(backend, KeyValueStoreBackend):
+        return {task_id: get_task_status(task_id) for task_id in task_ids}
+
+    keys = [backend.get_key_for_task(task_id) for task_id in task_ids]
+    values = backend.mget(keys)
+    if hasattr(values, "items"):
+        # some clients only return the keys they have
+        values = [values.get(key) for key in keys]
+
+    statuses = {}
+    for task_id, value in zip(task_ids, values, strict=True):
+        meta = backend.decode_result(value) if value else {"status": states.PENDING, "result": None}
+        statuses[task_id] = _backend_status(task_id, meta["status"], meta["result"])
+    return statuses
+
+
+def _backend_status(task_id, status, result):
+    result_data = None
+    progress = None
+    if status == TASK_PROGRESS_STATE:
+        progress = result
+    elif status == states.FAILURE:
+        result_data = {
+            "error": True,
+            "message": str(result),
+        }
+    elif status in states.READY_STATES:
+        result_data = result
+
+    return {
+        "task_id": task_id,
+        "status": status,
+        "result": result_data,
+        "progress": progress,
+    }
+
+
+def _unknown_status(task_id):
+    return {
+        "task_id": task_id,
+        "status": states.PENDING,
+        "result": None,
+        "progress": None,
+    }
+
+
+def _run_status(task_id, status, result):
+    # errors are reported the way the result backend's are
+    if status == SimulationRun.Status.FAILURE:
+        message = result.get("error") if isinstance(result, dict) else result
+        result = {"error": True, "message": str(message)}
+    elif status == SimulationRun.Status.PENDING:
+        result = None
+
+    return {
+        "task_id": task_id,
+        "status": status,
+        "result": result,
+        "progress": None,
+    }
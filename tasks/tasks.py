@@ -2,6 +2,7 @@ import time
 
 from celery import chain, shared_task
 from celery.utils.log import get_task_logger
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import Error as DatabaseError
 from django.db.models.functions import Now
@@ -11,11 +12,28 @@ from api.importer import run_import
 from scripts.canonical_data_consolidater import run_canonical_data_consolidation
 from simulations.engine import SimulationEngine, SimulationError
 from simulations.models import SimulationRun
+from .events import publish_task_event
 from .exceptions import TaskError
+from .pipeline import (
+    CANONICAL_CONSOLIDATION_STAGE,
+    CANONICAL_IMPORT_PIPELINE,
+    CANONICAL_IMPORT_STAGE,
+    NASA_IMPORT_PIPELINE,
+    NASA_IMPORT_STAGES,
+    canonical_import_inputs,
+    consolidation_inputs,
+    consolidation_outputs,
+    nasa_import_inputs,
+    nasa_import_stage,
+    run_stage,
+)
 
 # use Celery logger for additional logging context
 logger = get_task_logger(__name__)
 
+# custom state of a running import task, whose meta is the progress of the import
+TASK_PROGRESS_STATE = "PROGRESS"
+
 SIMULATION_DISPATCHER = {
     SimulationRun.SimulationType.TRAVEL_TIME: SimulationEngine.calculate_travel_time,
     SimulationRun.SimulationType.SEASONAL_TEMPS: SimulationEngine.calculate_seasonal_temperatures,
@@ -24,14 +42,26 @@ SIMULATION_DISPATCHER = {
 }
 
 
-@shared_task
-def canonical_data_consolidation():
+@shared_task(bind=True)
+def canonical_data_consolidation(self, force=False):
     """
     A task to consolidate the NASA TAP API data into canonical data JSON files
+
+    The stage is skipped when the TAP snapshots it reads are unchanged since it last completed,
+    unless 'force' is set.
     """
     try:
         logger.info("--- Starting Canonical Data Consolidation ---")
-        result_message = run_canonical_data_consolidation(logger=logger.info)
+        result_message = run_stage(
+            CANONICAL_IMPORT_PIPELINE,
+            CANONICAL_CONSOLIDATION_STAGE,
+            lambda: run_canonical_data_consolidation(logger=logger.info),
+            inputs=consolidation_inputs,
+            outputs=consolidation_outputs,
+            task_id=self.request.id,
+            force=force,
+            logger=logger.info,
+        )
         logger.info(f"--- Finished Canonical Data Consolidation: {result_message} ---")
         return result_message
     except Exception as e:
@@ -40,14 +70,32 @@ def canonical_data_consolidation():
         raise TaskError(message) from e
 
 
-@shared_task
-def canonical_data_import():
+@shared_task(bind=True)
+def canonical_data_import(self, force=False):
     """
     A task to import the canonical data JSON files into the database
+
+    The stage is skipped when the canonical files are unchanged since it last completed, unless
+    'force' is set.
     """
     try:
         logger.info("--- Starting Canonical Data Import ---")
-        result_message = run_canonical_data_import(dry_run=False, logger=logger.info)
+        result_message = run_stage(
+            CANONICAL_IMPORT_PIPELINE,
+            CANONICAL_IMPORT_STAGE,
+            lambda: run_canonical_data_import(
+                dry_run=False,
+                logger=logger.info,
+                shadow=settings.CANONICAL_IMPORT_SHADOW_SWAP,
+                prune=settings.CANONICAL_IMPORT_PRUNE,
+                on_progress=_progress_reporter(self),
+                task_id=self.request.id,
+            ),
+            inputs=canonical_import_inputs,
+            task_id=self.request.id,
+            force=force,
+            logger=logger.info,
+        )
         logger.info(f"--- Finished Canonical Data Import: {result_message} ---")
         # used by Celery Results backend
         return result_message
@@ -58,47 +106,100 @@ def canonical_data_import():
 
 
 @shared_task
-def full_nightly_canonical_import(dry_run=False):
+def full_nightly_canonical_import(dry_run=False, force=False):
     """
     A master task that runs the full canonical data creation and import pipeline
+
+    Each stage is checkpointed, so running the pipeline again after a failure skips the stages
+    that completed with the same inputs. 'force' runs every stage.
     """
     canonical_data_import_chain = chain(
-        canonical_data_consolidation.si(),
-        canonical_data_import.si(),
+        canonical_data_consolidation.si(force=force),
+        canonical_data_import.si(force=force),
     )
 
     canonical_data_import_chain()
 
 
 @shared_task
-def full_nightly_import():
+def full_nightly_import(force=False):
     """
     A master task that runs the full import pipeline in the correct order
+
+    Each stage is checkpointed, so running the pipeline again after a failure skips the stages
+    that completed with the same inputs. 'force' runs every stage.
     """
     import_chain = chain(
-        import_nasa_data_task.si("stellarhosts", "star_systems"),
-        import_nasa_data_task.si("stellarhosts", "stars"),
-        import_nasa_data_task.si("ps", "planet_discoveries"),
-        import_nasa_data_task.si("ps", "planets"),
+        *(
+            import_nasa_data_task.si(nasa_table, app_table, pipeline=NASA_IMPORT_PIPELINE, force=force)
+            for nasa_table, app_table in NASA_IMPORT_STAGES
+        )
     )
 
     import_chain()
 
 
-@shared_task
-def import_nasa_data_task(nasa_table, app_table):
+@shared_task(bind=True)
+def import_nasa_data_task(self, nasa_table, app_table, pipeline=None, force=False):
     """
     A Celery task to fetch data from NASA TAP API and populate the database
+
+    As a stage of a 'pipeline', it is checkpointed, and a failed import stops the pipeline.
     """
     logger.info(f"Starting background import for '{app_table}'...")
 
-    result = run_import(nasa_table=nasa_table, app_table=app_table, logger=logger.info)
+    if pipeline is None:
+        result = run_import(
+            nasa_table=nasa_table,
+            app_table=app_table,
+            logger=logger.info,
+            on_progress=_progress_reporter(self),
+            task_id=self.request.id,
+        )
+    else:
+        result = run_stage(
+            pipeline,
+            nasa_import_stage(nasa_table, app_table),
+            lambda: _run_import_stage(self, nasa_table, app_table),
+            inputs=lambda: nasa_import_inputs(nasa_table, app_table),
+            task_id=self.request.id,
+            force=force,
+            logger=logger.info,
+        )
 
     logger.info(f"Final result: {result}")
 
     return result
 
 
+def _run_import_stage(task, nasa_table, app_table):
+    result = run_import(
+        nasa_table=nasa_table,
+        app_table=app_table,
+        logger=logger.info,
+        on_progress=_progress_reporter(task),
+        task_id=task.request.id,
+    )
+    # run_import reports failures in its result rather than raising
+    if result.startswith("Import failed"):
+        raise TaskError(result)
+    return result
+
+
+def _progress_reporter(task):
+    """
+    Returns a progress callback for the importers that stores their progress as the PROGRESS
+    state of the task, with the progress as its meta, where TaskStatusView reports it.
+    """
+
+    def report_progress(progress):
+        # a task run eagerly or directly has no id to store its state under
+        if task.request.id:
+            task.update_state(state=TASK_PROGRESS_STATE, meta=progress)
+
+    return report_progress
+
+
 @shared_task(bind=True)
 def run_simulation_task(self, user_id, simulation_type, input_parameters):
     """
@@ -126,17 +227,22 @@ def run_simulation_task(self, user_id, simulation_type, input_parameters):
         logger.error(message, exc_info=True)
         raise TaskError(message) from e
 
+    _publish_run_event(run)
+
     try:
         simulation_func = SIMULATION_DISPATCHER[simulation_type]
     except KeyError as e:
         message = f"Unknown simulation type '{simulation_type}'"
         logger.error(message, exc_info=True)
 
+        run.status = SimulationRun.Status.FAILURE
+        run.result = {"error": "Unknown simulation type"}
         SimulationRun.objects.filter(pk=run.pk).update(
-            status=SimulationRun.Status.FAILURE,
-            result={"error": "Unknown simulation type"},
+            status=run.status,
+            result=run.result,
             completed_at=Now(),
         )
+        _publish_run_event(run)
 
         raise TaskError(message) from e
 
@@ -165,3 +271,16 @@ def run_simulation_task(self, user_id, simulation_type, input_parameters):
         SimulationRun.objects.filter(pk=run.pk).update(
             status=run.status, result=run.result, completed_at=Now()
         )
+        _publish_run_event(run)
+
+
+def _publish_run_event(run):
+    # streamed to the user's dashboard, once the run's history record is up to date
+    publish_task_event(
+        run.user_id,
+        run.task_id,
+        run.status,
+        logger=logger.warning,
+        simulation_type=run.simulation_type,
+        result=run.result,
+    )
@@ -0,0 +1,16 @@
+from rest_framework.throttling import ScopedRateThrottle
+
+
+class TaskStatusWaitThrottle(ScopedRateThrottle):
+    """
+    Throttles the batch status requests that wait for their tasks, which hold a worker while
+    they wait, on the scope in the view's 'wait_throttle_scope'. Requests that respond right
+    away are left to the view's other throttles.
+    """
+
+    scope_attr = "wait_throttle_scope"
+
+    def allow_request(self, request, view):
+        if not isinstance(request.data, dict) or not request.data.get("timeout"):
+            return True
+        return super().allow_request(request, view)
@@ -1,9 +1,12 @@
 from django.urls import path
 
-from .views import TaskStatusView
+from .views import PipelineStageTimingsView, TaskEventsView, TaskStatusBatchView, TaskStatusView
 
 app_name = "tasks"
 
 urlpatterns = [
+    path("status/", TaskStatusBatchView.as_view(), name="task-status-batch"),
     path("status/<str:task_id>/", TaskStatusView.as_view(), name="task-status"),
+    path("events/", TaskEventsView.as_view(), name="task-events"),
+    path("pipelines/<str:pipeline>/stages/", PipelineStageTimingsView.as_view(), name="pipeline-stage-timings"),
 ]
@@ -1,13 +1,21 @@
-from celery.result import AsyncResult
-from drf_spectacular.utils import extend_schema, OpenApiResponse, inline_serializer
-from rest_framework import status, serializers
+from django.http import StreamingHttpResponse
+from drf_spectacular.utils import OpenApiResponse, extend_schema, inline_serializer
+from rest_framework import permissions, serializers, status
 from rest_framework.authentication import SessionAuthentication
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
 
 from api_keys.authentication import APIKeyAuthentication
 from api_keys.permissions import IsAuthenticatedOrPublic
 
+from .events import EventStreamRenderer, is_task_events_available, stream_task_events
+from .pipeline import get_stage_timings
+from .serializers import TaskStatusBatchInputSerializer
+from .status import get_user_task_status, wait_for_task_statuses
+from .throttling import TaskStatusWaitThrottle
+
 
 @extend_schema(
     summary="[INTERNAL] Get the status of a background Celery task from the Celery result backend.",
@@ -23,6 +31,9 @@ from api_keys.permissions import IsAuthenticatedOrPublic
                     'status': serializers.CharField(help_text='The current status of the task.'),
                     'result': serializers.JSONField(
                         help_text='Contains the simulation result on SUCCESS or an error object on FAILURE.'),
+                    'progress': serializers.JSONField(
+                        help_text='While an import task is in the PROGRESS state, its stage, rows read and written, '
+                                  'rows per second, elapsed seconds and estimated percent complete.'),
                 },
             )
         ),
@@ -37,28 +48,156 @@ class TaskStatusView(APIView):
     permission_classes = [IsAuthenticatedOrPublic]
     is_public_resource = False
 
+    # clients poll the status of their tasks, so lookups are throttled per minute on their own scope
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "task_status"
+
     def get(self, request, task_id, *args, **kwargs):
         """
         Handles GET request to check the status of a background task.
         """
 
         # get task state and result from Celery result backend
-        task_result = AsyncResult(task_id)
-
-        result_data = None
-        if task_result.ready():
-            if task_result.failed():
-                result_data = {
-                    "error": True,
-                    "message": str(task_result.result),
-                }
-            else:
-                result_data = task_result.result
+        response_data = get_user_task_status(task_id, request.user)
+
+        return Response(response_data, status=status.HTTP_200_OK)
+
 
+@extend_schema(
+    summary="[INTERNAL] Get the statuses of many background Celery tasks at once.",
+    description="**Warning:** This is an internal endpoint. "
+                "It is documented here for informational purposes. Direct use is not recommended. "
+                "The user's simulation tasks are read from their history records, other users' are reported as "
+                "PENDING and other tasks are read from the Celery result backend in one request. With a timeout "
+                "(of at most 2 seconds), the response waits until at least one of the tasks has succeeded or "
+                "failed, so clients tracking many tasks can poll them with one request, leaving the finished ones "
+                "out of the next. Requests with a timeout are throttled more tightly.",
+    request=TaskStatusBatchInputSerializer,
+    responses={
+        200: OpenApiResponse(
+            description="The current result of every task, in the order of the given IDs.",
+            response=inline_serializer(
+                name='TaskStatusBatchResponse',
+                fields={
+                    'results': serializers.ListField(
+                        child=serializers.DictField(),
+                        help_text='The task_id, status, result and progress of each task, as returned by the task '
+                                  'status endpoint.',
+                    ),
+                },
+            )
+        ),
+    },
+)
+class TaskStatusBatchView(APIView):
+    """
+    An API endpoint to check the statuses of many background tasks with one request.
+    """
+
+    authentication_classes = [APIKeyAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticatedOrPublic]
+    is_public_resource = False
+
+    # requests that wait for their tasks are also throttled on a tighter scope of their own
+    throttle_classes = [ScopedRateThrottle, TaskStatusWaitThrottle]
+    throttle_scope = "task_status"
+    wait_throttle_scope = "task_status_wait"
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handles POST request to check the statuses of background tasks.
+        """
+        serializer = TaskStatusBatchInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        response_data = {
+            "results": wait_for_task_statuses(user=request.user, **serializer.validated_data),
+        }
+
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    summary="[INTERNAL] Stream the state transitions of the user's background tasks.",
+    description="**Warning:** This is an internal endpoint. "
+                "It is documented here for informational purposes. Direct use is not recommended. "
+                "A server-sent event stream (text/event-stream) with a 'task' event, whose data is a JSON object "
+                "with the task_id, status and result, every time one of the user's simulation tasks changes state. "
+                "The stream is closed from time to time, and clients reconnect to it. It is only served when "
+                "the application runs under ASGI.",
+    responses={
+        200: OpenApiResponse(description="The event stream."),
+        503: OpenApiResponse(description="Task events are not available, poll the task status instead."),
+    },
+)
+class TaskEventsView(APIView):
+    """
+    An API endpoint that pushes the state transitions of the user's tasks as server-sent events,
+    so that clients do not have to poll the task status.
+    """
+
+    authentication_classes = [APIKeyAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticatedOrPublic]
+    is_public_resource = False
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    # a stream is a single long request
+    throttle_classes = []
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handles GET request to open the event stream of the user's tasks.
+        """
+        if not is_task_events_available(request._request):
+            return Response(
+                {"detail": "Task events are not available."}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        response = StreamingHttpResponse(
+            stream_task_events(request.user.id), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # keep proxies from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+@extend_schema(
+    summary="[INTERNAL] Get the timings of the stages of a nightly pipeline.",
+    description="**Warning:** This is an internal endpoint for capacity planning, only available to staff users. "
+                "Durations are computed from the recent runs of each stage that were not skipped.",
+    responses={
+        200: OpenApiResponse(
+            description="The timings of every stage of the pipeline.",
+            response=inline_serializer(
+                name='PipelineStageTimingsResponse',
+                fields={
+                    'pipeline': serializers.CharField(help_text='The name of the pipeline.'),
+                    'stages': serializers.ListField(
+                        child=serializers.DictField(),
+                        help_text='The number of runs, average and longest duration in seconds, and the last run '
+                                  'of each stage.',
+                    ),
+                },
+            )
+        ),
+    },
+)
+class PipelineStageTimingsView(APIView):
+    """
+    An API endpoint to report how long the stages of a nightly pipeline take.
+    """
+
+    authentication_classes = [APIKeyAuthentication, SessionAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, pipeline, *args, **kwargs):
+        """
+        Handles GET request for the stage timings of a pipeline.
+        """
         response_data = {
-            "task_id": task_id,
-            "status": task_result.status,
-            "result": result_data,
+            "pipeline": pipeline,
+            "stages": get_stage_timings(pipeline),
         }
 
         return Response(response_data, status=status.HTTP_200_OK)